@@ -0,0 +1,181 @@
+"""
+Time record_stat, compute_stat, drive_measurement, the JSON round trip
+(write_json and read_json) and anonymize_stat on synthetic trees (see
+synthetic_tree.py), and measure the peak memory each step allocates. The
+counts-only scan and the hydrate_filestat pass that completes it are timed
+too, on a separate tree.
+
+Steps are run in order on the same tree, each on the result of the one
+before; anonymize_stat edits in place, so it runs on the tree read back
+from JSON. Memory is measured in a second run of every step under
+tracemalloc, which slows it down, so timings are not affected.
+
+With --history, one JSON line per preset is appended to the given file,
+with the date, git commit, tree size, seconds and peak MB of each step,
+so scaling curves can be followed from run to run.
+
+usage: python benchmarks/bench_drive_analyzer.py [preset|n_folders ...]
+    [--trees DIR] [--history FILE] [--no-memory] [--seed N]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'cardinal_analyzer'))
+from drive_analyzer import (  # noqa: E402
+    record_stat, compute_stat, drive_measurement, write_json, read_json,
+    anonymize_stat, hydrate_filestat)
+from synthetic_tree import make_tree, preset_spec  # noqa: E402
+
+STEPS = ['record_stat', 'compute_stat', 'drive_measurement', 'write_json',
+         'read_json', 'anonymize_stat', 'record_stat_counts_only',
+         'hydrate_filestat']
+ANONYMIZED_RATIO = 0.05  # share of folders removed, and of folders renamed
+
+
+def run_steps(tree_path, json_path, seed, measure):
+    """ Run every step on the tree at tree_path, calling measure(step,
+    function) to run each. Returns the number of folders and files. """
+    dir_dict = measure('record_stat', lambda: record_stat(tree_path))
+    measure('compute_stat', lambda: compute_stat(dir_dict))
+    measure('drive_measurement', lambda: drive_measurement([dir_dict]))
+
+    def write():
+        with open(json_path, 'w', encoding='utf8') as file:
+            write_json(file, dir_dict, {'software_choice': ''})
+
+    def read():
+        with open(json_path, 'r', encoding='utf8') as file:
+            return read_json(file)['dir_dict']
+
+    measure('write_json', write)
+    read_dict = measure('read_json', read)
+    rng = random.Random(seed)
+    dirkeys = sorted(read_dict.keys())[1:]
+    n_anonymized = int(len(dirkeys) * ANONYMIZED_RATIO)
+    removed_dirs = rng.sample(dirkeys, n_anonymized)
+    renamed_dirs = {dirkey: 'renamed {}'.format(dirkey)
+                    for dirkey in rng.sample(dirkeys, n_anonymized)}
+    measure('anonymize_stat',
+            lambda: anonymize_stat(read_dict, removed_dirs, renamed_dirs))
+    counts_dict = measure('record_stat_counts_only',
+                          lambda: record_stat(tree_path, counts_only=True))
+    measure('hydrate_filestat', lambda: hydrate_filestat(counts_dict, tree_path))
+    return len(dir_dict), sum(node['nfiles'] for node in dir_dict.values())
+
+
+def timed_steps(tree_path, json_path, seed):
+    seconds = dict()
+
+    def measure(step, function):
+        start = time.perf_counter()
+        result = function()
+        seconds[step] = time.perf_counter() - start
+        return result
+
+    return run_steps(tree_path, json_path, seed, measure), seconds
+
+
+def memory_steps(tree_path, json_path, seed):
+    """ Peak memory in MB allocated while running each step, on top of
+    what was allocated before it. """
+    peak_mb = dict()
+
+    def measure(step, function):
+        tracemalloc.start()
+        try:
+            result = function()
+            peak_mb[step] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+        return result
+
+    run_steps(tree_path, json_path, seed, measure)
+    return peak_mb
+
+
+def tree_for(preset, seed, trees_dir):
+    """ Path of the synthetic tree of a preset in trees_dir, which is
+    created unless it is already there. """
+    tree_path = os.path.join(trees_dir, '{}-{}'.format(preset, seed))
+    if not os.path.isdir(tree_path):
+        start = time.perf_counter()
+        n_folders, n_files = make_tree(tree_path, preset_spec(preset), seed)
+        print('{}: created {} folders, {} files in {:.1f} s'.format(
+            preset, n_folders, n_files, time.perf_counter() - start))
+    return tree_path
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench(presets, trees_dir, seed=0, memory=True, history=None):
+    for preset in presets:
+        tree_path = tree_for(preset, seed, trees_dir)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, 'session.json')
+            (n_folders, n_files), seconds = timed_steps(
+                tree_path, json_path, seed)
+            peak_mb = memory_steps(tree_path, json_path, seed) if memory else {}
+        print('{}: {} folders, {} files'.format(preset, n_folders, n_files))
+        print('{:<26}{:>12}{:>16}{:>12}'.format(
+            'step', 'seconds', 'us/folder', 'peak MB'))
+        for step in STEPS:
+            print('{:<26}{:>12.3f}{:>16.1f}{:>12}'.format(
+                step, seconds[step], seconds[step] / n_folders * 1e6,
+                '{:.1f}'.format(peak_mb[step]) if step in peak_mb else '-'))
+        if history is not None:
+            record = {
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'commit': git_commit(), 'python': platform.python_version(),
+                'preset': preset, 'spec': preset_spec(preset)._asdict(),
+                'seed': seed, 'n_folders': n_folders, 'n_files': n_files,
+                'seconds': seconds, 'peak_mb': peak_mb}
+            with open(history, 'a', encoding='utf8') as file:
+                file.write(json.dumps(record) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark drive_analyzer on synthetic trees.')
+    parser.add_argument('presets', nargs='*', default=['typical'],
+                        help='typical, typical-10x, typical-100x or a '
+                             'number of folders (default: typical)')
+    parser.add_argument('--trees', metavar='DIR',
+                        help='keep the generated trees in DIR and reuse '
+                             'them in later runs')
+    parser.add_argument('--history', metavar='FILE',
+                        help='append the results to FILE as JSON lines')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the tracemalloc run')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.trees is not None:
+        os.makedirs(args.trees, exist_ok=True)
+        bench(args.presets, args.trees, args.seed, not args.no_memory,
+              args.history)
+    else:
+        with tempfile.TemporaryDirectory() as trees_dir:
+            bench(args.presets, trees_dir, args.seed, not args.no_memory,
+                  args.history)
+
+
+if __name__ == '__main__':
+    main()
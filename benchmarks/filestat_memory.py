@@ -0,0 +1,58 @@
+"""
+Compare the memory footprint of per-file statistics stored as a list of
+dicts (one dict per file, the former filestat layout) against
+FileStatColumns (one typed array per attribute).
+
+usage: python benchmarks/filestat_memory.py [n_folders] [files_per_folder]
+"""
+
+import sys
+import random
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'cardinal_analyzer'))
+from filestat import FileStatColumns  # noqa: E402
+
+
+def synthetic_rows(n_files, rng):
+    rows = []
+    for _ in range(n_files):
+        mtime = 1.5e9 + rng.random() * 1e8
+        rows.append({'mode': 33188, 'ino': rng.getrandbits(40),
+                     'dev': 65024, 'nlink': 1, 'uid': 1000, 'gid': 1000,
+                     'size': rng.getrandbits(20), 'atime': mtime + 3600.5,
+                     'mtime': mtime, 'ctime': mtime + 0.25})
+    return rows
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main(n_folders=10000, files_per_folder=7):
+    # both layouts are built from freshly generated values, so the int and
+    # float objects referenced by the dicts are counted as well
+    dict_layout, dict_bytes = measure(
+        lambda: [synthetic_rows(files_per_folder, rng)
+                 for rng in [random.Random(0)] for _ in range(n_folders)])
+    column_layout, column_bytes = measure(
+        lambda: [FileStatColumns.from_rows(
+            synthetic_rows(files_per_folder, rng))
+            for rng in [random.Random(0)] for _ in range(n_folders)])
+    n_files = n_folders * files_per_folder
+    print('folders: {}, files: {}'.format(n_folders, n_files))
+    print('{:<20}{:>14}{:>16}'.format('layout', 'total (MB)', 'bytes/file'))
+    for label, nbytes in (('list of dicts', dict_bytes),
+                          ('FileStatColumns', column_bytes)):
+        print('{:<20}{:>14.1f}{:>16.1f}'.format(
+            label, nbytes / 2**20, nbytes / n_files))
+    print('reduction: {:.1f}x'.format(dict_bytes / column_bytes))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,115 @@
+"""
+Compare saving and loading a session as JSON (the former format, written
+with indent=4 by Main.save_collected_data) against the binary session
+format of session.py, on a synthetic tree.
+
+usage: python benchmarks/session_load.py [n_folders] [files_per_folder]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'cardinal_analyzer'))
+from drive_analyzer import json_node, readable_node  # noqa: E402
+from filestat import FileStatColumns  # noqa: E402
+from nodetable import NodeTable  # noqa: E402
+from session import save_session, load_session  # noqa: E402
+
+
+def synthetic_dir_dict(n_folders, files_per_folder, rng):
+    dir_dict = dict()
+    for dirkey in range(1, n_folders + 1):
+        parent = rng.randint(max(1, dirkey - 50), dirkey - 1) if dirkey > 1 else False
+        mtime = 1.5e9 + rng.random() * 1e8
+        rows = [{'mode': 33188, 'ino': rng.getrandbits(40), 'dev': 65024,
+                 'nlink': 1, 'uid': 1000, 'gid': 1000,
+                 'size': rng.getrandbits(20), 'atime': mtime + 3600.5,
+                 'mtime': mtime, 'ctime': mtime + 0.25}
+                for _ in range(rng.randint(0, 2 * files_per_folder))]
+        dir_dict[dirkey] = {
+            'dirname': 'folder {}'.format(dirkey), 'dirparent': parent,
+            'childkeys': set(),
+            'depth': dir_dict[parent]['depth'] + 1 if parent else 0,
+            'nfiles': len(rows), 'cumfiles': len(rows),
+            'filestat': FileStatColumns.from_rows(rows),
+            'selection_state': 2, 'exclusion_state': 0,
+            'aggfilestat': {'aggatime': mtime, 'aggmtime': mtime,
+                            'aggctime': mtime},
+            'mode': 16877, 'ino': dirkey, 'dev': 65024, 'nlink': 2,
+            'uid': 1000, 'gid': 1000, 'size': 4096, 'atime': mtime,
+            'mtime': mtime, 'ctime': mtime}
+        if parent:
+            dir_dict[parent]['childkeys'].add(dirkey)
+    return dir_dict
+
+
+def json_serializable(dir_dict):
+    """ Convert data types within dictionary so that it can be saved as a
+    JSON file, as the former format did before json.dump. """
+    for dirkey in dir_dict.keys():
+        dir_dict[dirkey].update(json_node(dir_dict[dirkey]))
+    return dir_dict
+
+
+def dict_readable(dir_dict):
+    """ Convert data types in loaded JSON file so that the dict is compatible
+    with functions written with those data types in mind. """
+    for dirkey in dir_dict.keys():
+        readable_node(dir_dict[dirkey])
+    for dirkey in list(dir_dict.keys()):  # get static key list before popping items
+        # JSON decoder/parser incorrectly assumes dict keys are strings,
+        # converting keys to int here
+        dir_dict[int(dirkey)] = dir_dict[dirkey]
+        dir_dict.pop(dirkey)
+    return dir_dict
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(n_folders=20000, files_per_folder=7):
+    dir_dict = synthetic_dir_dict(n_folders, files_per_folder, random.Random(0))
+    table = NodeTable.from_dir_dict(dir_dict)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, 'session.json')
+        session_path = os.path.join(tmp_dir, 'session.cas')
+
+        def save_json():
+            with open(json_path, 'w', encoding='utf8') as file:
+                json.dump({'dir_dict': json_serializable(dir_dict),
+                           'software_choice': ''}, file, indent=4)
+
+        def load_json():
+            with open(json_path, 'r', encoding='utf8') as file:
+                return dict_readable(json.load(file)['dir_dict'])
+
+        _, json_save = timed(save_json)
+        _, json_load = timed(load_json)
+        _, session_save = timed(lambda: save_session(session_path, table))
+        (mapped, _), session_load = timed(lambda: load_session(session_path))
+        # loading is lazy, so also time reading one node and every node
+        _, first_node = timed(lambda: dict(mapped.view()[1]))
+        _, all_nodes = timed(lambda: mapped.to_dir_dict())
+        print('folders: {}, files: {}'.format(n_folders, sum(table.nfiles)))
+        print('{:<24}{:>12}{:>12}{:>12}'.format(
+            'format', 'size (MB)', 'save (s)', 'load (s)'))
+        print('{:<24}{:>12.1f}{:>12.3f}{:>12.3f}'.format(
+            'JSON', os.path.getsize(json_path) / 2**20, json_save, json_load))
+        print('{:<24}{:>12.1f}{:>12.3f}{:>12.4f}'.format(
+            'binary session', os.path.getsize(session_path) / 2**20,
+            session_save, session_load))
+        print('first node: {:.4f} s, all nodes: {:.3f} s'.format(
+            first_node, all_nodes))
+        del mapped
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,77 @@
+"""
+Measure how long the wizard takes to show its first page, in fresh
+interpreters, and how long the pages built later take when first visited.
+
+Each run starts a new Python process which times importing PyQt5 and
+creating the QApplication, importing main, and creating and showing
+Main until its first page has been processed, then the first visit of
+each following page. The process wall time, interpreter start and exit
+included, is measured around it. The median of the runs is printed.
+
+Qt uses the offscreen platform unless --display is given.
+
+usage: python benchmarks/startup.py [runs] [--display]
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+from pathlib import Path
+
+APP_DIR = str(Path(__file__).resolve().parents[1] / 'cardinal_analyzer')
+PROBE = r'''
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+from PyQt5.QtWidgets import QApplication
+app = QApplication([])
+qt = time.perf_counter()
+import main
+imported = time.perf_counter()
+wizard = main.Main()
+wizard.show()
+app.processEvents()
+shown = time.perf_counter()
+result = {{'qt': qt - start, 'import main': imported - qt,
+          'first page': shown - imported, 'to first page': shown - start,
+          'drive_analyzer imported': 'drive_analyzer' in sys.modules}}
+wizard.ui.consentbox.setChecked(True)
+for page in range(1, 4):
+    before = time.perf_counter()
+    wizard.next()
+    app.processEvents()
+    result['page {{}}'.format(page + 1)] = time.perf_counter() - before
+print(json.dumps(result))
+'''
+
+
+def run_once(display):
+    env = dict(os.environ)
+    if not display:
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(app_dir=APP_DIR)], env=env,
+        capture_output=True, text=True, check=True).stdout
+    wall = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process wall'] = wall
+    return result
+
+
+def main(runs=5, display=False):
+    results = [run_once(display) for _ in range(runs)]
+    print('runs: {}, drive_analyzer imported before the first page: {}'.format(
+        runs, any(result.pop('drive_analyzer imported') for result in results)))
+    print('{:<20}{:>14}'.format('step', 'median (ms)'))
+    for step in results[0]:
+        print('{:<20}{:>14.1f}'.format(
+            step, 1000 * statistics.median(result[step] for result in results)))
+
+
+if __name__ == '__main__':
+    arguments = [arg for arg in sys.argv[1:] if arg != '--display']
+    main(int(arguments[0]) if arguments else 5, '--display' in sys.argv[1:])
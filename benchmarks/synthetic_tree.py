@@ -0,0 +1,156 @@
+"""
+Generate synthetic folder trees on disk for benchmarking record_stat and
+the functions that work on its result.
+
+The shape of a tree is set by a TreeSpec: number of folders, maximum
+and mean depth, number of top-level folders, mean number of subfolders
+of a folder with subfolders (breadth), mean number of files per folder
+and the share of hidden files and folders. The PRESETS are derived from
+the typical ranges of check_collection_properties (near the lower end of
+n_folders, middle of the other ranges), scaled up 10x and 100x in number
+of folders.
+
+usage: python benchmarks/synthetic_tree.py preset|n_folders path [seed]
+"""
+
+import os
+import sys
+import math
+import random
+from collections import namedtuple
+
+TreeSpec = namedtuple('TreeSpec', [
+    'n_folders', 'depth', 'depth_mean', 'root_breadth', 'breadth',
+    'files_per_folder', 'hidden_ratio'])
+
+TYPICAL = TreeSpec(n_folders=5000, depth=15, depth_mean=7, root_breadth=16,
+                   breadth=4, files_per_folder=7, hidden_ratio=0.02)
+PRESETS = {
+    'typical': TYPICAL,
+    'typical-10x': TYPICAL._replace(n_folders=10 * TYPICAL.n_folders),
+    'typical-100x': TYPICAL._replace(n_folders=100 * TYPICAL.n_folders),
+}
+# shares of leaf and of branching folders without files, which give about
+# the typical pct_empty_folders and pct_switch_folders
+EMPTY_LEAF_RATIO = 0.1
+EMPTY_BRANCH_RATIO = 0.5
+# file times are spread over the ten years before this date
+NEWEST_MTIME = 1.6e9
+MTIME_SPREAD = 10 * 365 * 86400
+
+
+def depth_counts(spec):
+    """ Number of folders at each depth: 1 root, root_breadth top-level
+    folders and the rest spread over depths 2..depth in proportion to a
+    binomial distribution of mean depth_mean. """
+    n_rest = max(spec.n_folders - 1 - spec.root_breadth, 0)
+    p = min(max(spec.depth_mean / spec.depth, 0), 1)
+    weights = [math.comb(spec.depth, depth) * p ** depth
+               * (1 - p) ** (spec.depth - depth)
+               for depth in range(2, spec.depth + 1)]
+    total = sum(weights)
+    shares = [n_rest * weight / total for weight in weights]
+    counts = [int(share) for share in shares]
+    # largest remainders get the folders lost to rounding down
+    for ix in sorted(range(len(shares)), key=lambda ix: counts[ix] - shares[ix]
+                     )[:n_rest - sum(counts)]:
+        counts[ix] += 1
+    counts = [1, min(spec.root_breadth, spec.n_folders - 1)] + counts
+    # every level needs a parent level
+    while counts and counts[-1] == 0:
+        counts.pop()
+    return [max(count, 1) for count in counts]
+
+
+def tree_plan(spec, seed=0):
+    """ Lay out a tree without touching the disk. Returns a list of
+    (parent index, depth, n_files, hidden) tuples, one per folder, parents
+    before children; index 0 is the root, whose parent index is None.
+
+    The folders at each depth (see depth_counts) are shared among about
+    1 in `breadth` of the folders of the level above, picked at random,
+    each getting at least one, so that the mean number of subfolders of a
+    folder with subfolders is about `breadth` and the other folders are
+    leaves. Hidden folders, whose contents record_stat skips, are made
+    leaves. Folders have no files with probability EMPTY_LEAF_RATIO or
+    EMPTY_BRANCH_RATIO, and the number of files of the others is uniform
+    around a mean that makes files_per_folder the mean of all folders. """
+    rng = random.Random(seed)
+    folders = [(None, 0, False)]
+    level = [0]
+    for count in depth_counts(spec)[1:]:
+        candidates = [ix for ix in level if not folders[ix][2]] or level
+        n_parents = min(len(candidates), count,
+                        max(1, round(count / spec.breadth)))
+        parents = rng.sample(candidates, n_parents)
+        assigned = parents + [rng.choice(parents)
+                              for _ in range(count - n_parents)]
+        assigned.sort()
+        level = []
+        for parent_ix in assigned:
+            folders.append((parent_ix, folders[parent_ix][1] + 1,
+                            rng.random() < spec.hidden_ratio))
+            level.append(len(folders) - 1)
+    has_children = {parent_ix for parent_ix, _, _ in folders}
+    empty_share = (len(has_children) * EMPTY_BRANCH_RATIO
+                   + (len(folders) - len(has_children)) * EMPTY_LEAF_RATIO
+                   ) / len(folders)
+    # mean of the folders with files, for a mean of files_per_folder overall
+    files_mean = max(round(spec.files_per_folder / (1 - empty_share)), 1)
+    plan = []
+    for ix, (parent_ix, depth, hidden) in enumerate(folders):
+        empty_ratio = (EMPTY_BRANCH_RATIO if ix in has_children
+                       else EMPTY_LEAF_RATIO)
+        nfiles = 0 if rng.random() < empty_ratio else rng.randint(
+            1, 2 * files_mean - 1)
+        plan.append((parent_ix, depth, nfiles, hidden))
+    return plan
+
+
+def make_tree(root, spec, seed=0):
+    """ Create the tree of tree_plan(spec, seed) under `root`, which must
+    not exist yet. Files are empty, with random mtimes, and a share
+    hidden_ratio of them are hidden. Returns the number of folders and
+    files record_stat will find (hidden ones and their contents
+    excluded). """
+    rng = random.Random(seed + 1)
+    paths = []
+    n_folders = n_files = 0
+    visible = []
+    for ix, (parent_ix, depth, nfiles, hidden) in enumerate(tree_plan(spec, seed)):
+        if parent_ix is None:
+            path = os.fspath(root)
+            is_visible = True
+        else:
+            name = '{}folder {}'.format('.' if hidden else '', ix)
+            path = os.path.join(paths[parent_ix], name)
+            is_visible = visible[parent_ix] and not hidden
+        os.makedirs(path)
+        paths.append(path)
+        visible.append(is_visible)
+        n_folders += is_visible
+        for file_ix in range(nfiles):
+            hidden_file = rng.random() < spec.hidden_ratio
+            file_path = os.path.join(path, '{}file {}.txt'.format(
+                '.' if hidden_file else '', file_ix))
+            with open(file_path, 'w'):
+                pass
+            mtime = NEWEST_MTIME - rng.random() * MTIME_SPREAD
+            os.utime(file_path, (mtime + rng.random() * 86400, mtime))
+            n_files += is_visible and not hidden_file
+    return n_folders, n_files
+
+
+def preset_spec(name):
+    """ A preset by name, or the typical spec with n_folders folders if
+    name is a number. """
+    if name in PRESETS:
+        return PRESETS[name]
+    return TYPICAL._replace(n_folders=int(name))
+
+
+if __name__ == '__main__':
+    target = sys.argv[2]
+    result = make_tree(target, preset_spec(sys.argv[1]),
+                       int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+    print('{}: {} folders, {} files'.format(target, *result))
@@ -0,0 +1,369 @@
+"""
+Tri-state selection and exclusion of the folders of a tree, kept apart from
+the Qt model.
+
+The folder tree has two check columns: selection (column 0) and exclusion
+(column 1). Checking a folder checks its subtree and updates its parents;
+excluding a folder unchecks it, disables its selection and excludes its
+subtree. CheckStates applies those rules with plain dict updates and reports
+every (dirkey, column) that changed, so that the view can be notified once
+per click rather than once per folder. It also keeps the cumfiles of every
+folder up to date with the folders left out of the collection.
+"""
+
+# same values as Qt.CheckState
+UNCHECKED, PARTIALLY_CHECKED, CHECKED = 0, 1, 2
+SELECTION, EXCLUSION = 0, 1
+
+
+class CheckStates:
+    """ Check states of the folders of a dir_dict, and whether they are
+    enabled, by dirkey and column.
+
+    States are read from the selection_state and exclusion_state of the
+    nodes the first time they are needed, and dir_dict is never modified.
+    `childkeys(dirkey)` and `parentkey(dirkey)` give the tree structure,
+    dirkey 0 standing for the top level; the order of the children does not
+    matter.
+
+    For each folder whose children were looked at, the number of children
+    that are neither selected nor excluded and the number of enabled
+    children that are not excluded are kept up to date, so the rules only
+    look at a folder's siblings through these counts. The folders unchecked
+    in the selection column are kept in `unchecked`.
+
+    Folders that get unchecked or excluded are dropped: cumfiles(dirkey) is
+    the cumfiles of dir_dict less the files of the dropped folders below,
+    updated along the ancestors of each folder dropped or taken back, as
+    recalculate_cumfiles did by copying and recomputing the whole tree.
+    Folders are only dropped by a change, so the cumfiles of a tree as it
+    was loaded are those of dir_dict. """
+
+    def __init__(self, dir_dict, childkeys, parentkey):
+        self.dir_dict = dir_dict
+        self.childkeys = childkeys
+        self.parentkey = parentkey
+        self.states = (dict(), dict())
+        self.disabled = (set(), set())
+        self.unchecked = set()
+        self.changed = set()
+        self.pending_climbs = []
+        self.dropped = set()
+        self.dropped_files = dict()  # dirkey: files of dropped folders below
+        self.cumfiles_changed = set()
+        # parentkey: [children neither selected nor excluded,
+        #             enabled children not excluded]
+        self.child_counts = dict()
+
+    def state(self, dirkey, column):
+        states = self.states[column]
+        if dirkey not in states:
+            field = 'selection_state' if column == SELECTION else 'exclusion_state'
+            state = self.dir_dict[dirkey][field]
+            states[dirkey] = UNCHECKED if state is None else int(state)
+        return states[dirkey]
+
+    def enabled(self, dirkey, column):
+        return dirkey not in self.disabled[column]
+
+    def cumfiles(self, dirkey):
+        return self.dir_dict[dirkey]['cumfiles'] - self.dropped_files.get(dirkey, 0)
+
+    def set_state(self, dirkey, column, state):
+        """ Change a check state, e.g., on a click, and apply the rules.
+        Returns the set of (dirkey, column) whose state or enabled
+        changed; the folders whose cumfiles changed are left in
+        cumfiles_changed. """
+        self.changed = set()
+        if self._set(dirkey, column, state=int(state)):
+            self._column_changed(dirkey, column)
+        return self._take_changed()
+
+    def set_enabled(self, dirkey, column, enabled):
+        """ Enable or disable a check box and apply the rules, see
+        set_state. """
+        self.changed = set()
+        if self._set(dirkey, column, enabled=enabled):
+            self._column_changed(dirkey, column)
+        return self._take_changed()
+
+    def invalidate_counts(self):
+        """ Forget the child counts, e.g., after folders were added. """
+        self.child_counts = dict()
+
+    def all_siblings_checked(self, dirkey):
+        """ Whether all the siblings of a folder, itself included, are
+        either selected or excluded. """
+        parentkey = self.parentkey(dirkey)
+        if not parentkey:
+            return True
+        return self._child_counts(parentkey)[0] == 0
+
+    def all_children_excluded(self, dirkey):
+        """ Whether all enabled children of a folder (of the top level for
+        dirkey 0) are excluded. """
+        return self._child_counts(dirkey)[1] == 0
+
+    def _take_changed(self):
+        changed, self.changed = self.changed, set()
+        self._update_cumfiles({dirkey for dirkey, _ in changed})
+        return changed
+
+    def _update_cumfiles(self, dirkeys):
+        """ Drop the folders among dirkeys that were unchecked or excluded
+        and take back those that no longer are. Parents are dropped before
+        their children and children taken back before their parents (keys
+        of children are larger), so that each update stops at the first
+        dropped ancestor instead of going up to the top. """
+        self.cumfiles_changed = set()
+        dropping, restoring = [], []
+        for dirkey in dirkeys:
+            dropped = (self.state(dirkey, SELECTION) == UNCHECKED
+                       or self.state(dirkey, EXCLUSION) == CHECKED)
+            if dropped and dirkey not in self.dropped:
+                dropping.append(dirkey)
+            elif not dropped and dirkey in self.dropped:
+                restoring.append(dirkey)
+        for dirkey in sorted(dropping):
+            self.dropped.add(dirkey)
+            self._add_to_ancestors(dirkey, -self.cumfiles(dirkey))
+        for dirkey in sorted(restoring, reverse=True):
+            self.dropped.remove(dirkey)
+            self._add_to_ancestors(dirkey, self.cumfiles(dirkey))
+
+    def _add_to_ancestors(self, dirkey, nfiles):
+        """ Add to the cumfiles of the ancestors of a folder, up to the
+        first dropped one, whose own parent does not count it. """
+        if nfiles == 0:
+            return
+        dirkey = self.parentkey(dirkey)
+        while dirkey:
+            self.dropped_files[dirkey] = self.dropped_files.get(dirkey, 0) - nfiles
+            self.cumfiles_changed.add(dirkey)
+            if dirkey in self.dropped:
+                break
+            dirkey = self.parentkey(dirkey)
+
+    def _child_counts(self, dirkey):
+        if dirkey not in self.child_counts:
+            counts = [0, 0]
+            for childkey in self.childkeys(dirkey):
+                unselected, unexcluded = self._counted(childkey)
+                counts[0] += unselected
+                counts[1] += unexcluded
+            self.child_counts[dirkey] = counts
+        return self.child_counts[dirkey]
+
+    def _counted(self, dirkey):
+        excluded = self.state(dirkey, EXCLUSION) == CHECKED
+        return (not excluded and self.state(dirkey, SELECTION) != CHECKED,
+                not excluded and self.enabled(dirkey, EXCLUSION))
+
+    def _set(self, dirkey, column, state=None, enabled=None):
+        """ Change a state and/or enabled, keeping the counts of the parent
+        up to date. Returns whether anything changed. """
+        old_state = self.state(dirkey, column)
+        old_enabled = self.enabled(dirkey, column)
+        if state is None:
+            state = old_state
+        if enabled is None:
+            enabled = old_enabled
+        if state == old_state and enabled == old_enabled:
+            return False
+        counts = self.child_counts.get(self.parentkey(dirkey))
+        if counts is not None:
+            unselected, unexcluded = self._counted(dirkey)
+            counts[0] -= unselected
+            counts[1] -= unexcluded
+        self.states[column][dirkey] = state
+        if enabled:
+            self.disabled[column].discard(dirkey)
+        else:
+            self.disabled[column].add(dirkey)
+        if counts is not None:
+            unselected, unexcluded = self._counted(dirkey)
+            counts[0] += unselected
+            counts[1] += unexcluded
+        self.changed.add((dirkey, column))
+        return True
+
+    def _column_changed(self, dirkey, column):
+        if column == SELECTION:
+            self._propagate_selection(dirkey)
+        else:
+            self._propagate_exclusion(dirkey)
+
+    def _track(self, dirkey):
+        if self.state(dirkey, SELECTION) == UNCHECKED:
+            self.unchecked.add(dirkey)
+        else:
+            self.unchecked.discard(dirkey)
+
+    def _select(self, dirkey, state=None, enabled=None, defer_climb=False):
+        """ Change the selection column of a folder while applying the
+        exclusion rules, and propagate it. With defer_climb, the change is
+        propagated to the folder's subtree right away, and to its parents
+        once the rules are done with all the folders (see
+        _propagate_exclusion). """
+        if self._set(dirkey, SELECTION, state, enabled):
+            self._propagate_selection(dirkey, climb=not defer_climb)
+            if defer_climb:
+                self.pending_climbs.append(dirkey)
+
+    def _propagate_selection(self, dirkey, to_children=True, climb=True):
+        """ Propagate a folder's selection to its children and then up to
+        its parents, one level at a time, stopping at the first parent
+        whose selection is left unchanged. """
+        propagate_to_children = to_children
+        while dirkey:
+            state = self.state(dirkey, SELECTION)
+            if state == PARTIALLY_CHECKED:
+                if (len(self.childkeys(dirkey)) == 0
+                        or self.state(dirkey, EXCLUSION) == PARTIALLY_CHECKED):
+                    self._set(dirkey, SELECTION, CHECKED)
+                    self._track(dirkey)
+                    continue
+            if propagate_to_children:
+                self._propagate_to_children(dirkey, state)
+                # a parent only becomes checked when all its other children
+                # are, so there is nothing to propagate back down
+                propagate_to_children = False
+            self._track(dirkey)
+            parentkey = self.parentkey(dirkey)
+            if not (climb and parentkey):
+                break
+            parent_state = self.state(parentkey, SELECTION)
+            self._propagate_to_parent(dirkey)
+            if self.state(parentkey, SELECTION) == parent_state:
+                break
+            dirkey = parentkey
+
+    def _propagate_to_children(self, dirkey, state):
+        """ If a folder is checked or unchecked, so are all the enabled
+        folders of its subtree. """
+        if state == PARTIALLY_CHECKED:
+            return
+        stack = [dirkey]
+        while stack:
+            dirkey = stack.pop()
+            if self.enabled(dirkey, SELECTION):
+                if self._set(dirkey, SELECTION, state):
+                    self._track(dirkey)
+                stack.extend(self.childkeys(dirkey))
+
+    def _propagate_to_parent(self, dirkey):
+        """ If some children are unchecked, make parent partially checked.
+        If all children are checked, give parent a full checkmark. """
+        state = self.state(dirkey, SELECTION)
+        parentkey = self.parentkey(dirkey)
+        if not parentkey:
+            return
+        if self.all_siblings_checked(dirkey):
+            self._set_tracked(parentkey, CHECKED)
+        if (state in (CHECKED, PARTIALLY_CHECKED)
+                and self.state(parentkey, SELECTION) == UNCHECKED):
+            self._set_tracked(parentkey, PARTIALLY_CHECKED)
+        if (state in (UNCHECKED, PARTIALLY_CHECKED)
+                and self.state(parentkey, SELECTION) == CHECKED
+                # only account for non-excluded folders
+                and self.state(dirkey, EXCLUSION) in (
+                        UNCHECKED, PARTIALLY_CHECKED)):
+            self._set_tracked(parentkey, PARTIALLY_CHECKED)
+
+    def _set_tracked(self, dirkey, state):
+        if self._set(dirkey, SELECTION, state):
+            self._track(dirkey)
+
+    def _propagate_exclusion(self, dirkey):
+        """ Apply the exclusion rules to a folder whose exclusion changed.
+        Changing the exclusion of other folders applies the rules to them
+        in turn, before going on with the current folder; an explicit stack
+        of rule applications keeps deep trees from exhausting the call
+        stack.
+
+        When a folder is no longer excluded, every folder of its subtree
+        becomes selected. These selections only reach the parents of their
+        folder at the end, in the order they were made: by then the folders
+        below have their final state, so each of these updates stops at the
+        first unchanged parent, instead of every folder of the subtree
+        updating all its ancestors back and forth. Since these updates stop
+        early, the ancestors of the selected folders are then recomputed
+        from their children, as the back and forth updates left them. """
+        self.pending_climbs = []
+        stack = [self._exclusion_rules(dirkey)]
+        while stack:
+            try:
+                changed_key = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+            else:
+                stack.append(self._exclusion_rules(changed_key))
+        for dirkey in self.pending_climbs:
+            self._propagate_selection(dirkey, to_children=False)
+        self._recompute_ancestors(self.pending_climbs)
+        self.pending_climbs = []
+
+    def _recompute_ancestors(self, dirkeys):
+        """ Check the ancestors of dirkeys whose children are all
+        selected or excluded, and partially check those that are checked
+        while some are not, children first (keys of children are larger). """
+        ancestors = set()
+        for dirkey in dirkeys:
+            dirkey = self.parentkey(dirkey)
+            while dirkey and dirkey not in ancestors:
+                ancestors.add(dirkey)
+                dirkey = self.parentkey(dirkey)
+        for dirkey in sorted(ancestors, reverse=True):
+            if (not self.enabled(dirkey, SELECTION)
+                    or self.state(dirkey, EXCLUSION) != UNCHECKED):
+                continue
+            state = self.state(dirkey, SELECTION)
+            if self._child_counts(dirkey)[0] == 0:
+                if state != CHECKED:
+                    self._set_tracked(dirkey, CHECKED)
+            elif state == CHECKED:
+                self._set_tracked(dirkey, PARTIALLY_CHECKED)
+
+    def _exclusion_rules(self, dirkey):
+        """ If a folder is excluded, it cannot be selected until its
+        exclusion is unchecked. Yields the folders whose exclusion changed
+        along the way. """
+        exclusion = self.state(dirkey, EXCLUSION)
+        parentkey = self.parentkey(dirkey)
+        childkeys = list(self.childkeys(dirkey))
+        if exclusion == UNCHECKED:
+            self._select(dirkey, enabled=True, defer_climb=True)
+            self._select(dirkey, CHECKED, defer_climb=True)
+            for childkey in childkeys:
+                if self._set(childkey, EXCLUSION, UNCHECKED):
+                    yield childkey
+                if self._set(childkey, EXCLUSION, enabled=True):
+                    yield childkey
+        elif exclusion == PARTIALLY_CHECKED:
+            if len(childkeys) == 0:
+                if self._set(dirkey, EXCLUSION, CHECKED):
+                    yield dirkey
+            elif self.all_children_excluded(dirkey):
+                for childkey in childkeys:
+                    if self._set(childkey, EXCLUSION, enabled=False):
+                        yield childkey
+            else:
+                self._select(dirkey, CHECKED)
+                for childkey in childkeys:
+                    if self._set(childkey, EXCLUSION, CHECKED):
+                        yield childkey
+                    if self._set(childkey, EXCLUSION, enabled=False):
+                        yield childkey
+        elif exclusion == CHECKED:
+            if self.all_children_excluded(parentkey):
+                # make parent partially excluded if all children are
+                if parentkey and self.enabled(parentkey, SELECTION):
+                    if self._set(parentkey, EXCLUSION, PARTIALLY_CHECKED):
+                        yield parentkey
+            self._select(dirkey, UNCHECKED)
+            self._select(dirkey, enabled=False)
+            for childkey in childkeys:
+                if self._set(childkey, EXCLUSION, CHECKED):
+                    yield childkey
+                if self._set(childkey, EXCLUSION, enabled=False):
+                    yield childkey
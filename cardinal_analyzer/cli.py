@@ -0,0 +1,348 @@
+"""
+Headless command line interface for scanning and measuring folders without
+the wizard, e.g., on servers or from cron. Only the data modules are
+imported, never PyQt5.
+
+usage:
+    python cli.py scan ROOT [ROOT ...] [-o DIR] [--format json|session|none]
+        [--processes N] [--workers N] [--cache-dir DIR] [--remove PATH ...]
+        [--rename-folders] [--profile] [--one-filesystem]
+        [--dedup-hardlinks | --counts-only] [--exclude PATTERN ...] [-q]
+    python cli.py measure FILE [FILE ...] [-o FILE] [-q]
+    python cli.py cohort INPUT [INPUT ...] [-o TABLE] [--processes N] [-q]
+
+scan records and computes the statistics of every root, anonymizes them
+if asked, saves one file per root in the output folder (in the JSON or
+binary session format the wizard loads) and measures the roots together,
+writing measurement.json. measure does the same measurement from saved
+files. The measurement is also printed. cohort measures each saved file
+(or each one found in the given folders) on its own, in parallel, into a
+CSV table with a row per participant (see cohort.py). The exit status is 1
+if a root could not be scanned or a file could not be read.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from drive_analyzer import (
+    scan_roots, compute_stat, anonymize_stat, drive_measurement,
+    check_collection_properties, write_json, compute_subtree_stat,
+    hydrate_filestat)
+from cohort import load_submission, run_cohort
+from exclusion import ExclusionRules
+from instrument import ScanInstrument
+from nodetable import NodeTable
+from session import save_session, SESSION_SUFFIX
+
+OUTPUT_FORMATS = ['json', 'session', 'none']
+MEASUREMENT_FILENAME = 'measurement.json'
+PROFILE_FILENAME = 'profile.json'
+
+
+def find_dirkey(dir_dict, root, path):
+    """ Key of the folder at `path`, absolute or relative to the root
+    folder, or None if it is not in dir_dict. """
+    path = Path(path)
+    if path.is_absolute():
+        try:
+            path = path.relative_to(root)
+        except ValueError:
+            return None
+    dirkey = 1
+    for name in path.parts:
+        dirkey = next((childkey for childkey in dir_dict[dirkey]['childkeys']
+                       if dir_dict[childkey]['dirname'] == name), None)
+        if dirkey is None:
+            return None
+    return dirkey
+
+
+def anonymize(dir_dict, root, removed_paths=(), rename_folders=False):
+    """ Remove the folders at removed_paths (see find_dirkey), and rename
+    every folder but the root to 'folder <key>' if rename_folders. Returns
+    the paths that were not found. """
+    removed_dirs = []
+    missing = []
+    for path in removed_paths:
+        dirkey = find_dirkey(dir_dict, root, path)
+        if dirkey is None:
+            missing.append(path)
+        elif dirkey != 1:
+            removed_dirs.append(dirkey)
+    renamed_dirs = None
+    if rename_folders:
+        renamed_dirs = {dirkey: 'folder {}'.format(dirkey)
+                        for dirkey in dir_dict if dirkey != 1}
+    if removed_dirs or renamed_dirs:
+        anonymize_stat(dir_dict, removed_dirs, renamed_dirs)
+    return missing
+
+
+def output_path(output_dir, root, output_format, used_names):
+    """ Path of the file saving a root, named after its folder, with a
+    number added if another root has the same name. """
+    name = Path(root).name or 'root'
+    suffix = SESSION_SUFFIX if output_format == 'session' else '.json'
+    candidate = name
+    index = 2
+    while candidate in used_names:
+        candidate = '{} {}'.format(name, index)
+        index += 1
+    used_names.add(candidate)
+    return os.path.join(output_dir, candidate + suffix)
+
+
+def save_tree(path, dir_dict, output_format, exclude=None):
+    fields = {'software_choice': '',
+              'exclude': [] if exclude is None else exclude.patterns}
+    if output_format == 'session':
+        save_session(path, NodeTable.from_dir_dict(dir_dict), fields)
+    else:
+        with open(path, 'w', encoding='utf8') as file:
+            write_json(file, dir_dict, fields)
+
+
+def load_tree(path):
+    """ dir_dict (or NodeTable view) saved by save_tree or the wizard. """
+    dir_dict, _ = load_submission(path)
+    if isinstance(dir_dict, dict):
+        compute_subtree_stat(dir_dict)
+    return dir_dict
+
+
+def measurement(dir_dict_list):
+    """ drive_measurement of the trees with the result of
+    check_collection_properties, as a JSON serializable dict. """
+    properties = drive_measurement(dir_dict_list, allow_stat_error=True)
+    is_typical, typical_ranges, diff = check_collection_properties(properties)
+    return {'properties': properties, 'is_typical': is_typical,
+            'typical_ranges': typical_ranges, 'diff': diff}
+
+
+def print_measurement(result, file=sys.stdout):
+    print('{:<28}{:>16}  {}'.format('property', 'value', 'typical range'),
+          file=file)
+    for label, value in result['properties'].items():
+        typical_range = result['typical_ranges'].get(label)
+        flag = '' if result['diff'].get(label) is None else '  *'
+        print('{:<28}{:>16}  {}{}'.format(
+            label, value if not isinstance(value, float)
+            else '{:.2f}'.format(value),
+            '' if typical_range is None else typical_range, flag), file=file)
+    print('typical: {}'.format(result['is_typical']), file=file)
+
+
+def write_result(path, result):
+    with open(path, 'w', encoding='utf8') as file:
+        json.dump(result, file, indent=4)
+
+
+def scan_command(args):
+    try:
+        exclude = ExclusionRules(args.exclude)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    os.makedirs(args.output, exist_ok=True)
+    cache_paths = None
+    if args.cache_dir is not None:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        cache_paths = [os.path.join(args.cache_dir, '{}.cache'.format(
+            hashlib.sha1(os.path.abspath(root).encode('utf8')).hexdigest()[:16]))
+            for root in args.roots]
+    scans = scan_roots(
+        args.roots, args.processes, args.workers, cache_paths,
+        progress=None if args.quiet else lambda root, nfolders: print(
+            '{}: {} folders'.format(root, nfolders), file=sys.stderr),
+        profile=args.profile, one_filesystem=args.one_filesystem,
+        dedup_hardlinks=args.dedup_hardlinks, exclude=exclude,
+        counts_only=args.counts_only)
+    status = 0
+    dir_dict_list = []
+    used_names = set()
+    roots = []
+    profiles = dict()
+    for scan in scans:
+        root = scan['root']
+        if scan['error'] is not None:
+            print('{}: {}'.format(root, scan['error']), file=sys.stderr)
+            status = 1
+            roots.append({'root': root, 'error': scan['error']})
+            continue
+        dir_dict = scan['dir_dict']
+        if args.counts_only and args.format != 'none':
+            # saved trees hold the file statistics of a full scan
+            hydrate_filestat(dir_dict, root, workers=args.workers)
+        instrument = None
+        if args.profile:
+            instrument = ScanInstrument()
+            instrument.add_report(scan['profile'])
+        compute_stat(dir_dict, instrument=instrument)
+        for path in anonymize(dir_dict, root, args.remove, args.rename_folders):
+            print('{}: {} not found, not removed'.format(root, path),
+                  file=sys.stderr)
+        root_result = {'root': root, 'error': None,
+                       'n_folders': len(dir_dict), 'seconds': scan['seconds'],
+                       'output': None}
+        if args.format != 'none':
+            root_result['output'] = output_path(
+                args.output, root, args.format, used_names)
+            save_tree(root_result['output'], dir_dict, args.format, exclude)
+        if instrument is not None:
+            profiles[root] = instrument.report()
+        roots.append(root_result)
+        dir_dict_list.append(dir_dict)
+    result = {'roots': roots}
+    if dir_dict_list:
+        result.update(measurement(dir_dict_list))
+        if not args.quiet:
+            print_measurement(result)
+    write_result(os.path.join(args.output, MEASUREMENT_FILENAME), result)
+    if args.profile:
+        write_result(os.path.join(args.output, PROFILE_FILENAME), profiles)
+    return status
+
+
+def measure_command(args):
+    status = 0
+    dir_dict_list = []
+    files = []
+    for path in args.files:
+        try:
+            dir_dict_list.append(load_tree(path))
+        except (OSError, ValueError, KeyError) as error:
+            print('{}: {}'.format(path, error), file=sys.stderr)
+            files.append({'file': path, 'error': str(error)})
+            status = 1
+        else:
+            files.append({'file': path, 'error': None})
+    result = {'files': files}
+    if dir_dict_list:
+        result.update(measurement(dir_dict_list))
+        if not args.quiet:
+            print_measurement(result)
+    if args.output is not None:
+        write_result(args.output, result)
+    return status
+
+
+def cohort_command(args):
+    errors = []
+
+    def progress(done, total, row):
+        if row['error']:
+            errors.append(row['file'])
+            print('{}: {}'.format(row['file'], row['error']), file=sys.stderr)
+        elif not args.quiet:
+            print('{}/{} {}'.format(done, total, row['file']), file=sys.stderr)
+
+    n_measured, n_skipped = run_cohort(
+        args.inputs, args.output, args.processes, progress)
+    if not args.quiet:
+        print('{} measured, {} unchanged since the last run, table: {}'.format(
+            n_measured, n_skipped, args.output))
+    return 1 if errors else 0
+
+
+def parser():
+    main_parser = argparse.ArgumentParser(
+        prog='cli.py', description='Scan and measure folders without the GUI.')
+    main_parser.add_argument('-q', '--quiet', action='store_true',
+                             help='only print errors')
+    # -q is also accepted after the command; suppressed so that it does not
+    # reset a -q given before it
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-q', '--quiet', action='store_true',
+                        default=argparse.SUPPRESS, help='only print errors')
+    commands = main_parser.add_subparsers(dest='command', required=True)
+
+    scan = commands.add_parser(
+        'scan', parents=[common],
+        help='scan root folders, save and measure them')
+    scan.add_argument('roots', nargs='+', metavar='ROOT')
+    scan.add_argument('-o', '--output', default='.', metavar='DIR',
+                      help='folder for the saved trees and measurement.json '
+                           '(default: current folder)')
+    scan.add_argument('--format', choices=OUTPUT_FORMATS, default='json',
+                      help='format of the saved trees, or none to only '
+                           'measure (default: json)')
+    scan.add_argument('--processes', type=int, metavar='N',
+                      help='roots scanned at once (default: one per root, '
+                           'at most one per CPU)')
+    scan.add_argument('--workers', type=int, metavar='N',
+                      help='threads listing folders within each root')
+    scan.add_argument('--cache-dir', metavar='DIR',
+                      help='keep a scan cache per root in DIR, so that '
+                           'later scans only list modified folders')
+    scan.add_argument('--remove', action='append', default=[], metavar='PATH',
+                      help='leave out a folder and its subfolders, given '
+                           'relative to its root or as an absolute path '
+                           '(repeatable)')
+    scan.add_argument('--rename-folders', action='store_true',
+                      help="replace folder names with 'folder <key>'")
+    scan.add_argument('--profile', action='store_true',
+                      help='time the scan phases and count file system '
+                           'calls into profile.json')
+    scan.add_argument('--one-filesystem', action='store_true',
+                      help='do not descend into folders on other file '
+                           'systems than their root, e.g., mounted drives')
+    scan.add_argument('--dedup-hardlinks', action='store_true',
+                      help='count a file with several hard links, or a '
+                           'folder mounted twice, only once (not with '
+                           '--counts-only)')
+    scan.add_argument('--exclude', action='append', default=[],
+                      metavar='PATTERN',
+                      help='do not scan folders matching PATTERN: a glob '
+                           'matching the folder name (e.g., node_modules), '
+                           "a glob with '/' matching the path relative to "
+                           "the root, or 're:' and a regular expression "
+                           'searched in that path (repeatable)')
+    scan.add_argument('--counts-only', action='store_true',
+                      help='count files without stat\'ing them, which is '
+                           'enough for the measurement; with --format json '
+                           'or session, the statistics are read before '
+                           'saving')
+    scan.set_defaults(run=scan_command)
+
+    measure = commands.add_parser(
+        'measure', parents=[common],
+        help='measure trees saved by scan or the wizard')
+    measure.add_argument('files', nargs='+', metavar='FILE')
+    measure.add_argument('-o', '--output', metavar='FILE',
+                         help='write the measurement to FILE as JSON')
+    measure.set_defaults(run=measure_command)
+
+    cohort = commands.add_parser(
+        'cohort', parents=[common],
+        help='measure many submissions, one table row each')
+    cohort.add_argument('inputs', nargs='+', metavar='INPUT',
+                        help='saved files, or folders searched for saved '
+                             'trees (other JSON files, e.g., '
+                             'measurement.json, are left out); a participant '
+                             'is named by the path below its INPUT folder')
+    cohort.add_argument('-o', '--output', default='cohort.csv',
+                        metavar='TABLE',
+                        help='CSV table the rows are appended to; files '
+                             'already in it and unchanged are skipped '
+                             '(default: cohort.csv)')
+    cohort.add_argument('--processes', type=int, metavar='N',
+                        help='files measured at once (default: one per CPU)')
+    cohort.set_defaults(run=cohort_command)
+    return main_parser
+
+
+def main(argv=None):
+    main_parser = parser()
+    args = main_parser.parse_args(argv)
+    if args.command == 'scan' and args.counts_only and args.dedup_hardlinks:
+        # counted files are not stat'ed, so their hard links are unknown
+        main_parser.error('--dedup-hardlinks cannot be used with '
+                          '--counts-only')
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
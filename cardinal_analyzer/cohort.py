@@ -0,0 +1,183 @@
+"""
+Cohort analysis: measure many collected submissions (the JSON or session
+files saved by the wizard, or by cli.py scan) in a process pool and stream
+the results into one CSV table, with a row per submission holding every
+drive_measurement property and its difference to the typical range (see
+check_collection_properties).
+
+The table doubles as a record of the work done: a submission whose file
+size and modification time match its row is skipped on the next run, so
+only new or changed submissions are measured again.
+
+Submissions usually all have the wizard's default name, so participants
+are told apart by the folders they were collected into, see
+find_submissions.
+"""
+
+import os
+import re
+import csv
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from drive_analyzer import (
+    drive_measurement, check_collection_properties, read_json,
+    PROPERTY_LABELS, TYPICAL_LABELS)
+from session import load_session, is_session_file, SESSION_SUFFIX
+
+SUBMISSION_SUFFIXES = ('.json', SESSION_SUFFIX)
+# write_json, and json.dump in earlier versions, write dir_dict first
+SUBMISSION_JSON_START = re.compile(rb'\s*\{\s*"dir_dict"\s*:')
+COHORT_FIELDS = (['participant', 'file', 'size', 'mtime_ns', 'error',
+                  'is_typical', 'software_choice'] + PROPERTY_LABELS
+                 + ['diff_' + label for label in TYPICAL_LABELS])
+
+
+def load_submission(path):
+    """ (dir_dict or NodeTable view, software choice) of a saved file. """
+    if is_session_file(path):
+        table, metadata = load_session(path)
+        return table.view(), metadata.get('software_choice', '')
+    with open(path, 'r', encoding='utf8') as file:
+        super_dict = read_json(file)
+    return super_dict['dir_dict'], super_dict.get('software_choice', '')
+
+
+def is_submission_file(path):
+    """ Whether a file is a session, or a JSON file starting with dir_dict
+    as saved by the wizard, which tells submissions apart from other JSON
+    files such as the measurement.json and profile.json of cli.py scan. """
+    if is_session_file(path):
+        return True
+    try:
+        with open(path, 'rb') as file:
+            start = file.read(256)
+    except OSError:
+        return False
+    return SUBMISSION_JSON_START.match(start) is not None
+
+
+def participant_name(path, input_dir=None):
+    """ Participant of a submission: its path relative to the input folder
+    it was found in, without suffix, e.g., 'p01/my_folder_data', or for a
+    file given directly, its parent folder and name. """
+    path = Path(path)
+    if input_dir is not None:
+        relative = path.relative_to(input_dir).with_suffix('')
+    else:
+        relative = Path(path.parent.name, path.stem)
+    return relative.as_posix()
+
+
+def find_submissions(inputs):
+    """ (path, participant) of the submission files among `inputs`, in
+    sorted order. Files are taken as given; folders are searched
+    recursively for files that is_submission_file recognizes, others are
+    left out. """
+    submissions = dict()
+    for path in inputs:
+        path = Path(path)
+        if path.is_dir():
+            for child in path.rglob('*'):
+                if (child.suffix in SUBMISSION_SUFFIXES and child.is_file()
+                        and is_submission_file(child)):
+                    submissions.setdefault(
+                        str(child), participant_name(child, path))
+        else:
+            submissions.setdefault(str(path), participant_name(path))
+    return sorted(submissions.items())
+
+
+def file_version(path):
+    """ (size, mtime_ns) of a file, as stored in the table. """
+    file_stat = os.stat(path)
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+def measure_submission(path, participant):
+    """ Process pool task: the table row of one submission. A submission
+    that cannot be read or measured gets a row with its error, so it is
+    not retried until it changes; one that is gone or cannot be stat'ed is
+    retried on the next run. """
+    row = {'participant': participant, 'file': path, 'size': None,
+           'mtime_ns': None, 'error': ''}
+    try:
+        row['size'], row['mtime_ns'] = file_version(path)
+        dir_dict, software_choice = load_submission(path)
+        properties = drive_measurement([dir_dict], allow_stat_error=True)
+        is_typical, _, diff = check_collection_properties(properties)
+    except Exception as error:  # e.g., a truncated or foreign file
+        row['error'] = '{}: {}'.format(type(error).__name__, error)
+        return row
+    row['is_typical'] = is_typical
+    row['software_choice'] = software_choice
+    row.update(properties)
+    row.update(('diff_' + label, value) for label, value in diff.items())
+    return row
+
+
+def read_table(table_path):
+    """ Rows of an existing table, by file; the last row of a file wins. """
+    rows = dict()
+    try:
+        with open(table_path, 'r', newline='', encoding='utf8') as file:
+            for row in csv.DictReader(file):
+                rows[row['file']] = row
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def is_current(row, path):
+    try:
+        size, mtime_ns = file_version(path)
+    except OSError:
+        return False
+    return row['size'] == str(size) and row['mtime_ns'] == str(mtime_ns)
+
+
+def run_cohort(inputs, table_path, processes=None, progress=None):
+    """ Measure the submissions among `inputs` (see find_submissions) that
+    are not in the table at table_path yet, or changed since, and append
+    their rows to it as they complete. Outdated rows are dropped at the end.
+
+    processes: size of the process pool, defaults to one per CPU
+    progress: optional callable progress(done, total, row), called after
+        each measured submission
+
+    Returns the number of submissions measured and skipped. """
+    submissions = find_submissions(inputs)
+    done_rows = read_table(table_path)
+    pending = [(path, participant) for path, participant in submissions
+               if path not in done_rows or not is_current(done_rows[path], path)]
+    outdated = any(path in done_rows for path, _ in pending)
+    new_table = not os.path.exists(table_path)
+    with open(table_path, 'a', newline='', encoding='utf8') as file:
+        writer = csv.DictWriter(file, COHORT_FIELDS)
+        if new_table:
+            writer.writeheader()
+        if pending:
+            with ProcessPoolExecutor(processes) as executor:
+                futures = [executor.submit(measure_submission, path,
+                                           participant)
+                           for path, participant in pending]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    row = future.result()
+                    writer.writerow(row)
+                    # rows are kept if the run is interrupted
+                    file.flush()
+                    if progress is not None:
+                        progress(done, len(pending), row)
+    if outdated:
+        compact_table(table_path)
+    return len(pending), len(submissions) - len(pending)
+
+
+def compact_table(table_path):
+    """ Rewrite a table with only the last row of each file. """
+    rows = read_table(table_path)
+    tmp_path = table_path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf8') as file:
+        writer = csv.DictWriter(file, COHORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows.values())
+    os.replace(tmp_path, table_path)
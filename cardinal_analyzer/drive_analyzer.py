@@ -1,111 +1,696 @@
 import os
+import re
 import sys
+import stat
 import ctypes
 import statistics
+import json
 import pickle
+import time
+import operator
+import multiprocessing
+from queue import Empty
 from pathlib import Path
-from collections import Counter
+from itertools import compress
+from collections import Counter, deque
+from collections.abc import Mapping
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                wait, TimeoutError as FutureTimeoutError)
+from filestat import STAT_ATTR, FileStatColumns
+from instrument import ScanInstrument, format_report
+from nodetable import NodeTableView
+from sketch import DEFAULT_K, KLLSketch
+try:
+    import numpy as np
+except ImportError:  # optional, used by folder_histograms when installed
+    np = None
 
+WINDOWS = sys.platform in ['Windows', 'win32']
+FILE_ATTRIBUTE_HIDDEN = 2
+SCAN_CACHE_VERSION = 3
+CACHE_RACY_SECONDS = 2
+SCAN_POLL_SECONDS = 0.1
+SKETCH_PERCENTILES = [5, 25, 50, 75, 95]
+# properties computed by drive_measurement, and the ones with a typical
+# range in check_collection_properties
+PROPERTY_LABELS = [
+    'n_roots', 'n_files', 'n_folders', 'breadth_max', 'breadth_mean',
+    'root_n_folders', 'n_leaf_folders', 'pct_leaf_folders',
+    'depth_leaf_folders_mean', 'n_switch_folders', 'pct_switch_folders',
+    'depth_switch_folders_mean', 'depth_max', 'depth_folders_mode',
+    'depth_folders_mean', 'branching_factor', 'root_n_files', 'n_files_mean',
+    'n_empty_folders', 'pct_empty_folders', 'depth_files_mean',
+    'depth_files_mode', 'file_breadth_mode_n_files']
+TYPICAL_LABELS = PROPERTY_LABELS[1:]
+if not WINDOWS:
+    # os.access checks permissions against the real (not effective) ids
+    _ACCESS_UID = os.getuid()
+    _ACCESS_GIDS = set(os.getgroups()) | {os.getgid()}
 
-def record_stat(root):
+
+class ScanCancelled(Exception):
+    """ Raised by iter_stat (and record_stat) when its `cancel` event is
+    set. """
+
+
+class InodeIndex:
+    """ (dev, ino) index that iter_stat builds in key order when scanning
+    with one_filesystem or dedup_hardlinks.
+
+    device: st_dev of the root folder, or None to cross file systems
+    folders: key of the folder listed for each (dev, ino)
+    files: key of the folder that counted each hard linked file
+    """
+    def __init__(self, device=None):
+        self.device = device
+        self.folders = dict()
+        self.files = dict()
+
+    def is_mount(self, dir_stat):
+        """ Whether a folder is on another file system than the root. """
+        return self.device is not None and dir_stat.st_dev != self.device
+
+    def add_folder(self, dirkey, dir_stat):
+        """ Record a folder, returning False if it was already listed under
+        another key, e.g., through a bind mount or a folder hard link. """
+        inode = (dir_stat.st_dev, dir_stat.st_ino)
+        if inode in self.folders:
+            return False
+        self.folders[inode] = dirkey
+        return True
+
+    def add_files(self, dirkey, links):
+        """ Record the hard linked files of a folder, given as (dev, ino,
+        filestat row) tuples by _scan_dir. Returns the links whose file was
+        counted already, in this folder or another. """
+        duplicates = []
+        for link in links:
+            inode = link[:2]
+            if inode in self.files:
+                duplicates.append(link)
+            else:
+                self.files[inode] = dirkey
+        return duplicates
+
+
+def record_stat(root, workers=None, cache_path=None, cancel=None,
+                dir_timeout=None, progress=None, progress_interval=0.5,
+                instrument=None, one_filesystem=False, dedup_hardlinks=False,
+                exclude=None, counts_only=False):
     """ Do a walk from the root folder and collect statistics of all the files
     within each subfolder. For the sake of anonymity, file names are not
     stored. Folder names are stored but users can opt out and choose
     alternative names. Folders can be excluded from the tree.
 
+    See iter_stat for the meaning of `workers`, `cache_path`, `cancel`,
+    `dir_timeout`, `progress`, `instrument`, `one_filesystem`,
+    `dedup_hardlinks`, `exclude` and `counts_only`.
+
     dirname: directory name
     dirparent: parent key
     childkeys: children keys
     depth: current folder's depth
     nfiles: number of files found in directory
     cumfiles: cumulative count of accessible files
-    filestat: statistics for each file in the folder
-    aggfilestat: aggregated statistics for a folder's files
+    filestat: statistics for each file in the folder (FileStatColumns), or
+        None until hydrate_filestat is run after a counts_only scan
+    aggfilestat: aggregated statistics for a folder's files and subtree
+    """
+    return dict(iter_stat(root, workers, cache_path, cancel, dir_timeout,
+                          progress, progress_interval, instrument,
+                          one_filesystem, dedup_hardlinks, exclude,
+                          counts_only))
+
+
+def scan_roots(roots, processes=None, workers=None, cache_paths=None,
+               progress=None, progress_interval=0.5, profile=False,
+               one_filesystem=False, dedup_hardlinks=False, exclude=None,
+               counts_only=False):
+    """ Run record_stat on several root folders concurrently, each root in
+    its own process, so that scanning, e.g., a home folder, Dropbox and an
+    external drive together takes about as long as the largest of them.
+
+    processes: size of the process pool, defaults to one process per root
+        (at most one per CPU)
+    workers: threads used within each root, see iter_stat
+    cache_paths: optional list with a scan cache path (or None) per root
+    progress: optional callable progress(root, nfolders), called from the
+        calling process about every progress_interval seconds per root
+        while it is being scanned, and once more when it is done
+    profile: if True, each root is scanned with a ScanInstrument
+    one_filesystem, dedup_hardlinks, exclude, counts_only: see iter_stat,
+        applied to each root
+
+    Returns one dict per root, in the order of `roots`:
+    root: the root folder
+    dir_dict: the result of record_stat, None if the scan failed
+    error: None, or why the scan failed
+    seconds: time the scan took
+    profile: the ScanInstrument report of the scan if `profile`, else None
+    A failed root does not affect the others. The dir_dicts of the
+    successful scans are what drive_measurement expects as dir_dict_list.
     """
+    roots = [str(root) for root in roots]
+    if cache_paths is None:
+        cache_paths = [None] * len(roots)
+    if processes is None:
+        processes = min(len(roots), os.cpu_count() or 1)
+    scans = [{'root': root, 'dir_dict': None, 'error': None, 'seconds': None,
+              'profile': None}
+             for root in roots]
+    if len(roots) == 0:
+        return scans
+    manager = multiprocessing.Manager() if progress is not None else None
+    progress_queue = manager.Queue() if manager is not None else None
+    try:
+        with ProcessPoolExecutor(max(processes, 1)) as executor:
+            futures = {executor.submit(_scan_root, root_ix, root, workers,
+                                       cache_path, progress_queue,
+                                       progress_interval, profile,
+                                       one_filesystem, dedup_hardlinks,
+                                       exclude, counts_only): root_ix
+                       for root_ix, (root, cache_path)
+                       in enumerate(zip(roots, cache_paths))}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=progress_interval)
+                _report_progress(progress_queue, roots, progress)
+                for future in done:
+                    scan = scans[futures[future]]
+                    try:
+                        scan.update(future.result())
+                    except Exception as error:  # e.g., a crashed process
+                        scan['error'] = '{}: {}'.format(
+                            type(error).__name__, error)
+            _report_progress(progress_queue, roots, progress)
+    finally:
+        if manager is not None:
+            manager.shutdown()
+    return scans
+
+
+def _scan_root(root_ix, root, workers, cache_path, progress_queue,
+               progress_interval, profile=False, one_filesystem=False,
+               dedup_hardlinks=False, exclude=None, counts_only=False):
+    """ Process pool task of scan_roots. """
+    start = time.monotonic()
+    last_report = start
     dir_dict = dict()
-    order_dict = dict()
-    dirorder = 1  # key starts at 1 as 0 can be interpreted as boolean False
-    hidden_dirs = []
-    for dirpath, dirnames, filenames in os.walk(
-            root, topdown=True, followlinks=False):
-        invalid_dirs = []
-        for dir_ in dirnames:
-            try:
-                os.scandir(os.path.join(dirpath, dir_))
-            except PermissionError:
-                invalid_dirs.append(dir_)
-        dirnames = list(set(dirnames).difference(set(invalid_dirs)))
-        hidden_dirs += [os.path.join(dirpath, dir_) for dir_ in dirnames
-                        if is_hidden_item(dirpath, dir_)]
-        dirnames[:] = [dir_ for dir_ in dirnames
-                       if not is_hidden_item(dirpath, dir_)]
-        filenames[:] = [file for file in filenames
-                        if not is_hidden_item(dirpath, file)]
-        if dirorder == 1:
-            dirparent = False  # marks node as top-level, so it has no parent
+    instrument = ScanInstrument() if profile else None
+    for dirkey, node in iter_stat(root, workers, cache_path,
+                                  instrument=instrument,
+                                  one_filesystem=one_filesystem,
+                                  dedup_hardlinks=dedup_hardlinks,
+                                  exclude=exclude,
+                                  counts_only=counts_only):
+        dir_dict[dirkey] = node
+        if (progress_queue is not None
+                and time.monotonic() - last_report >= progress_interval):
+            progress_queue.put((root_ix, len(dir_dict)))
+            last_report = time.monotonic()
+    if progress_queue is not None:
+        progress_queue.put((root_ix, len(dir_dict)))
+    scan = {'dir_dict': dir_dict, 'error': None,
+            'seconds': time.monotonic() - start,
+            'profile': instrument.report() if profile else None}
+    if len(dir_dict) == 0:
+        scan['dir_dict'] = None
+        scan['error'] = 'root folder could not be read'
+    return scan
+
+
+def _report_progress(progress_queue, roots, progress):
+    if progress_queue is None:
+        return
+    while True:
+        try:
+            root_ix, nfolders = progress_queue.get_nowait()
+        except Empty:
+            return
+        progress(roots[root_ix], nfolders)
+
+
+def iter_stat(root, workers=None, cache_path=None, cancel=None,
+              dir_timeout=None, progress=None, progress_interval=0.5,
+              instrument=None, one_filesystem=False, dedup_hardlinks=False,
+              exclude=None, counts_only=False):
+    """ Streaming form of record_stat, yields a (dirkey, node) pair for each
+    folder as soon as it has been listed. Parents are always yielded before
+    their children. The childkeys of a yielded node can still lose the keys of
+    subfolders that later turn out to be unreadable.
+
+    Sibling subtrees are listed concurrently by a pool of `workers` threads
+    (defaults to the ThreadPoolExecutor default). Keys are handed out in the
+    order folders are discovered, so the root is always 1 and every folder's
+    key is greater than its parent's. Hidden and unreadable folders are never
+    descended into.
+
+    If `cache_path` is given, folder records from the previous scan stored
+    there are reused for every folder whose (dev, ino) and mtime are
+    unchanged, so only modified folders are listed and their files stat'ed
+    again. The cache is rewritten once the walk is complete. Since a folder's
+    mtime only changes when entries are added, removed or renamed, the
+    statistics of files modified in place are refreshed on the next change
+    to their folder.
+
+    cancel: optional threading.Event, checked between folders and while
+        waiting for one; once it is set, ScanCancelled is raised and the
+        cache is left as it was
+    dir_timeout: optional number of seconds to wait for a folder to be
+        listed, e.g., on a stalled network mount. A folder taking longer is
+        skipped like an unreadable one. Python threads cannot be stopped, so
+        the thread listing it is left behind and the pool is not waited for
+        at the end of the walk
+    progress: optional callable progress(report), called from the iterating
+        thread about every progress_interval seconds, and once more when the
+        walk is complete, with a dict of
+        folders, files: number listed so far
+        seconds: time since the walk started
+        folders_per_second, files_per_second: average throughput
+        path: the folder being waited for (the last one at the end)
+        errors: list of (path, message) of the unreadable folders
+        timed_out: list of the paths skipped after dir_timeout
+        mounts: list of the mount points skipped with one_filesystem
+        excluded: list of the folders left out by `exclude`
+        duplicate_folders, duplicate_files: number of folders and files
+            left out with dedup_hardlinks
+    instrument: optional ScanInstrument recording the phases walk (from
+        the first folder to the last, including the time taken by the
+        caller between folders), wait (for folders to be listed), list and
+        list_cached (thread time spent listing folders, and stat'ing the
+        subfolders of cached ones), filestat_columns, load_cache and
+        save_cache, with the file system calls and their errors
+    one_filesystem: if True, folders on another file system than the root
+        (mounted drives, network shares, snapshots) are skipped. On Linux,
+        the mount points are read from /proc/self/mountinfo so that they
+        are not even stat'ed; elsewhere a folder is skipped when its st_dev
+        differs from the root's
+    dedup_hardlinks: if True, a folder already listed under another key,
+        e.g., through a bind mount, is skipped, and a file with several hard
+        links is counted (in nfiles, cumfiles and filestat, and so in
+        drive_measurement) only in the first folder it is found in, in key
+        order. Windows does not report hard links to DirEntry.stat(), so
+        files are not deduplicated there
+    exclude: optional ExclusionRules; matching folders are left out
+        without being stat'ed or listed, along with their subtree
+    counts_only: if True, files are counted from the entry types of the
+        folder listings without being stat'ed, which is all drive_measurement
+        and the tree structure need, and several times faster. Folders are
+        still stat'ed. filestat is None until hydrate_filestat reads it, e.g.,
+        for the folders shown or saved. Folders listed in this mode are not
+        added to the scan cache, and their files are not deduplicated by
+        dedup_hardlinks
+    """
+    root = os.fspath(root)
+    walk_start = time.perf_counter()
+    try:
+        root_stat = os.stat(root)
+    except OSError as error:
+        if instrument is not None:
+            instrument.error('stat', error)
+        return
+    finally:
+        if instrument is not None:
+            instrument.add({'stat': 1})
+    if cache_path is not None:
+        if instrument is not None:
+            with instrument.phase('load_cache'):
+                old_cache = load_scan_cache(cache_path)
         else:
-            dirparent = os.path.split(dirpath)[0]
-        stat_attr = ['mode', 'ino', 'dev', 'nlink', 'uid', 'gid', 'size',
-                     'atime', 'mtime', 'ctime']
-        # st_ino is the unique ID for a node/folder/file
-        filestat_list = []
-        for f_ in filenames:
-            f_path = os.path.join(dirpath, f_)
-            if os.access(f_path, os.R_OK):
+            old_cache = load_scan_cache(cache_path)
+        new_cache = dict()
+        scan_start = time.time()
+    else:
+        old_cache = None
+    inodes = None
+    if one_filesystem or dedup_hardlinks:
+        inodes = InodeIndex()
+        if one_filesystem:
+            inodes.device = root_stat.st_dev
+        if dedup_hardlinks:
+            inodes.add_folder(1, root_stat)
+    mounts = (mounts_below(root) or None) if one_filesystem else None
+    exclude = exclude or None
+    root_prefix = os.path.join(root, '')
+
+    def is_excluded(path):
+        return exclude.matches(path[len(root_prefix):])
+
+    def skip(path):
+        """ Whether _scan_dir leaves a subfolder out without stat'ing it. """
+        return ((mounts is not None and os.path.normpath(path) in mounts)
+                or (exclude is not None and is_excluded(path)))
+
+    if mounts is None and exclude is None:
+        skip = None  # saves a call per subfolder
+    report = {'folders': 0, 'files': 0, 'seconds': 0.0,
+              'folders_per_second': 0.0, 'files_per_second': 0.0,
+              'path': root, 'errors': [], 'timed_out': [], 'mounts': [],
+              'excluded': [], 'duplicate_folders': 0, 'duplicate_files': 0}
+    start = last_report = time.monotonic()
+
+    def report_progress(path):
+        nonlocal last_report
+        last_report = time.monotonic()
+        seconds = last_report - start
+        report['seconds'] = seconds
+        report['folders_per_second'] = report['folders'] / seconds if seconds else 0.0
+        report['files_per_second'] = report['files'] / seconds if seconds else 0.0
+        report['path'] = path
+        progress(dict(report, errors=list(report['errors']),
+                      timed_out=list(report['timed_out']),
+                      mounts=list(report['mounts']),
+                      excluded=list(report['excluded'])))
+
+    def on_wait(path):
+        if (progress is not None
+                and time.monotonic() - last_report >= progress_interval):
+            report_progress(path)
+
+    nextkey = 2  # key starts at 1 as 0 can be interpreted as boolean False
+    executor = ThreadPoolExecutor(max_workers=workers)
+    abandoned = False  # whether a thread may still be stuck on a folder
+    try:
+        # folders are processed in the order they were discovered, which keeps
+        # the key assignment deterministic regardless of the number of workers
+        pending = deque([(1, False, None, 0, os.path.split(root)[1], root,
+                          root_stat,
+                          executor.submit(_scan_dir, root, root_stat,
+                                          old_cache, instrument, skip,
+                                          counts_only))])
+        while pending:
+            (dirkey, dirparent, parent_node, depth, dirname, dirpath, dir_stat,
+             future) = pending.popleft()
+            wait_start = time.perf_counter()
+            try:
+                folder = _folder_result(
+                    future, cancel, dir_timeout,
+                    None if progress is None else lambda: on_wait(dirpath))
+            except ScanCancelled:
+                abandoned = True
+                raise
+            except OSError as error:
+                # folder cannot be listed, e.g., PermissionError
+                report['errors'].append((dirpath, str(error)))
+                if instrument is not None:
+                    instrument.add({'scandir': 1},
+                                   {('scandir', type(error).__name__): 1})
+                folder = None
+            else:
+                if folder is None:
+                    report['timed_out'].append(dirpath)
+                    if instrument is not None:
+                        instrument.add(errors={('scandir', 'timeout'): 1})
+                    abandoned = abandoned or not future.cancel()
+            finally:
+                if instrument is not None:
+                    instrument.add_phase(
+                        'wait', time.perf_counter() - wait_start)
+            if folder is None:
+                if parent_node is not None:
+                    parent_node['childkeys'].discard(dirkey)
+                continue
+            subdirs, nfiles, filestat_list, links, cache_entry = folder
+            if (old_cache is not None and cache_entry is not None
+                    and dir_stat.st_mtime < scan_start - CACHE_RACY_SECONDS):
+                # folders modified just before the scan are not cached, as
+                # later changes may not move their mtime on coarse clocks
+                new_cache[dir_stat.st_dev, dir_stat.st_ino] = cache_entry
+            if dedup_hardlinks and links:
+                duplicates = inodes.add_files(dirkey, links)
+                if duplicates:
+                    nfiles -= len(duplicates)
+                    dropped = {link[2] for link in duplicates}
+                    filestat_list = filestat_list.compress(
+                        row not in dropped for row in range(len(filestat_list)))
+                    report['duplicate_files'] += len(duplicates)
+            node = {
+                'dirname': dirname,
+                'dirparent': dirparent,
+                'childkeys': set(),
+                'depth': depth,
+                'nfiles': nfiles,
+                'cumfiles': nfiles,
+                'filestat': filestat_list,
+                'selection_state': None,
+                'exclusion_state': None,
+                'aggfilestat': None
+            }
+            node.update(stat_dict(dir_stat))
+            for subdir_name, subdir_path, subdir_stat in subdirs:
+                if subdir_stat is None:  # left out by skip
+                    if exclude is not None and is_excluded(subdir_path):
+                        report['excluded'].append(subdir_path)
+                    else:
+                        report['mounts'].append(subdir_path)
+                    continue
+                if inodes is not None:
+                    if inodes.is_mount(subdir_stat):
+                        report['mounts'].append(subdir_path)
+                        continue
+                    if (dedup_hardlinks
+                            and not inodes.add_folder(nextkey, subdir_stat)):
+                        report['duplicate_folders'] += 1
+                        continue
+                node['childkeys'].add(nextkey)
+                pending.append((nextkey, dirkey, node, depth + 1, subdir_name,
+                                subdir_path, subdir_stat,
+                                executor.submit(_scan_dir, subdir_path,
+                                                subdir_stat, old_cache,
+                                                instrument, skip,
+                                                counts_only)))
+                nextkey += 1
+            report['folders'] += 1
+            report['files'] += nfiles
+            yield dirkey, node
+            on_wait(dirpath)
+        if instrument is not None:
+            instrument.add_phase('walk', time.perf_counter() - walk_start)
+        if cache_path is not None:
+            if instrument is not None:
+                with instrument.phase('save_cache'):
+                    save_scan_cache(cache_path, new_cache)
+            else:
+                save_scan_cache(cache_path, new_cache)
+        if progress is not None:
+            report_progress(dirpath)
+    finally:
+        executor.shutdown(wait=not abandoned, cancel_futures=True)
+
+
+def _folder_result(future, cancel=None, dir_timeout=None, on_wait=None):
+    """ Result of a _scan_dir future of iter_stat, or None if it did not
+    complete within dir_timeout seconds. While waiting, `cancel` is checked
+    and on_wait() is called every SCAN_POLL_SECONDS. """
+    if cancel is None and dir_timeout is None and on_wait is None:
+        return future.result()
+    deadline = None if dir_timeout is None else time.monotonic() + dir_timeout
+    while True:
+        if cancel is not None and cancel.is_set():
+            raise ScanCancelled
+        timeout = SCAN_POLL_SECONDS
+        if deadline is not None:
+            timeout = max(min(timeout, deadline - time.monotonic()), 0)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            if future.done():
+                raise  # the folder's own error, e.g., ETIMEDOUT on a mount
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+        if on_wait is not None:
+            on_wait()
+
+
+def _scan_dir(dirpath, dir_stat, cache=None, instrument=None, skip=None,
+              counts_only=False):
+    """ List a single folder, taking stat data from its DirEntry objects.
+    Returns the visible subfolders as (name, path, stat) tuples, the number of
+    visible files, the statistics of the readable ones, the (dev, ino,
+    filestat row) of the files with several hard links (row is None for an
+    unreadable file) and the folder's record for the scan cache. Symbolic
+    links to folders are not followed. Subfolders for which the optional
+    callable skip(path) is true are not stat'ed, their stat is None.
+    With counts_only, files are only counted: the statistics and the cache
+    record are None and there are no hard links.
+
+    If the cache holds a record for the folder with the same mtime, the
+    folder is not listed; only its subfolders are stat'ed. The calls made
+    and their errors are added to `instrument` if given. """
+    start = time.perf_counter()
+    errors = Counter()
+    if cache is not None:
+        cache_entry = cache.get((dir_stat.st_dev, dir_stat.st_ino))
+        if cache_entry is not None and cache_entry[0] == dir_stat.st_mtime:
+            mtime, subdir_names, nfiles, filestat_list, links = cache_entry
+            subdirs = []
+            nstats = 0
+            for name in subdir_names:
+                subdir_path = os.path.join(dirpath, name)
+                if skip is not None and skip(subdir_path):
+                    subdirs.append((name, subdir_path, None))
+                    continue
+                nstats += 1
                 try:
-                    f_stat = os.stat(f_path)
-                    f_dict = dict()
-                    attr_avail = f_stat.__dir__()
-                    for attr in stat_attr:
-                        if 'st_' + attr in attr_avail:
-                            f_dict[attr] = eval('f_stat.st_' + attr)
-                            # equivalent to calling f_stat.st_ino, f_stat.st_dev etc.
-                        else:
-                            f_dict[attr] = None
-                    filestat_list.append(f_dict)
-                except OSError:
-                    pass
-        dir_stat = os.stat(dirpath)
-        dir_dict[dirorder] = {
-            'dirname': os.path.split(dirpath)[1],
-            'dirparent': dirparent,
-            'childkeys': {os.path.join(dirpath, dir_) for dir_ in dirnames},
-            'depth': 0,
-            'nfiles': len(filenames),
-            'cumfiles': len(filenames),
-            'filestat': filestat_list,
-            'selection_state': None,
-            'exclusion_state': None,
-            'aggfilestat': None
-        }
-        attr_avail = dir_stat.__dir__()
-        for attr in stat_attr:
-            if 'st_' + attr in attr_avail:
-                dir_dict[dirorder][attr] = eval('dir_stat.st_' + attr)
-                # equivalent to calling dir_stat.st_ino, dir_stat.st_dev etc.
+                    subdir_stat = os.stat(subdir_path)
+                except OSError as error:
+                    errors['stat', type(error).__name__] += 1
+                    continue
+                subdirs.append((name, subdir_path, subdir_stat))
+            if instrument is not None:
+                instrument.add_phase('list_cached', time.perf_counter() - start)
+                instrument.add({'stat': nstats}, errors)
+            return subdirs, nfiles, filestat_list, links, cache_entry
+    subdirs = []
+    nfiles = 0
+    nentries = 0
+    nsubdirs = 0
+    file_stats = []
+    links = []
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            nentries += 1
+            if is_hidden_entry(entry):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if entry.is_symlink():
+                    continue
+                if skip is not None and skip(entry.path):
+                    subdirs.append((entry.name, entry.path, None))
+                    continue
+                nsubdirs += 1
+                try:
+                    subdirs.append((entry.name, entry.path, dir_entry_stat(entry)))
+                except OSError as error:
+                    errors['entry_stat', type(error).__name__] += 1
             else:
-                dir_dict[dirorder][attr] = None
-        order_dict[dirpath] = dirorder
-        dirorder += 1
-
-    # Refer to each node using a unique key instead of dirpath
-    for dirkey in sorted(dir_dict.keys()):
-        if dirkey > 1:
-            dir_dict[dirkey]['dirparent'] = order_dict[
-                dir_dict[dirkey]['dirparent']]
-        dir_dict[dirkey]['childkeys'] = {
-            order_dict[child] for child in dir_dict[dirkey]['childkeys']}
-
-    # Remove hidden dirs and their children
-    hidden_dirs = [order_dict[dirpath] for dirpath in hidden_dirs]
-    for dirkey in hidden_dirs:
-        hidden_dirs += find_all_children(dirkey, dir_dict)
-    hidden_dirs = list(set(hidden_dirs))
-    for dirkey in hidden_dirs:
-        dir_dict.pop(dirkey)
-
-    assign_folder_depth(1, dir_dict)
-    return dir_dict
+                nfiles += 1
+                if counts_only:
+                    continue
+                try:
+                    f_stat = entry.stat()
+                except OSError as error:
+                    errors['entry_stat', type(error).__name__] += 1
+                    continue
+                readable = is_readable(f_stat)
+                if f_stat.st_nlink > 1:
+                    links.append((f_stat.st_dev, f_stat.st_ino,
+                                  len(file_stats) if readable else None))
+                if readable:
+                    file_stats.append(f_stat)
+    if instrument is not None:
+        listed = time.perf_counter()
+        instrument.add_phase('list', listed - start)
+    if counts_only:
+        if instrument is not None:
+            instrument.add({'scandir': 1, 'entries': nentries,
+                            'entry_stat': nsubdirs}, errors)
+        return subdirs, nfiles, None, links, None
+    filestat_list = FileStatColumns.from_stats(file_stats)
+    cache_entry = (dir_stat.st_mtime, [subdir[0] for subdir in subdirs],
+                   nfiles, filestat_list, links)
+    if instrument is not None:
+        instrument.add_phase('filestat_columns', time.perf_counter() - listed)
+        instrument.add({'scandir': 1, 'entries': nentries,
+                        'entry_stat': nfiles + nsubdirs}, errors)
+    return subdirs, nfiles, filestat_list, links, cache_entry
+
+
+def mount_points():
+    """ Paths of the mount points listed in /proc/self/mountinfo, or None
+    where it is not available (other platforms than Linux). """
+    try:
+        with open('/proc/self/mountinfo', 'r', encoding='utf8',
+                  errors='surrogateescape') as file:
+            lines = file.readlines()
+    except OSError:
+        return None
+    # the mount point is the fifth field, with space, tab, newline and
+    # backslash escaped as octal
+    return {re.sub(r'\\([0-7]{3})', lambda match: chr(int(match[1], 8)),
+                   line.split()[4])
+            for line in lines if len(line.split()) > 4}
+
+
+def mounts_below(root):
+    """ Normalized paths, as seen from `root`, of the mount points strictly
+    below it (see mount_points), or None if they are not known. """
+    mounts = mount_points()
+    if mounts is None:
+        return None
+    real_root = os.path.realpath(root)
+    prefix = real_root.rstrip(os.sep) + os.sep
+    return {os.path.normpath(os.path.join(root, os.path.relpath(path, real_root)))
+            for path in mounts if path.startswith(prefix)}
+
+
+def load_scan_cache(cache_path):
+    """ Load the folder records saved by a previous record_stat call. Returns
+    an empty cache if the file is missing, unreadable or from another
+    version. """
+    try:
+        with open(cache_path, 'rb') as cf:
+            cache = pickle.load(cf)
+    except (OSError, pickle.UnpicklingError, EOFError,
+            AttributeError, ValueError):
+        return dict()
+    if not isinstance(cache, dict) or cache.get('version') != SCAN_CACHE_VERSION:
+        return dict()
+    return cache['dirs']
+
+
+def save_scan_cache(cache_path, cache):
+    """ Save folder records keyed by (dev, ino). The file is replaced
+    atomically so an interrupted save does not corrupt the previous cache. """
+    tmp_path = os.fspath(cache_path) + '.tmp'
+    with open(tmp_path, 'wb') as cf:
+        pickle.dump({'version': SCAN_CACHE_VERSION, 'dirs': cache}, cf,
+                    pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def stat_dict(stat_result):
+    """ Map each attribute in STAT_ATTR to its value in stat_result, or None
+    if the platform does not provide it. """
+    return {attr: getattr(stat_result, 'st_' + attr, None)
+            for attr in STAT_ATTR}
+
+
+def dir_entry_stat(entry):
+    """ Stat a folder's DirEntry. On Windows, DirEntry.stat() reports zero for
+    st_ino, st_dev and st_nlink, so the folder is stat'ed again by path. """
+    if WINDOWS:
+        return os.stat(entry.path)
+    return entry.stat()
+
+
+def is_readable(stat_result):
+    """ Equivalent of os.access(path, os.R_OK) computed from a stat result,
+    which saves a system call per file. ACLs are not taken into account. """
+    if WINDOWS or _ACCESS_UID == 0:
+        return True
+    if stat_result.st_uid == _ACCESS_UID:
+        return bool(stat_result.st_mode & stat.S_IRUSR)
+    if stat_result.st_gid in _ACCESS_GIDS:
+        return bool(stat_result.st_mode & stat.S_IRGRP)
+    return bool(stat_result.st_mode & stat.S_IROTH)
+
+
+def is_hidden_entry(entry):
+    """ DirEntry counterpart of is_hidden_item. On Windows, the hidden
+    attribute is read from the cached DirEntry.stat() result instead of
+    querying the file system again. """
+    if WINDOWS:
+        try:
+            attrs = entry.stat(follow_symlinks=False).st_file_attributes
+        except (OSError, AttributeError):
+            return False
+        return bool(attrs & FILE_ATTRIBUTE_HIDDEN)
+    return entry.name.startswith('.')
 
 
 def is_hidden_item(root, f):
@@ -131,11 +716,25 @@ def is_hidden_item(root, f):
 
 
 def assign_folder_depth(dirkey, dir_dict):
-    if dir_dict[dirkey]['dirparent']:
-        dir_dict[dirkey]['depth'] = dir_dict[
-            dir_dict[dirkey]['dirparent']]['depth'] + 1
-    for child in dir_dict[dirkey]['childkeys']:
-        assign_folder_depth(child, dir_dict)
+    """ Assign depths to a folder and all its children, relative to the
+    folder's parent. """
+    for key in iter_subtree(dirkey, dir_dict):
+        if dir_dict[key]['dirparent']:
+            dir_dict[key]['depth'] = dir_dict[
+                dir_dict[key]['dirparent']]['depth'] + 1
+
+
+def iter_subtree(dirkey, dir_dict):
+    """ Iterate over the keys of a folder and all its children, parents
+    before children. Uses an explicit stack instead of recursion, so there is
+    no limit on the depth of the tree. Child keys missing from dir_dict, e.g.,
+    folders not yet streamed in by iter_stat, are skipped. """
+    stack = [dirkey]
+    while stack:
+        key = stack.pop()
+        yield key
+        stack.extend(childkey for childkey in dir_dict[key]['childkeys']
+                     if childkey in dir_dict)
 
 
 def compute_cumfiles(dir_dict):
@@ -146,102 +745,534 @@ def compute_cumfiles(dir_dict):
             [dir_dict[child]['cumfiles'] for child in children])
 
 
-def compute_stat(dir_dict):
+def compute_stat(dir_dict, sketch=False, sketch_k=DEFAULT_K, instrument=None):
     """ Calculate cumulative accessible files and aggregate statistics for
-    temporal values """
+    temporal values. The aggfilestat of each folder also holds the subtree
+    aggregates described in subtree_stat, so that, e.g., the newest file
+    below a folder can be looked up without walking its subtree.
+
+    With sketch=True, the medians of each folder are estimated from
+    quantile sketches instead of being computed exactly, and the folder's
+    sketches are merged into its parent's, so that percentiles over whole
+    subtrees come out of the same pass. See sketch_stat.
+
+    The time taken is added to `instrument` (a ScanInstrument) as the
+    compute_stat phase if given. """
+    if instrument is not None:
+        with instrument.phase('compute_stat'):
+            return compute_stat(dir_dict, sketch, sketch_k)
+    pending_sketches = dict()
     for dirkey in sorted(dir_dict.keys(), reverse=True):
         children = dir_dict[dirkey]['childkeys']
         dir_dict[dirkey]['cumfiles'] += sum(
             [dir_dict[child]['cumfiles'] for child in children])
-        all_atime = []
-        all_mtime = []
-        all_ctime = []
-        for stat_ in dir_dict[dirkey]['filestat']:
-            all_atime.append(stat_['atime'])
-            all_mtime.append(stat_['mtime'])
-            all_ctime.append(stat_['ctime'])
-        try:
-            agg_atime = statistics.median(all_atime)
-        except statistics.StatisticsError:
-            agg_atime = None
-        try:
-            agg_mtime = statistics.median(all_mtime)
-        except statistics.StatisticsError:
-            agg_mtime = None
+        if sketch:
+            aggfilestat = sketch_stat(
+                dirkey, dir_dict, pending_sketches, sketch_k)
+            aggfilestat.update(subtree_stat(dir_dict[dirkey], dir_dict))
+            dir_dict[dirkey]['aggfilestat'] = aggfilestat
+            continue
+        aggfilestat = filestat_medians(dir_dict[dirkey]['filestat'])
+        aggfilestat.update(subtree_stat(dir_dict[dirkey], dir_dict))
+        dir_dict[dirkey]['aggfilestat'] = aggfilestat
+    store_root_sketches(dir_dict, pending_sketches)
+    return dir_dict
+
+
+def filestat_medians(filestat):
+    """ Median atime, mtime and ctime of a folder's files, None if it has no
+    files or its filestat was not read yet (see hydrate_filestat). """
+    if filestat is None:
+        filestat = FileStatColumns()
+    aggfilestat = dict()
+    for attr in ['atime', 'mtime', 'ctime']:
         try:
-            agg_ctime = statistics.median(all_ctime)
+            aggfilestat['agg' + attr] = statistics.median(filestat.column(attr))
         except statistics.StatisticsError:
-            agg_ctime = None
-        dir_dict[dirkey]['aggfilestat'] = {'aggatime': agg_atime,
-                                           'aggmtime': agg_mtime,
-                                           'aggctime': agg_ctime}
+            aggfilestat['agg' + attr] = None
+    return aggfilestat
+
+
+def sketch_stat(dirkey, dir_dict, pending_sketches, sketch_k=DEFAULT_K):
+    """ Sketch the atime, mtime and ctime of a folder's files and merge in
+    the sketches of its subfolders, which are taken out of
+    pending_sketches. The merged sketches are then left in pending_sketches
+    for the parent, so only the sketches of folders whose parent has not
+    been reached are held at any time.
+
+    Returns the part of aggfilestat derived from the sketches:
+    aggatime, aggmtime, aggctime: estimated medians of the folder's files
+    subtree_atime_percentiles, subtree_mtime_percentiles,
+    subtree_ctime_percentiles: estimated SKETCH_PERCENTILES of all files in
+        the folder's subtree
+    sketches: for a root only, the merged sketches as dicts (see
+        KLLSketch.to_dict and store_root_sketches), e.g., to merge the
+        sketches of several roots, and to find the sketch_k the tree was
+        computed with
+
+    Estimates are within sketch.DEFAULT_RANK_ERROR (in rank, as a fraction
+    of the number of files) of exact for the default sketch_k, and exact
+    for folders and subtrees with fewer than sketch_k files, except that
+    the median of an even number of files is the lower middle value.
+    """
+    filestat = dir_dict[dirkey].get('filestat')
+    if filestat is None:
+        filestat = FileStatColumns()
+    aggfilestat = dict()
+    sketches = dict()
+    for attr in ['atime', 'mtime', 'ctime']:
+        attr_sketch = KLLSketch(sketch_k)
+        attr_sketch.extend(value for value in filestat.column(attr)
+                           if value is not None)
+        aggfilestat['agg' + attr] = attr_sketch.quantile(0.5)
+        sketches[attr] = attr_sketch
+    for childkey in dir_dict[dirkey]['childkeys']:
+        for attr, child_sketch in pending_sketches.pop(childkey).items():
+            sketches[attr].merge(child_sketch)
+    for attr, attr_sketch in sketches.items():
+        aggfilestat['subtree_{}_percentiles'.format(attr)] = \
+            attr_sketch.quantiles([pct / 100 for pct in SKETCH_PERCENTILES])
+    pending_sketches[dirkey] = sketches
+    return aggfilestat
+
+
+def store_root_sketches(dir_dict, pending_sketches):
+    """ After a sketch_stat pass, the sketches left in pending_sketches are
+    those of the roots. """
+    for dirkey, sketches in pending_sketches.items():
+        dir_dict[dirkey]['aggfilestat']['sketches'] = {
+            attr: attr_sketch.to_dict()
+            for attr, attr_sketch in sketches.items()}
+
+
+def compute_subtree_percentiles(dir_dict, sketch_k=DEFAULT_K):
+    """ Recalculate only the sketch-based fields of every folder's
+    aggfilestat, e.g., after subfolders were removed from childkeys. """
+    pending_sketches = dict()
+    for dirkey in sorted(dir_dict.keys(), reverse=True):
+        if dir_dict[dirkey].get('aggfilestat') is None:
+            dir_dict[dirkey]['aggfilestat'] = dict()
+        dir_dict[dirkey]['aggfilestat'].pop('sketches', None)
+        dir_dict[dirkey]['aggfilestat'].update(
+            sketch_stat(dirkey, dir_dict, pending_sketches, sketch_k))
+    store_root_sketches(dir_dict, pending_sketches)
     return dir_dict
 
 
-def find_all_children(dirkey, dir_dict):
-    """ Find all children of a given directory. """
-    children = []
-    for child in dir_dict[dirkey]['childkeys']:
-        children.extend(find_all_children(child, dir_dict))
-    children.extend(dir_dict[dirkey]['childkeys'])
-    return children
+def compute_subtree_stat(dir_dict):
+    """ Recalculate only the subtree aggregates of every folder, e.g., for a
+    dir_dict loaded from a file saved without them, or after subfolders were
+    removed from childkeys. Like compute_stat, relies on children having
+    greater keys than their parents. """
+    for dirkey in sorted(dir_dict.keys(), reverse=True):
+        if dir_dict[dirkey].get('aggfilestat') is None:
+            dir_dict[dirkey]['aggfilestat'] = dict()
+        dir_dict[dirkey]['aggfilestat'].update(
+            subtree_stat(dir_dict[dirkey], dir_dict))
+    return dir_dict
+
+
+def subtree_stat(node, dir_dict):
+    """ Aggregates over the files of a folder and all of its subfolders,
+    computed from the folder's own filestat and the aggfilestat of its
+    children, which must already hold their subtree aggregates. Missing and
+    non-positive timestamps are ignored; a value is None if no file has a
+    usable timestamp.
+
+    subtree_max_mtime: newest file modification time
+    subtree_min_atime, subtree_max_atime: oldest and newest file access time
+    subtree_nstatfiles: number of files with recorded statistics
+    """
+    filestat = node.get('filestat')
+    if filestat is None:  # e.g., the demo dir_dict
+        filestat = FileStatColumns()
+    max_mtimes = [max(valid_times(filestat.column('mtime')), default=None)]
+    min_atimes = [min(valid_times(filestat.column('atime')), default=None)]
+    max_atimes = [max(valid_times(filestat.column('atime')), default=None)]
+    nstatfiles = len(filestat)
+    for childkey in node['childkeys']:
+        child_stat = dir_dict[childkey].get('aggfilestat') or dict()
+        max_mtimes.append(child_stat.get('subtree_max_mtime'))
+        min_atimes.append(child_stat.get('subtree_min_atime'))
+        max_atimes.append(child_stat.get('subtree_max_atime'))
+        nstatfiles += child_stat.get('subtree_nstatfiles', 0)
+    return {'subtree_max_mtime': max(valid_times(max_mtimes), default=None),
+            'subtree_min_atime': min(valid_times(min_atimes), default=None),
+            'subtree_max_atime': max(valid_times(max_atimes), default=None),
+            'subtree_nstatfiles': nstatfiles}
+
+
+def valid_times(values):
+    return [value for value in values if value is not None and value > 0]
+
+
+def folder_path(dir_dict, root, dirkey):
+    """ Path of a folder of a tree scanned from `root`, built from the
+    names of the folder and its parents. """
+    names = []
+    while dir_dict[dirkey]['dirparent']:
+        names.append(dir_dict[dirkey]['dirname'])
+        dirkey = dir_dict[dirkey]['dirparent']
+    return os.path.join(os.fspath(root), *reversed(names))
+
+
+def unhydrated_keys(dir_dict, dirkeys=None):
+    """ Keys among dirkeys (default: all) of the folders whose filestat was
+    not read yet, see hydrate_filestat. """
+    if dirkeys is None:
+        dirkeys = dir_dict.keys()
+    return [dirkey for dirkey in dirkeys
+            if dirkey in dir_dict and dir_dict[dirkey].get('filestat') is None]
+
+
+def count_unhydrated(dir_dict):
+    """ {dirkey: number of folders in its subtree, itself included, whose
+    filestat was not read yet}, see unhydrated_keys. """
+    counts = dict()
+    # children have greater keys, so their counts are complete first
+    for dirkey in sorted(dir_dict, reverse=True):
+        node = dir_dict[dirkey]
+        counts[dirkey] = counts.get(dirkey, 0) + (node.get('filestat') is None)
+        if node['dirparent']:
+            counts[node['dirparent']] = (counts.get(node['dirparent'], 0)
+                                         + counts[dirkey])
+    return counts
+
+
+def folder_filestat(dirpath):
+    """ Statistics of the visible, readable files of a folder, as _scan_dir
+    records them. A folder that cannot be listed has none. """
+    file_stats = []
+    try:
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                if is_hidden_entry(entry):
+                    continue
+                try:
+                    if entry.is_dir():
+                        continue
+                    f_stat = entry.stat()
+                except OSError:
+                    continue
+                if is_readable(f_stat):
+                    file_stats.append(f_stat)
+    except OSError:
+        pass
+    return FileStatColumns.from_stats(file_stats)
+
+
+def list_filestat(dir_dict, root, dirkeys, workers=None):
+    """ Read the filestat of folders of a tree scanned from `root` with a
+    pool of `workers` threads, without changing dir_dict, so that it can run
+    outside the thread that owns it. Returns {dirkey: FileStatColumns}, to
+    be passed to store_filestat. """
+    paths = [folder_path(dir_dict, root, dirkey) for dirkey in dirkeys]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(dirkeys, executor.map(folder_filestat, paths)))
+
+
+def store_filestat(dir_dict, filestats):
+    """ Fill in the filestat read by list_filestat. If compute_stat has
+    already run, the aggfilestat of the folders is updated, and so are the
+    subtree aggregates of their parents up to the root (medians are exact,
+    as computed by compute_stat without sketches). Returns the keys of the
+    folders whose statistics changed. """
+    changed = set()
+    for dirkey, filestat in filestats.items():
+        node = dir_dict[dirkey]
+        node['filestat'] = filestat
+        if node.get('aggfilestat') is not None:
+            node['aggfilestat'].update(filestat_medians(filestat))
+        while dirkey not in changed:
+            changed.add(dirkey)
+            dirkey = dir_dict[dirkey]['dirparent']
+            if not dirkey:
+                break
+    # children have greater keys, so their subtree aggregates come first
+    for dirkey in sorted(changed, reverse=True):
+        if dir_dict[dirkey].get('aggfilestat') is not None:
+            dir_dict[dirkey]['aggfilestat'].update(
+                subtree_stat(dir_dict[dirkey], dir_dict))
+    return changed
+
+
+def hydrate_filestat(dir_dict, root, dirkeys=None, workers=None):
+    """ Read the file statistics that a counts_only scan of `root` (see
+    iter_stat) left out, for the folders among dirkeys (default: all), e.g.,
+    before the tree is saved. Folders that have them already are not read
+    again. Returns the keys of the folders whose statistics changed, see
+    store_filestat. """
+    return store_filestat(dir_dict, list_filestat(
+        dir_dict, root, unhydrated_keys(dir_dict, dirkeys), workers))
 
 
 def anonymize_stat(dir_dict, removed_dirs, renamed_dirs=None):
     """ Anonymize dir_dict by removing some dirs and renaming some dirs.
     If a directory is removed, remove its children and remove its parent's
-    reference to it. """
-    if renamed_dirs is not None:
-        for dirkey in renamed_dirs.keys():
-            dir_dict[dirkey]['dirname'] = renamed_dirs[dirkey]
-    for dirkey in removed_dirs:
-        parent = dir_dict[dirkey]['dirparent']
-        if parent in dir_dict.keys():
-            og_childset = dir_dict[parent]['childkeys']
-            rm_childset = set([dirkey])
-            dir_dict[parent]['childkeys'] = og_childset.difference(rm_childset)
-        dir_dict.pop(dirkey)
-    # rearrange keys to hide gaps from exclusion/deselection of folders
-    old_new_keymap = dict(zip(sorted(dir_dict.keys()), range(1, 1+len(dir_dict.keys()))))
-    for oldkey in list(dir_dict.keys()):
-        # since original dict uses int keys, making new keys str prevents collisions
-        newkey = str(old_new_keymap[oldkey])
-        dir_dict[newkey] = dir_dict[oldkey]
-        dir_dict[newkey]['childkeys'] = {
-            old_new_keymap[dirkey] for dirkey in dir_dict[newkey]['childkeys']}
-        dir_dict[newkey]['cumfiles'] = dir_dict[newkey]['nfiles']
-        dir_dict.pop(oldkey)
-    for dirkey in list(dir_dict.keys()):  # get static key list before popping items
-        # converting str keys back to int
-        dir_dict[int(dirkey)] = dir_dict[dirkey]
-        dir_dict.pop(dirkey)
+    reference to it. Keys are renumbered 1..n to hide the gaps.
+
+    Edits dir_dict in place; AnonymizedView gives the same tree without
+    modifying or copying dir_dict. """
+    anonymized = AnonymizedView(dir_dict, removed_dirs, renamed_dirs).to_dir_dict()
+    dir_dict.clear()
+    dir_dict.update(anonymized)
+    for node in dir_dict.values():
+        node['cumfiles'] = node['nfiles']
     compute_cumfiles(dir_dict)
+    if any(node.get('aggfilestat') for node in dir_dict.values()):
+        # removed folders must not show up in the subtree aggregates
+        compute_subtree_stat(dir_dict)
+        sketch_ks = [node['aggfilestat']['sketches']['mtime']['k']
+                     for node in dir_dict.values()
+                     if 'sketches' in (node.get('aggfilestat') or dict())]
+        if sketch_ks:
+            compute_subtree_percentiles(dir_dict, sketch_ks[0])
     return dir_dict
 
 
-def json_serializable(dir_dict):
-    """ Convert data types within dictionary so that it can be saved as a
-    JSON file. """
-    set_var_list = ['childkeys']
-    for set_var in set_var_list:
-        for dirkey in dir_dict.keys():
-            dir_dict[dirkey][set_var] = list(dir_dict[dirkey][set_var])
-    return dir_dict
+class AnonymizedView(Mapping):
+    """ Read-only anonymized dir_dict layered over a source dir_dict (or
+    NodeTable view), which is left untouched.
 
+    Removed dirs are masked together with their subfolders, renamed dirs
+    get their new dirname, and the remaining folders are renumbered 1..n in
+    the order of their source keys, in a single pass when the view is
+    created. dirparent and childkeys use the new keys.
 
-def dict_readable(dir_dict):
-    """ Convert data types in loaded JSON file so that the dict is compatible
-    with functions written with those data types in mind. """
-    set_var_list = ['childkeys']
-    for set_var in set_var_list:
-        for dirkey in dir_dict.keys():
-            dir_dict[dirkey][set_var] = set(dir_dict[dirkey][set_var])
-    for dirkey in list(dir_dict.keys()):  # get static key list before popping items
-        # JSON decoder/parser incorrectly assumes dict keys are strings,
-        # converting keys to int here
-        dir_dict[int(dirkey)] = dir_dict[dirkey]
-        dir_dict.pop(dirkey)
-    return dir_dict
+    cumfiles and the subtree aggregates of aggfilestat (see subtree_stat)
+    are only recomputed for the ancestors of removed folders, by
+    subtracting the removed subtrees' cumfiles, which therefore must be
+    complete in the source (e.g., after compute_stat). The sketch-based
+    fields (see sketch_stat) of those ancestors are left out, since they
+    cannot be corrected without the removed files; anonymize_stat
+    recomputes them.
+
+    to_dir_dict materializes the view, write_json and
+    NodeTable.from_dir_dict accept it as is.
+    """
+
+    def __init__(self, dir_dict, removed_dirs=(), renamed_dirs=None):
+        self.source = dir_dict
+        self.renamed_dirs = dict(renamed_dirs or dict())
+        removed = set()
+        removed_roots = []
+        for dirkey in removed_dirs:
+            if dirkey in dir_dict and dirkey not in removed:
+                removed_roots.append(dirkey)
+                removed.update(iter_subtree(dirkey, dir_dict))
+        self.source_keys = [dirkey for dirkey in sorted(dir_dict.keys())
+                            if dirkey not in removed]
+        self.new_keys = {dirkey: newkey for newkey, dirkey
+                         in enumerate(self.source_keys, start=1)}
+        # overlays for the ancestors of removed folders, by source key
+        self.cumfiles = dict()
+        self.aggfilestat = dict()
+        for dirkey in removed_roots:
+            if dir_dict[dirkey]['dirparent'] in removed:
+                continue  # inside another removed subtree
+            removed_cumfiles = dir_dict[dirkey]['cumfiles']
+            parent = dir_dict[dirkey]['dirparent']
+            while parent in self.new_keys:
+                self.cumfiles[parent] = self.cumfiles.get(
+                    parent, dir_dict[parent]['cumfiles']) - removed_cumfiles
+                parent = dir_dict[parent]['dirparent']
+        for dirkey in sorted(self.cumfiles, reverse=True):
+            aggfilestat = dir_dict[dirkey].get('aggfilestat')
+            if aggfilestat is None:
+                continue
+            aggfilestat = {field: value for field, value in aggfilestat.items()
+                           if field != 'sketches'
+                           and not field.endswith('_percentiles')}
+            if 'subtree_nstatfiles' in aggfilestat:
+                # children are either untouched or already overlaid
+                aggfilestat.update(subtree_stat(self[self.new_keys[dirkey]], self))
+            self.aggfilestat[dirkey] = aggfilestat
+
+    def __getitem__(self, key):
+        if not isinstance(key, int) or not 1 <= key <= len(self.source_keys):
+            raise KeyError(key)
+        return AnonymizedNode(self, self.source_keys[key - 1])
+
+    def __contains__(self, key):
+        return isinstance(key, int) and 1 <= key <= len(self.source_keys)
+
+    def __iter__(self):
+        return iter(range(1, len(self.source_keys) + 1))
+
+    def __len__(self):
+        return len(self.source_keys)
+
+    def to_dir_dict(self):
+        """ Materialize the view as a regular dir_dict. Nodes are new dicts,
+        but values such as filestat are shared with the source. """
+        return {key: {field: (set(value) if field == 'childkeys' else value)
+                      for field, value in self[key].items()}
+                for key in self}
+
+
+class AnonymizedNode(Mapping):
+    """ A single node of an AnonymizedView. """
+    __slots__ = ('view', 'source_key')
+
+    def __init__(self, view, source_key):
+        self.view = view
+        self.source_key = source_key
+
+    def __getitem__(self, field):
+        view, source_key = self.view, self.source_key
+        if field == 'dirname' and source_key in view.renamed_dirs:
+            return view.renamed_dirs[source_key]
+        elif field == 'dirparent':
+            return view.new_keys.get(view.source[source_key]['dirparent'], False)
+        elif field == 'childkeys':
+            return frozenset(view.new_keys[childkey] for childkey
+                             in view.source[source_key]['childkeys']
+                             if childkey in view.new_keys)
+        elif field == 'cumfiles' and source_key in view.cumfiles:
+            return view.cumfiles[source_key]
+        elif field == 'aggfilestat' and source_key in view.aggfilestat:
+            return view.aggfilestat[source_key]
+        return view.source[source_key][field]
+
+    def __iter__(self):
+        return iter(self.view.source[self.source_key])
+
+    def __len__(self):
+        return len(self.view.source[self.source_key])
+
+
+def json_node(node, states=None):
+    """ Copy of a node that can be saved as JSON, leaving the node itself
+    unchanged. `states`, a (selection_state, exclusion_state) pair,
+    replaces the node's own check states. """
+    node_json = dict(node)
+    node_json['childkeys'] = list(node_json['childkeys'])
+    if isinstance(node_json.get('filestat'), FileStatColumns):
+        node_json['filestat'] = node_json['filestat'].to_rows()
+    if states is not None:
+        node_json['selection_state'], node_json['exclusion_state'] = states
+    return node_json
+
+
+def readable_node(node_json):
+    """ Node of a loaded JSON file, converted back to the data types of a
+    dir_dict, see json_node. """
+    node_json['childkeys'] = set(node_json['childkeys'])
+    if isinstance(node_json.get('filestat'), list):
+        node_json['filestat'] = FileStatColumns.from_rows(node_json['filestat'])
+    return node_json
+
+
+def write_json(file, dir_dict, fields=None, checkstates=None, indent=4):
+    """ Write {'dir_dict': dir_dict, **fields} to a text file, giving the
+    same text as json.dump(..., indent=indent) with every node converted by
+    json_node. Nodes are converted and written one at a time, so
+    dir_dict is neither modified nor copied as a whole. checkstates maps
+    dirkeys to the (selection_state, exclusion_state) to save for them. """
+    pad = ' ' * indent
+    file.write('{\n' + pad + '"dir_dict": {')
+    separator = '\n'
+    for dirkey in dir_dict.keys():
+        states = checkstates.get(dirkey) if checkstates is not None else None
+        node_text = json.dumps(json_node(dir_dict[dirkey], states),
+                               indent=indent)
+        file.write(separator + 2 * pad + json.dumps(str(dirkey)) + ': '
+                   + node_text.replace('\n', '\n' + 2 * pad))
+        separator = ',\n'
+    file.write('}' if separator == '\n' else '\n' + pad + '}')
+    for name, value in (fields or dict()).items():
+        value_text = json.dumps(value, indent=indent)
+        file.write(',\n' + pad + json.dumps(name) + ': '
+                   + value_text.replace('\n', '\n' + pad))
+    file.write('\n}')
+
+
+def read_json(file, chunk_size=1 << 20):
+    """ Read a JSON object written by write_json (or json.dump) from a text
+    file, decoding the nodes of 'dir_dict' one at a time as the file is
+    read and converting each with readable_node, so that neither the whole
+    text nor an unconverted copy of the tree is held in memory. Returns
+    the object with int dirkeys and the nodes in the form of a dir_dict. """
+    reader = JSONStreamReader(file, chunk_size)
+    super_dict = dict()
+    reader.expect('{')
+    while not reader.next_is('}'):
+        name = reader.decode_value()
+        reader.expect(':')
+        if name == 'dir_dict':
+            dir_dict = dict()
+            reader.expect('{')
+            while not reader.next_is('}'):
+                dirkey = reader.decode_value()
+                reader.expect(':')
+                dir_dict[int(dirkey)] = readable_node(reader.decode_value())
+                reader.next_is(',')
+            super_dict[name] = dir_dict
+        else:
+            super_dict[name] = reader.decode_value()
+        reader.next_is(',')
+    return super_dict
+
+
+class JSONStreamReader:
+    """ Minimal incremental JSON tokenizer for read_json: values are decoded
+    with json.JSONDecoder.raw_decode from a buffer that is refilled from the
+    file whenever a value runs past its end. """
+
+    def __init__(self, file, chunk_size=1 << 20):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, size=None):
+        chunk = self.file.read(size or self.chunk_size)
+        if chunk == '':
+            self.eof = True
+        # drop what has been consumed before growing the buffer
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def skip_whitespace(self):
+        while True:
+            while (self.pos < len(self.buffer)
+                   and self.buffer[self.pos] in ' \t\n\r'):
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return
+            self.read_more()
+
+    def next_is(self, char):
+        """ Consume `char` if it is the next non-whitespace character. """
+        self.skip_whitespace()
+        if self.buffer.startswith(char, self.pos):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, char):
+        if not self.next_is(char):
+            raise json.JSONDecodeError(
+                'Expecting {!r}'.format(char), self.buffer, self.pos)
+
+    def decode_value(self):
+        self.skip_whitespace()
+        read_size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # a number at the end of the buffer may continue in the file
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            self.read_more(read_size)
+            read_size *= 2
 
 
 def errant_mean(iterable):
@@ -269,12 +1300,18 @@ def drive_measurement(dir_dict_list, allow_stat_error=False):
     """ Compute statistics of interest (properties) given the collected
     statistics of a root folder(s).
 
+    All properties are derived from three columns (depth, file count and
+    child count of every folder), which are counted into histograms in a
+    single pass, e.g., number of folders per (depth, is leaf, is empty).
+    Means and modes are then computed from the histograms and are identical
+    to statistics.mean and statistics.mode over the equivalent lists.
+
     Parameters
     __________
     dir_dict_list: list
-        List containing one or more dir_dict generated from record_stat.
-        If more than one dir_dict is passed, statistics are calculated in
-        aggregate.
+        List containing one or more dir_dict generated from record_stat, or
+        NodeTable views. If more than one dir_dict is passed, statistics are
+        calculated in aggregate.
     allow_stat_error: bool, default False
          If statistics errors are allowed, mean and mode calculations return
          None instead of an error. See docstring on errant_mean and errant_mode
@@ -285,78 +1322,39 @@ def drive_measurement(dir_dict_list, allow_stat_error=False):
     properties: dict
         Dictionary containing root properties and their respective values.
     """
-    leaf_folder_depths = []
-    switch_folder_depths = []
-    branching_n_folder_counts = []
-    n_file_counts = []
-    folder_depths = []
-    file_depths = []
-
-    if allow_stat_error:
-        mean_func = errant_mean
-        mode_func = errant_mode
-    else:
-        mean_func = statistics.mean
-        mode_func = statistics.mode
-
     n_roots = len(dir_dict_list)  # number of roots
-    n_files = 0
-    n_folders = sum([len(dir_dict.keys()) for dir_dict in dir_dict_list])
+    n_folders = sum([len(dir_dict) for dir_dict in dir_dict_list])
     root_n_folders = sum(
         [len(dir_dict[1]['childkeys']) for dir_dict in dir_dict_list])
-    n_leaf_folders = 0
-    n_switch_folders = 0
     root_n_files = sum([dir_dict[1]['nfiles'] for dir_dict in dir_dict_list])
-    n_empty_folders = 0
-    file_breadth_mode_n_files = 0
-    for dir_dict in dir_dict_list:
-        for key in dir_dict.keys():
-            n_files += dir_dict[key]['nfiles']
-            n_file_counts.append(dir_dict[key]['nfiles'])
-            folder_depths.append(dir_dict[key]['depth'])
-            if len(dir_dict[key]['childkeys']) == 0:  # identifies leaf nodes
-                n_leaf_folders += 1
-                leaf_folder_depths.append(dir_dict[key]['depth'])
-                if dir_dict[key]['nfiles'] == 0:  # identifies empty folders
-                    n_empty_folders += 1
-                elif dir_dict[key]['nfiles'] > 0:
-                    file_depths.append(dir_dict[key]['depth'])
-            elif len(dir_dict[key]['childkeys']) > 0:
-                # identifies branching nodes, superset of switch nodes
-                branching_n_folder_counts.append(
-                    len(dir_dict[key]['childkeys']))
-                if dir_dict[key]['nfiles'] == 0:  # identifies switch nodes
-                    n_switch_folders += 1
-                    switch_folder_depths.append(dir_dict[key]['depth'])
-                elif dir_dict[key]['nfiles'] > 0:
-                    file_depths.append(dir_dict[key]['depth'])
-
-    breadth_max = Counter(folder_depths).most_common(1)[0][1]
-    breadth_mean = mean_func(Counter(folder_depths).values())
+    hist = folder_histograms(dir_dict_list)
+    n_files = hist['n_files']
+    n_empty_folders = hist['n_empty_folders']
+    folder_depth_counts = hist['folder_depth_counts']
+    file_depth_counts = hist['file_depth_counts']
+
+    n_leaf_folders = sum(hist['leaf_folder_depth_counts'].values())
+    n_switch_folders = sum(hist['switch_folder_depth_counts'].values())
+    breadth_max = max(folder_depth_counts.values())
+    breadth_mean = exact_mean(
+        n_folders, len(folder_depth_counts), allow_stat_error)
     pct_leaf_folders = n_leaf_folders / n_folders * 100
-    depth_leaf_folders_mean = mean_func(leaf_folder_depths)
+    depth_leaf_folders_mean = histogram_mean(
+        hist['leaf_folder_depth_counts'], allow_stat_error)
     pct_switch_folders = n_switch_folders / n_folders * 100
-    depth_switch_folders_mean = mean_func(switch_folder_depths)
-    depth_max = max(folder_depths)
-    depth_folders_mode = mode_func(folder_depths)
-    depth_folders_mean = mean_func(folder_depths)
-    branching_factor = mean_func(branching_n_folder_counts)
-    n_files_mean = mean_func(n_file_counts)
+    depth_switch_folders_mean = histogram_mean(
+        hist['switch_folder_depth_counts'], allow_stat_error)
+    depth_max = max(folder_depth_counts)
+    depth_folders_mode = histogram_mode(folder_depth_counts, allow_stat_error)
+    depth_folders_mean = histogram_mean(folder_depth_counts, allow_stat_error)
+    branching_factor = histogram_mean(
+        hist['branching_n_folder_counts'], allow_stat_error)
+    n_files_mean = exact_mean(n_files, n_folders, allow_stat_error)
     pct_empty_folders = n_empty_folders / n_folders * 100
-    depth_files_mean = mean_func(file_depths)
-    depth_files_mode = mode_func(file_depths)
-
-    for key in dir_dict.keys():
-        if dir_dict[key]['depth'] == depth_files_mode:
-            file_breadth_mode_n_files += dir_dict[key]['nfiles']
-    labels = ['n_roots', 'n_files', 'n_folders', 'breadth_max', 'breadth_mean',
-              'root_n_folders', 'n_leaf_folders', 'pct_leaf_folders',
-              'depth_leaf_folders_mean', 'n_switch_folders',
-              'pct_switch_folders', 'depth_switch_folders_mean', 'depth_max',
-              'depth_folders_mode', 'depth_folders_mean', 'branching_factor',
-              'root_n_files', 'n_files_mean', 'n_empty_folders',
-              'pct_empty_folders', 'depth_files_mean', 'depth_files_mode',
-              'file_breadth_mode_n_files']
+    depth_files_mean = histogram_mean(file_depth_counts, allow_stat_error)
+    depth_files_mode = histogram_mode(file_depth_counts, allow_stat_error)
+    file_breadth_mode_n_files = hist['depth_n_files'].get(depth_files_mode, 0)
+
     values = [n_roots, n_files, n_folders, breadth_max, breadth_mean,
               root_n_folders, n_leaf_folders, pct_leaf_folders,
               depth_leaf_folders_mean, n_switch_folders, pct_switch_folders,
@@ -364,7 +1362,138 @@ def drive_measurement(dir_dict_list, allow_stat_error=False):
               depth_folders_mean, branching_factor, root_n_files, n_files_mean,
               n_empty_folders, pct_empty_folders, depth_files_mean,
               depth_files_mode, file_breadth_mode_n_files]
-    return {label: value for label, value in zip(labels, values)}
+    return {label: value for label, value in zip(PROPERTY_LABELS, values)}
+
+
+def folder_histograms(dir_dict_list):
+    """ Count the folders of one or more roots in a single pass over their
+    depth, file count and child count columns. Uses NumPy when it is
+    installed and the standard library otherwise.
+
+    Returns a dict with
+    n_files, n_empty_folders: totals
+    folder_depth_counts, file_depth_counts: {depth: number of folders, or of
+        folders with files}, in order of first appearance of each depth so
+        that histogram_mode breaks ties like statistics.mode
+    leaf_folder_depth_counts, switch_folder_depth_counts: {depth: number of
+        leaf folders, or of branching folders without files}
+    branching_n_folder_counts: {number of children: number of branching
+        folders}
+    depth_n_files: {depth: number of files at that depth}
+    """
+    columns = [measurement_columns(dir_dict) for dir_dict in dir_dict_list]
+    if np is not None:
+        return _folder_histograms_numpy(columns)
+    hist = {'n_files': 0, 'n_empty_folders': 0}
+    for label in ['folder_depth_counts', 'file_depth_counts',
+                  'leaf_folder_depth_counts', 'switch_folder_depth_counts',
+                  'branching_n_folder_counts', 'depth_n_files']:
+        hist[label] = Counter()
+    for depths, nfiles, nchildren in columns:
+        # every step below runs in C over whole columns; Counter keeps keys
+        # in order of first appearance
+        is_leaf = list(map(operator.not_, nchildren))
+        hist['n_files'] += sum(nfiles)
+        hist['folder_depth_counts'].update(depths)
+        # identifies leaf nodes
+        hist['leaf_folder_depth_counts'].update(compress(depths, is_leaf))
+        # identifies empty folders
+        hist['n_empty_folders'] += sum(map(
+            operator.and_, is_leaf, map(operator.not_, nfiles)))
+        # identifies switch nodes, branching nodes without files
+        hist['switch_folder_depth_counts'].update(compress(depths, map(
+            operator.not_, map(operator.or_, nfiles, is_leaf))))
+        hist['file_depth_counts'].update(compress(depths, nfiles))
+        # identifies branching nodes, superset of switch nodes
+        hist['branching_n_folder_counts'].update(nchildren)
+        for (depth, n), count in Counter(
+                compress(zip(depths, nfiles), nfiles)).items():
+            hist['depth_n_files'][depth] += n * count
+    hist['branching_n_folder_counts'].pop(0, None)
+    return hist
+
+
+def _folder_histograms_numpy(columns):
+    depths = np.concatenate(
+        [np.asarray(depths, dtype=np.int64) for depths, _, _ in columns])
+    nfiles = np.concatenate(
+        [np.asarray(nfiles, dtype=np.int64) for _, nfiles, _ in columns])
+    nchildren = np.concatenate(
+        [np.asarray(nchildren, dtype=np.int64) for _, _, nchildren in columns])
+    is_leaf = nchildren == 0
+    has_files = nfiles > 0
+    depth_n_files = np.bincount(depths, weights=nfiles)
+    return {
+        'n_files': int(nfiles.sum()),
+        'n_empty_folders': int(np.count_nonzero(is_leaf & ~has_files)),
+        'folder_depth_counts': _numpy_counts(depths),
+        'file_depth_counts': _numpy_counts(depths[has_files]),
+        'leaf_folder_depth_counts': _numpy_counts(depths[is_leaf]),
+        'switch_folder_depth_counts': _numpy_counts(
+            depths[~is_leaf & ~has_files]),
+        'branching_n_folder_counts': _numpy_counts(nchildren[~is_leaf]),
+        'depth_n_files': {depth: int(n) for depth, n
+                          in enumerate(depth_n_files) if n}
+    }
+
+
+def _numpy_counts(values):
+    """ Counter of the values of a NumPy array, in order of first
+    appearance. """
+    uniques, first_ixs, counts = np.unique(
+        values, return_index=True, return_counts=True)
+    order = np.argsort(first_ixs, kind='stable')
+    return Counter(dict(zip(uniques[order].tolist(), counts[order].tolist())))
+
+
+def measurement_columns(dir_dict):
+    """ Depth, number of files and number of children of every folder, as
+    three sequences. NodeTable views are read from the table's arrays
+    directly. """
+    if isinstance(dir_dict, NodeTableView):
+        table = dir_dict.table
+        offsets = table.child_offsets
+        return (table.depth, table.nfiles,
+                list(map(operator.sub, offsets[1:], offsets[:-1])))
+    nodes = list(dir_dict.values())
+    return (list(map(operator.itemgetter('depth'), nodes)),
+            list(map(operator.itemgetter('nfiles'), nodes)),
+            list(map(len, map(operator.itemgetter('childkeys'), nodes))))
+
+
+def histogram_mean(histogram, allow_stat_error=False):
+    """ Mean of integer values given as {value: count}, equal to
+    statistics.mean over the expanded values. """
+    total = sum(value * value_count
+                for value, value_count in histogram.items())
+    return exact_mean(total, sum(histogram.values()), allow_stat_error)
+
+
+def exact_mean(total, count, allow_stat_error=False):
+    """ Mean of `count` integers summing to `total`, returned the way
+    statistics.mean does (an int when the mean is integral, otherwise the
+    correctly rounded float). With allow_stat_error, None is returned for
+    empty data, as with errant_mean. """
+    if count == 0:
+        if allow_stat_error:
+            return None
+        raise statistics.StatisticsError(
+            'mean requires at least one data point')
+    if total % count == 0:
+        return total // count
+    return total / count
+
+
+def histogram_mode(histogram, allow_stat_error=False):
+    """ Mode of values given as {value: count}, equal to statistics.mode
+    over the expanded values if the histogram was filled in data order (ties
+    go to the value seen first). With allow_stat_error, None is returned for
+    empty data, as with errant_mode. """
+    if len(histogram) == 0:
+        if allow_stat_error:
+            return None
+        raise statistics.StatisticsError('no mode for empty data')
+    return max(histogram.items(), key=operator.itemgetter(1))[0]
 
 
 def check_collection_properties(properties):
@@ -388,14 +1517,7 @@ def check_collection_properties(properties):
     diff_dict: dict
         Difference between root properties and typical ranges
     """
-    labels = ['n_files', 'n_folders', 'breadth_max', 'breadth_mean',
-              'root_n_folders', 'n_leaf_folders', 'pct_leaf_folders',
-              'depth_leaf_folders_mean', 'n_switch_folders',
-              'pct_switch_folders', 'depth_switch_folders_mean', 'depth_max',
-              'depth_folders_mode', 'depth_folders_mean', 'branching_factor',
-              'root_n_files', 'n_files_mean', 'n_empty_folders',
-              'pct_empty_folders', 'depth_files_mean', 'depth_files_mode',
-              'file_breadth_mode_n_files']
+    labels = TYPICAL_LABELS
     typical_ranges = {
         'n_files': [29123, 193001],
         'n_folders': [3818, 26363],
@@ -436,19 +1558,41 @@ def check_collection_properties(properties):
 
 
 if __name__ == "__main__":
-    root_path = str(Path('~', 'Dropbox').expanduser())
-    test_dir_dict = record_stat(root_path)
-    test_dir_dict = compute_stat(test_dir_dict)
-    anonymize_stat(test_dir_dict, [1])
-    test_dir_dict = record_stat(root_path)
-    test_dir_dict = compute_stat(test_dir_dict)
-    test_dir_dict_path = Path('~/Dropbox/mcgill/File Zoomer/code/'
-                              'drive_analysis_tool/dir_dict.pkl').expanduser()
-    with open(test_dir_dict_path, 'wb') as ddf:
-        pickle.dump(test_dir_dict, ddf, pickle.HIGHEST_PROTOCOL)
-    print(test_dir_dict[1])
-    test_dir_dict_props = drive_measurement([test_dir_dict])
-    print(test_dir_dict_props)
-    print(check_collection_properties(test_dir_dict_props))
-    depths_list = [test_dir_dict[key]['depth'] for key in test_dir_dict.keys()]
-    print(Counter(depths_list))
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Scan root folders concurrently and measure them together.')
+    parser.add_argument('roots', nargs='*',
+                        default=[str(Path('~', 'Dropbox').expanduser())])
+    parser.add_argument('--profile', metavar='JSON', nargs='?', const='-',
+                        help='time the scan phases and count file system '
+                             'calls, printing a table per root, and save '
+                             'the reports to JSON if a path is given')
+    args = parser.parse_args()
+    root_scans = scan_roots(args.roots, progress=lambda root, nfolders: print(
+        '{}: {} folders'.format(root, nfolders)),
+        profile=args.profile is not None)
+    test_dir_dict_list = []
+    profiles = dict()
+    for root_scan in root_scans:
+        if root_scan['error'] is not None:
+            print('{}: {}'.format(root_scan['root'], root_scan['error']))
+            continue
+        print('{}: {} folders in {:.1f} s'.format(
+            root_scan['root'], len(root_scan['dir_dict']),
+            root_scan['seconds']))
+        if args.profile is not None:
+            root_instrument = ScanInstrument()
+            root_instrument.add_report(root_scan['profile'])
+            test_dir_dict_list.append(compute_stat(
+                root_scan['dir_dict'], instrument=root_instrument))
+            profiles[root_scan['root']] = root_instrument.report()
+            print(format_report(profiles[root_scan['root']]))
+        else:
+            test_dir_dict_list.append(compute_stat(root_scan['dir_dict']))
+    if args.profile not in (None, '-'):
+        with open(args.profile, 'w', encoding='utf8') as profile_file:
+            json.dump(profiles, profile_file, indent=4)
+    if len(test_dir_dict_list) > 0:
+        test_dir_dict_props = drive_measurement(test_dir_dict_list)
+        print(test_dir_dict_props)
+        print(check_collection_properties(test_dir_dict_props))
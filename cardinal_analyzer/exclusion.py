@@ -0,0 +1,94 @@
+import os
+import re
+import fnmatch
+
+REGEX_PREFIX = 're:'
+TEXT_SEPARATOR = ';'
+
+
+def join_regexes(regexes):
+    """ Compiled regular expressions matching any of `regexes`: a single
+    alternation if they can be joined, else one per regex. """
+    if not regexes:
+        return []
+    try:
+        return [re.compile('|'.join('(?:{})'.format(regex)
+                                    for regex in regexes))]
+    except re.error:
+        return [re.compile(regex) for regex in regexes]
+
+
+class ExclusionRules:
+    """ Patterns of the folders that iter_stat leaves out before listing
+    them, e.g., node_modules, caches or virtual machine images, so that
+    nothing below them is scanned. Unlike folders excluded in the tree
+    after the scan, they are not in the dir_dict at all.
+
+    Patterns are matched against the path of a folder relative to the scan
+    root, with '/' as separator on every platform:
+    - a glob without '/' (e.g., 'node_modules', '*.vdi') matches the folder
+      name at any depth
+    - a glob with '/' (e.g., 'Library/Caches') matches the whole relative
+      path
+    - a pattern starting with 're:' is a regular expression searched in
+      the relative path (e.g., 're:(^|/)build-[0-9]+$')
+    Matching is case-sensitive. All the patterns of a kind are compiled
+    into a single regular expression, so the cost per folder does not grow
+    with the number of rules; regular expressions that cannot be joined
+    (e.g., with an inline flag such as '(?i)', or a group name used twice)
+    are matched one by one instead. An invalid regular expression raises
+    ValueError. """
+
+    def __init__(self, patterns=()):
+        self.patterns = [pattern.strip() for pattern in patterns
+                         if pattern.strip()]
+        name_globs, path_regexes = [], []
+        for pattern in self.patterns:
+            if pattern.startswith(REGEX_PREFIX):
+                regex = pattern[len(REGEX_PREFIX):]
+                try:
+                    re.compile(regex)
+                except re.error as error:
+                    raise ValueError('invalid exclusion pattern {!r}: {}'.format(
+                        pattern, error)) from None
+                path_regexes.append(regex)
+            elif '/' in pattern:
+                path_regexes.append(
+                    '^' + fnmatch.translate(pattern.strip('/')))
+            else:
+                name_globs.append(fnmatch.translate(pattern))
+        self.name_regex = (re.compile('|'.join(name_globs))
+                           if name_globs else None)
+        self.path_regexes = join_regexes(path_regexes)
+
+    @classmethod
+    def from_text(cls, text):
+        """ Rules from patterns separated by ';' or new lines, as typed in
+        the wizard. """
+        return cls(re.split(r'[;\n]', text))
+
+    def to_text(self):
+        return (TEXT_SEPARATOR + ' ').join(self.patterns)
+
+    def matches(self, relpath):
+        """ Whether the folder at relpath (relative to the scan root) is
+        excluded. """
+        if os.sep != '/':
+            relpath = relpath.replace(os.sep, '/')
+        if self.name_regex is not None:
+            name = relpath.rpartition('/')[2]
+            if self.name_regex.match(name):
+                return True
+        return any(path_regex.search(relpath) is not None
+                   for path_regex in self.path_regexes)
+
+    def __bool__(self):
+        return len(self.patterns) > 0
+
+    def __eq__(self, other):
+        if isinstance(other, ExclusionRules):
+            return self.patterns == other.patterns
+        return NotImplemented
+
+    def __repr__(self):
+        return 'ExclusionRules({!r})'.format(self.patterns)
@@ -0,0 +1,131 @@
+from array import array
+from itertools import compress
+
+STAT_ATTR = ['mode', 'ino', 'dev', 'nlink', 'uid', 'gid', 'size',
+             'atime', 'mtime', 'ctime']
+INT_STAT_ATTR = ['mode', 'ino', 'dev', 'nlink', 'uid', 'gid', 'size']
+FLOAT_STAT_ATTR = ['atime', 'mtime', 'ctime']
+
+
+class FileStatColumns:
+    """ Statistics of the files in a folder, stored column by column in two
+    typed arrays (one for the integer attributes, one for the timestamps)
+    instead of one dict per file. Within each array the values of an
+    attribute are contiguous, so column() is a zero-copy view.
+
+    Iterating or indexing yields one dict per file, so code written for the
+    former list of dicts keeps working, but readers such as compute_stat
+    should use column() to get at the values without building dicts. If a
+    value does not fit its array (None, or an integer outside the signed
+    64-bit range), that array falls back to a plain list. """
+    __slots__ = ('ints', 'floats', 'nrows')
+
+    def __init__(self, ints=(), floats=(), nrows=0):
+        self.ints = ints
+        self.floats = floats
+        self.nrows = nrows
+
+    @classmethod
+    def from_stats(cls, stat_results):
+        """ Build columns from a list of os.stat_result. """
+        return cls._from_values(
+            stat_results, lambda st, attr: getattr(st, 'st_' + attr, None))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """ Build columns from a list of per-file dicts, e.g., the filestat
+        lists of a loaded JSON file. """
+        return cls._from_values(rows, lambda row, attr: row.get(attr))
+
+    @classmethod
+    def _from_values(cls, items, get_value):
+        if len(items) == 0:
+            return cls()
+        ints = typed_array('q', [get_value(item, attr)
+                                  for attr in INT_STAT_ATTR for item in items])
+        floats = typed_array('d', [get_value(item, attr)
+                                    for attr in FLOAT_STAT_ATTR
+                                    for item in items])
+        return cls(ints, floats, len(items))
+
+    def column(self, attr):
+        """ Values of one attribute for all files, in file order. """
+        if attr in FLOAT_STAT_ATTR:
+            values, ix = self.floats, FLOAT_STAT_ATTR.index(attr)
+        else:
+            values, ix = self.ints, INT_STAT_ATTR.index(attr)
+        if isinstance(values, array):
+            values = memoryview(values)
+        return values[ix * self.nrows:(ix + 1) * self.nrows]
+
+    def compress(self, selectors):
+        """ Columns of the files whose selector is true, in file order. """
+        selectors = list(selectors)
+        ints = typed_array('q', [value for attr in INT_STAT_ATTR for value
+                                 in compress(self.column(attr), selectors)])
+        floats = typed_array('d', [value for attr in FLOAT_STAT_ATTR for value
+                                   in compress(self.column(attr), selectors)])
+        return self.__class__(ints, floats, sum(map(bool, selectors)))
+
+    def row(self, ix):
+        row = dict()
+        for attr in STAT_ATTR:
+            row[attr] = self.column(attr)[ix]
+        return row
+
+    def to_rows(self):
+        """ Convert to a list of per-file dicts, e.g., for a JSON export. """
+        columns = [self.column(attr) for attr in STAT_ATTR]
+        return [dict(zip(STAT_ATTR, values)) for values in zip(*columns)]
+
+    def nbytes(self):
+        """ Memory used by the column buffers. """
+        return sum(values.itemsize * len(values)
+                   if isinstance(values, (array, memoryview))
+                   else 8 * len(values)
+                   for values in (self.ints, self.floats))
+
+    def __len__(self):
+        return self.nrows
+
+    def __getitem__(self, ix):
+        if ix < 0:
+            ix += self.nrows
+        if not 0 <= ix < self.nrows:
+            raise IndexError('filestat index out of range')
+        return self.row(ix)
+
+    def __iter__(self):
+        return iter(self.to_rows())
+
+    def __eq__(self, other):
+        if isinstance(other, FileStatColumns):
+            return (self.nrows == other.nrows
+                    and list(self.ints) == list(other.ints)
+                    and list(self.floats) == list(other.floats))
+        return NotImplemented
+
+    def __reduce__(self):
+        # views into a NodeTable are memoryviews, which cannot be pickled
+        return (self.__class__, (_owned(self.ints), _owned(self.floats),
+                                 self.nrows))
+
+    def __repr__(self):
+        return 'FileStatColumns({} files)'.format(self.nrows)
+
+
+def _owned(values):
+    if isinstance(values, memoryview):
+        owned = array(values.format)
+        owned.frombytes(values)
+        return owned
+    return values
+
+
+def typed_array(typecode, values):
+    if len(values) == 0:
+        return ()
+    try:
+        return array(typecode, values)
+    except (TypeError, OverflowError):
+        return values
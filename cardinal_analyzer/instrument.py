@@ -0,0 +1,103 @@
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+
+class ScanInstrument:
+    """ Opt-in record of where a scan spends its time, passed as
+    `instrument` to record_stat, iter_stat and compute_stat.
+
+    phases: seconds and number of runs of each named phase. Phases run by
+        the scan threads (e.g., listing folders) add up the time of every
+        thread, so they can exceed the wall time of the walk phase
+    calls: number of each file system call (scandir, stat, entry_stat,
+        i.e., DirEntry.stat) and of the directory entries read
+    errors: number of failed calls by call and error type
+
+    Scan threads accumulate their counts per folder and add them with
+    `add`, so the lock is taken once per folder rather than once per call.
+    A report() is a plain dict which can be saved as JSON, and reports of
+    separate scans, e.g., from scan_roots processes, can be merged back
+    with add_report. """
+    def __init__(self):
+        self.phase_seconds = Counter()
+        self.phase_runs = Counter()
+        self.calls = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name, seconds, runs=1):
+        with self._lock:
+            self.phase_seconds[name] += seconds
+            self.phase_runs[name] += runs
+
+    def add(self, calls=None, errors=None):
+        """ Add Counters of calls and of (call, error type name) pairs. """
+        with self._lock:
+            if calls:
+                self.calls.update(calls)
+            if errors:
+                self.errors.update(errors)
+
+    def error(self, call, error):
+        self.add(errors={(call, type(error).__name__): 1})
+
+    def report(self):
+        with self._lock:
+            errors = dict()
+            for (call, error_type), count in sorted(self.errors.items()):
+                errors.setdefault(call, dict())[error_type] = count
+            return {
+                'phases': {name: {'seconds': self.phase_seconds[name],
+                                  'runs': self.phase_runs[name]}
+                           for name in sorted(self.phase_seconds)},
+                'calls': dict(sorted(self.calls.items())),
+                'errors': errors}
+
+    def add_report(self, report):
+        for name, phase in report['phases'].items():
+            self.add_phase(name, phase['seconds'], phase['runs'])
+        self.add(Counter(report['calls']),
+                 Counter({(call, error_type): count
+                          for call, counts in report['errors'].items()
+                          for error_type, count in counts.items()}))
+
+    def write_json(self, file, indent=4):
+        json.dump(self.report(), file, indent=indent)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def format_report(report):
+    """ Text table of a ScanInstrument report, slowest phase first. """
+    lines = ['{:<32}{:>12}{:>10}'.format('phase', 'seconds', 'runs')]
+    for name, phase in sorted(report['phases'].items(),
+                              key=lambda item: -item[1]['seconds']):
+        lines.append('{:<32}{:>12.3f}{:>10}'.format(
+            name, phase['seconds'], phase['runs']))
+    lines.append('')
+    lines.append('{:<32}{:>12}'.format('call', 'count'))
+    for call, count in report['calls'].items():
+        lines.append('{:<32}{:>12}'.format(call, count))
+    for call, counts in report['errors'].items():
+        for error_type, count in counts.items():
+            lines.append('{:<32}{:>12}'.format(
+                '{} {}'.format(call, error_type), count))
+    return '\n'.join(lines)
@@ -1,20 +1,29 @@
 """
-waitingspinnerwidget from https://github.com/z3ntu/QtWaitingSpinner
 code in main.py, wizardUI.py etc. adapted from https://github.com/jddinneen/cardinal
 """
 
-import json
+import time
 import _pickle
+import threading
 import traceback
 from pathlib import Path
 from PyQt5.QtCore import (
     Qt, pyqtSlot, pyqtSignal, QObject, QRunnable, QThreadPool, QDateTime)
-from PyQt5.QtGui import QStandardItemModel, QStandardItem, QTextDocument
-from PyQt5.QtWidgets import QWizard, QApplication, QFileDialog, QHeaderView
-from waitingspinnerwidget import QtWaitingSpinner
+from PyQt5.QtGui import QTextDocument
+from PyQt5.QtWidgets import (
+    QWizard, QApplication, QFileDialog, QHeaderView, QMessageBox,
+    QProgressDialog)
 from wizardUI import WizardUI
-from drive_analyzer import (
-    record_stat, compute_stat, json_serializable, dict_readable)
+from exclusion import ExclusionRules
+# drive_analyzer, and NumPy with it, is imported where it is first needed,
+# e.g., when a scan starts, so that the first page shows sooner
+from nodetable import NodeTable
+from session import save_session, load_session, is_session_file, SESSION_SUFFIX
+from treemodel import DirTreeModel
+
+SESSION_FORMAT = "Cardinal Analyzer session (*{})".format(SESSION_SUFFIX)
+JSON_FORMAT = "JavaScript Object Notation (*.json)"
+DIR_TIMEOUT = 30  # seconds to wait for a folder before skipping it
 
 
 def path_str(root_path):
@@ -32,11 +41,18 @@ def path_str(root_path):
 # file due to dir_dict being empty
 class WorkerSignals(QObject):
     started = pyqtSignal()
+    batch = pyqtSignal(object)
+    progress = pyqtSignal(object)
     result = pyqtSignal(object)
+    error = pyqtSignal(object)
+    cancelled = pyqtSignal()
     finished = pyqtSignal()
 
 
 class Worker(QRunnable):
+    """ Runs fn(*args, **kwargs) in a QThreadPool. Emits result with its
+    return value, cancelled if it raised ScanCancelled or error with the
+    exception it raised otherwise, then finished in every case. """
     def __init__(self, fn, *args, **kwargs):
         super(Worker, self).__init__()
         # Store constructor arguments (re-used for processing)
@@ -47,16 +63,74 @@ class Worker(QRunnable):
 
     @pyqtSlot()
     def run(self):
+        from drive_analyzer import ScanCancelled
         try:
             self.signals.started.emit()
-            result = self.fn(*self.args, **self.kwargs)
-        except:
+            result = self.compute()
+        except ScanCancelled:
+            self.signals.cancelled.emit()
+        except Exception as error:
             traceback.print_exc()
+            self.signals.error.emit(error)
         else:
             self.signals.result.emit(result)
         finally:
             self.signals.finished.emit()
 
+    def compute(self):
+        return self.fn(*self.args, **self.kwargs)
+
+
+class StreamWorker(Worker):
+    """ Runs a generator function yielding (key, value) pairs, such as
+    iter_stat. Yielded pairs are forwarded to the GUI in batches, at most one
+    batch every batch_interval seconds (the first pair is sent right away),
+    and the result is the dict of all pairs. """
+    batch_interval = 0.1
+
+    def compute(self):
+        result = dict()
+        batch = []
+        last_emit = 0
+        for key, value in self.fn(*self.args, **self.kwargs):
+            result[key] = value
+            batch.append((key, value))
+            if time.monotonic() - last_emit >= self.batch_interval:
+                self.signals.batch.emit(batch)
+                batch = []
+                last_emit = time.monotonic()
+        if batch:
+            self.signals.batch.emit(batch)
+        return result
+
+
+class ScanJob(StreamWorker):
+    """ Streams iter_stat(root_path) like StreamWorker, and can be stopped
+    with cancel() from the GUI thread: the scan stops at the next folder and
+    cancelled is emitted instead of result. Folders not listed within
+    dir_timeout seconds are skipped. Throughput is reported with progress,
+    see iter_stat for the contents of its report; the last report, which
+    lists the unreadable and skipped folders, is emitted before result.
+    one_filesystem, dedup_hardlinks, exclude and counts_only are passed on
+    to iter_stat. """
+    def __init__(self, root_path, dir_timeout=DIR_TIMEOUT, workers=None,
+                 cache_path=None, progress_interval=0.5, one_filesystem=False,
+                 dedup_hardlinks=False, exclude=None, counts_only=False):
+        from drive_analyzer import iter_stat
+        self.cancel_event = threading.Event()
+        super(ScanJob, self).__init__(
+            iter_stat, root_path, workers, cache_path,
+            cancel=self.cancel_event, dir_timeout=dir_timeout,
+            progress=self.report_progress, progress_interval=progress_interval,
+            one_filesystem=one_filesystem, dedup_hardlinks=dedup_hardlinks,
+            exclude=exclude, counts_only=counts_only)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report_progress(self, report):
+        self.signals.progress.emit(report)
+
 
 class Main(QWizard):
     def __init__(self):
@@ -105,40 +179,52 @@ class Main(QWizard):
                 'childkeys': set(), 'mtime': 1322202000.0, 'selection_state': None, 'exclusion_state': None},
         }
 
-        self.spinner = QtWaitingSpinner(self, True, True, Qt.ApplicationModal)
-        self.spinner.setRoundness(70.0)
-        self.spinner.setMinimumTrailOpacity(15.0)
-        self.spinner.setTrailFadePercentage(70.0)
-        self.spinner.setNumberOfLines(12)
-        self.spinner.setLineLength(30)
-        self.spinner.setLineWidth(10)
-        self.spinner.setInnerRadius(15)
-        self.spinner.setRevolutionsPerSecond(1)
-
-        keytree = KeyTreeOperations(
-            self.ui.og_tree_key, self.threadpool, self.spinner)
-        tree0 = TreeOperations(
-            self.ui.og_tree_0, self.threadpool, self.spinner)
-        tree1 = TreeOperations(
-            self.ui.og_tree_1, self.threadpool, self.spinner,
-            self.ui.select_btn_1, self.ui.save_btn_1, self.ui.load_btn_1, self.ui.less_btn_1)
-
-        keytree.load_dir_dicts(self.keytree_dir_dict, checkable=False, expand_all=True)
-        tree0.load_dir_dicts(self.demo_dir_dict, expand_all=True)
-        self.ui.reset_demo_btn.clicked.connect(
-            lambda: tree0.refresh_treeview(tree0.og_model, tree0.og_tree, self.demo_dir_dict, expand_all=True))
-        tree1.select_btn.clicked.connect(lambda: self.select_tree_root(tree1))
-        tree1.save_btn.clicked.connect(lambda: self.save_collected_data(tree1))
-        tree1.load_btn.clicked.connect(lambda: self.load_collected_data(tree1))
-        tree1.less_btn.clicked.connect(lambda: self.expand_to_depth(tree1, 0))
+        self.trees = dict()
         self.ui.consent_savebutton.clicked.connect(self.save_consent)
         self.ui.wizardpage1.registerField("consentbox*", self.ui.consentbox)
+        # only the first page is built before the window is shown
+        self.currentIdChanged.connect(self.setup_page)
+
+    def setup_page(self, page_id):
+        """ Build a page and its trees when it is first shown, along with
+        any page before it, e.g., the software choice that the analysis
+        page saves and loads. """
+        for previous_id in range(page_id + 1):
+            if self.ui.setup_page(previous_id):
+                self.setup_trees(previous_id)
+
+    def setup_trees(self, page_id):
+        if page_id == 1:
+            keytree = KeyTreeOperations(
+                self.ui.og_tree_key, self.threadpool)
+            tree0 = TreeOperations(
+                self.ui.og_tree_0, self.threadpool)
+            keytree.load_dir_dicts(self.keytree_dir_dict, checkable=False, expand_all=True)
+            tree0.load_dir_dicts(self.demo_dir_dict, expand_all=True)
+            self.ui.reset_demo_btn.clicked.connect(
+                lambda: tree0.refresh_treeview(tree0.og_model, tree0.og_tree, self.demo_dir_dict, expand_all=True))
+            self.trees['keytree'], self.trees['tree0'] = keytree, tree0
+        elif page_id == 3:
+            tree1 = TreeOperations(
+                self.ui.og_tree_1, self.threadpool,
+                self.ui.select_btn_1, self.ui.save_btn_1, self.ui.load_btn_1, self.ui.less_btn_1)
+            tree1.select_btn.clicked.connect(lambda: self.select_tree_root(tree1))
+            tree1.save_btn.clicked.connect(lambda: self.save_collected_data(tree1))
+            tree1.load_btn.clicked.connect(lambda: self.load_collected_data(tree1))
+            tree1.less_btn.clicked.connect(lambda: self.expand_to_depth(tree1, 0))
+            self.trees['tree1'] = tree1
 
     def select_tree_root(self, tree):
+        try:
+            exclude = ExclusionRules.from_text(self.ui.exclude_edit_1.text())
+        except ValueError as error:
+            QMessageBox.warning(self, 'Invalid pattern', str(error))
+            return
         dirpath = QFileDialog.getExistingDirectory(
             self, 'Select Folder', path_str(tree.root_path))
         if dirpath:
             tree.root_path = Path(dirpath)
+            tree.exclude = exclude
             tree.build_tree_structure_threaded(tree.root_path)
         else:
             tree.clear_root()
@@ -159,66 +245,95 @@ class Main(QWizard):
                 consent_plaintext = doc.toPlainText()
                 file.write(consent_plaintext)
 
-    def make_super_dict(self, dict_list, name_list):
-        super_dict = dict()
-        if len(dict_list) == len(name_list):
-            for dict_, name in zip(dict_list, name_list):
-                super_dict[name] = dict_
-            return super_dict
-        else:
-            print('Mismatch in number of dicts and supplied names.')
-
     def save_collected_data(self, tree):
-        formats = "JavaScript Object Notation (*.json)"
+        # binary sessions load much faster, JSON is kept as an export format
+        formats = ';;'.join([SESSION_FORMAT, JSON_FORMAT])
         filename, extension = QFileDialog.getSaveFileName(
-            self, 'Save File', path_str(Path('~').expanduser() / 'my_folder_data.json'), formats)
+            self, 'Save File', path_str(Path('~').expanduser() / 'my_folder_data'), formats)
         if filename != '':
-            anon_dir_dict = _pickle.loads(_pickle.dumps(tree.og_dir_dict))
-            tree.save_checkstates_root(anon_dir_dict)
-            json_serializable(anon_dir_dict)
-            super_dict = self.make_super_dict(
-                [anon_dir_dict, self.ui.textarea_wp3_0.toPlainText()],
-                ['dir_dict', 'software_choice'])
-            with open(filename, 'w', encoding='utf8') as file:
-                json.dump(super_dict, file, indent=4)
+            # the file statistics left out by the scan are read first
+            tree.hydrate(None, lambda: self.write_collected_data(
+                tree, filename, extension), 'Reading file statistics')
+
+    def write_collected_data(self, tree, filename, extension):
+        from drive_analyzer import write_json
+        # check states are applied while writing, without copying the tree
+        checkstates = tree.collect_checkstates()
+        # the exclusion rules the tree was scanned with
+        fields = {'software_choice': self.ui.textarea_wp3_0.toPlainText(),
+                  'exclude': tree.exclude.patterns}
+        if extension == SESSION_FORMAT or filename.endswith(SESSION_SUFFIX):
+            if not filename.endswith(SESSION_SUFFIX):
+                filename += SESSION_SUFFIX
+            save_session(filename, NodeTable.from_dir_dict(
+                tree.og_dir_dict, checkstates), fields)
+            return
+        if not filename.endswith('.json'):
+            filename += '.json'
+        with open(filename, 'w', encoding='utf8') as file:
+            write_json(file, tree.og_dir_dict, fields, checkstates)
 
     def load_collected_data(self, tree):
-        formats = "JavaScript Object Notation (*.json)"
+        from drive_analyzer import read_json, compute_subtree_stat
+        formats = ';;'.join([
+            "Saved data (*{} *.json)".format(SESSION_SUFFIX),
+            SESSION_FORMAT, JSON_FORMAT])
         filename, extension = QFileDialog.getOpenFileName(
             self, 'Load File', path_str(Path('~').expanduser()), formats)
-        if filename != '':
+        if filename != '' and is_session_file(filename):
+            # nodes of a memory-mapped session are read-only and built when
+            # the tree view asks for them
+            table, metadata = load_session(filename)
+            tree.hydrate_root = None
+            self.ui.textarea_wp3_0.setPlainText(metadata.get('software_choice', ''))
+            self.set_exclusion_rules(tree, metadata.get('exclude', []))
+            tree.og_dir_dict = table.view()
+            tree.refresh_treeview(tree.og_model, tree.og_tree, tree.og_dir_dict)
+            tree.save_btn.setEnabled(True)
+            tree.less_btn.setEnabled(True)
+        elif filename != '':
             with open(filename, 'r', encoding='utf8') as file:
-                super_dict = json.load(file)
+                super_dict = read_json(file)
+                tree.hydrate_root = None
                 self.ui.textarea_wp3_0.setPlainText(super_dict['software_choice'])
+                self.set_exclusion_rules(tree, super_dict.get('exclude', []))
                 tree.og_dir_dict = super_dict['dir_dict']
-                dict_readable(tree.og_dir_dict)
-                tree.anon_dir_dict = _pickle.loads(_pickle.dumps(tree.og_dir_dict))
+                compute_subtree_stat(tree.og_dir_dict)
                 tree.refresh_treeview(tree.og_model, tree.og_tree, tree.og_dir_dict)
                 tree.save_btn.setEnabled(True)
                 tree.less_btn.setEnabled(True)
 
+    def set_exclusion_rules(self, tree, patterns):
+        tree.exclude = ExclusionRules(patterns)
+        self.ui.exclude_edit_1.setText(tree.exclude.to_text())
+
     def expand_to_depth(self, tree, depth):
         tree.og_tree.expandToDepth(depth)
 
 
-class QStandardNumItem(QStandardItem):
-    def __lt__(self, other):
-        return int(self.text()) < int(other.text())
-
-
 class TreeOperations:
     """Some functions are specific to a particular root/tree model. Placing
     these and other functions into their own class helps avoid near-duplicate
     function definitions with minor variable changes, hopefully making
-    debugging easier."""
-    def __init__(self, og_tree, threadpool, spinner,
+    debugging easier.
+
+    Rows are identified by dirkey: the model (see DirTreeModel) only builds
+    the rows of expanded folders, but check states are kept for every
+    folder, and propagated by the model's CheckStates."""
+    def __init__(self, og_tree, threadpool,
                  select_btn=None, save_btn=None, load_btn=None, less_btn=None):
         og_model_headers = ['Folder Name', 'Exclude', 'Accessible Files',
                             'Date Modified']
-        self.unchecked_items_set = set()
-        self.expanded_items_list = []
         self.threadpool = threadpool
-        self.spinner = spinner
+        self.scan_job = None
+        self.scan_dialog = None
+        self.scan_report = None
+        self.exclude = ExclusionRules()
+        # root of a counts-only scan, whose file statistics are read when
+        # folders are expanded or saved; None for other trees
+        self.hydrate_root = None
+        # folders left to read in each subtree, see count_unhydrated
+        self.unhydrated_counts = dict()
         self.root_path = Path('~').expanduser()
         self.select_btn = select_btn
         self.save_btn = save_btn
@@ -227,25 +342,19 @@ class TreeOperations:
 
         # Initialize model and tree
         self.og_tree = og_tree
-        self.og_dir_dict, self.anon_dir_dict = dict(), dict()
-        self.og_model = QStandardItemModel()
+        self.og_dir_dict = dict()
+        self.og_model = DirTreeModel(
+            og_model_headers, [(self.cumfiles_text, int), (self.find_mtime, None)],
+            cumfiles_columns=[2])
         self.og_tree.setModel(self.og_model)
         self.og_tree.setSortingEnabled(True)
-        self.og_model.setHorizontalHeaderLabels(og_model_headers)
         self.refresh_treeview(self.og_model, self.og_tree, self.og_dir_dict)
-        self.og_model.itemChanged.connect(self.on_item_change)
         self.og_tree.expanded.connect(lambda: self.header_autoresizable(self.og_tree.header()))
+        self.og_tree.expanded.connect(self.hydrate_expanded)
 
     def refresh_treeview(self, model, tree, dir_dict,
                          checkable=True, anon_tree=False, expand_all=False):
-        model.removeRow(0)
-        root_item = model.invisibleRootItem()
-        # convention: dir_dict key starts at 1 since 0==False
-        if len(dir_dict.keys()) > 0:
-            first_dirkey = min(dir_dict.keys())
-        else:
-            first_dirkey = 1
-        self.append_all_children(first_dirkey, dir_dict, root_item, checkable, anon_tree)
+        model.set_dir_dict(dir_dict, checkable)
         if expand_all:
             tree.expandToDepth(1000)
             # 1000 is arbitrary number, using .expandAll() causes children duplication bug
@@ -255,73 +364,14 @@ class TreeOperations:
         tree.sortByColumn(0, Qt.AscendingOrder)
         self.header_autoresizable(tree.header())
 
-    def append_all_children(self, dirkey, dir_dict, parent_item,
-                            checkable=True, anon_tree=False):
-        if dirkey in dir_dict:
-            dirname = QStandardItem(dir_dict[dirkey]['dirname'])
-            cumfiles = QStandardNumItem(str(dir_dict[dirkey]['cumfiles']))
-            exclusion = QStandardItem('')
-            mtime = self.find_mtime(dirkey, dir_dict)
-            items = [dirname, exclusion, cumfiles, mtime]
-            dirname.setData(dirkey, Qt.UserRole)
-            if checkable is True:
-                dirname.setFlags(
-                    Qt.ItemIsEnabled | Qt.ItemIsUserTristate |
-                    Qt.ItemIsUserCheckable)
-                exclusion.setFlags(
-                    Qt.ItemIsEnabled | Qt.ItemIsUserTristate |
-                    Qt.ItemIsUserCheckable)
-                cumfiles.setFlags(Qt.ItemIsEnabled)
-            elif checkable is False:
-                dirname.setFlags(
-                    Qt.ItemIsEnabled | Qt.ItemIsUserTristate)
-                exclusion.setFlags(
-                    Qt.ItemIsEnabled | Qt.ItemIsUserTristate)
-                cumfiles.setFlags(Qt.ItemIsEnabled)
-            selection_state = dir_dict[dirkey]['selection_state']
-            exclusion_state = dir_dict[dirkey]['exclusion_state']
-            if selection_state is not None:
-                dirname.setCheckState(selection_state)
-            else:
-                dirname.setCheckState(Qt.Unchecked)
-            if exclusion_state is not None:
-                exclusion.setCheckState(exclusion_state)
-            else:
-                exclusion.setCheckState(Qt.Unchecked)
-            parent_item.appendRow(items)
-            child_ix = parent_item.rowCount() - 1
-            parent_item = parent_item.child(child_ix)
-            children_keys = dir_dict[dirkey]['childkeys']
-            for child_key in sorted(children_keys):
-                self.append_all_children(child_key, dir_dict, parent_item,
-                                         checkable, anon_tree)
-
-    def on_item_change(self, item):
-        root = self.og_model.invisibleRootItem()
-        if item.column() == 0:
-            dirkey = item.data(Qt.UserRole)
-            item_checkstate = item.checkState()
-            item_row = item.row()
-            if item.parent() is None:
-                parent = root
-            else:
-                parent = item.parent()
-            if item.checkState() == Qt.PartiallyChecked:
-                if (item.rowCount() == 0
-                        or parent.child(item_row, 1).checkState() == Qt.PartiallyChecked):
-                    item.setCheckState(Qt.Checked)
-            self.propagate_checkstate_child(
-                parent, item_row, item_checkstate)
-            self.propagate_checkstate_parent(
-                item)
-            if item_checkstate == Qt.Unchecked:
-                self.unchecked_items_set.add(dirkey)
-            elif item_checkstate in (Qt.Checked, Qt.PartiallyChecked):
-                if dirkey in self.unchecked_items_set:
-                    self.unchecked_items_set.remove(dirkey)
-            # self.recalculate_cumfiles()
-        if item.column() == 1:
-            self.dir_exclusion(item, root)
+    @property
+    def unchecked_items_set(self):
+        return self.og_model.checkstates.unchecked
+
+    def cumfiles_text(self, dirkey, dir_dict):
+        """ cumfiles less the files of the folders deselected or excluded
+        since the tree was loaded, see CheckStates. """
+        return str(self.og_model.checkstates.cumfiles(dirkey))
 
     def find_mtime(self, dirkey, dir_dict):
         # display ISO date only; exclude time
@@ -330,24 +380,47 @@ class TreeOperations:
         # 2. folder mtime
         # 3. folder atime
         # 4. folder ctime
-        # mtime = QStandardItem(QDateTime.fromSecsSinceEpoch(
-        #     dir_dict[dirkey]['mtime']).toString(Qt.ISODate)[:-9])
+        # mtime = QDateTime.fromSecsSinceEpoch(
+        #     dir_dict[dirkey]['mtime']).toString(Qt.ISODate)[:-9]
+        from drive_analyzer import iter_subtree
 
         def valid_value(value):
             if value is not None:
                 if value > 0:
                     return value
 
-        def recursive_mtime(dirkey_, dir_dict_, mtime_list):
-            if 'filestat' in dir_dict_[dirkey_]:  # filestat absent in demo_dir_dict
-                for filestat_ in dir_dict_[dirkey_]['filestat']:
-                    if valid_value(filestat_['mtime']):
-                        mtime_list.append(filestat_['mtime'])
-            for childkey in dir_dict_[dirkey_]['childkeys']:
-                recursive_mtime(childkey, dir_dict_, mtime_list)
+        def subtree_mtime(dirkey_, dir_dict_, mtime_list):
+            for subtree_key in iter_subtree(dirkey_, dir_dict_):
+                if subtree_key not in dir_dict_:  # not yet present while streaming
+                    continue
+                # filestat is absent in demo_dir_dict, and None until read
+                # after a counts-only scan
+                if dir_dict_[subtree_key].get('filestat') is not None:
+                    mtime_list.extend(
+                        file_mtime for file_mtime
+                        in dir_dict_[subtree_key]['filestat'].column('mtime')
+                        if valid_value(file_mtime))
 
         file_mtime_list = []
-        recursive_mtime(dirkey, dir_dict, file_mtime_list)
+        aggfilestat = dir_dict[dirkey].get('aggfilestat')
+        if self.hydrate_root is not None and \
+                self.unhydrated_counts.get(dirkey, 1) > 0:
+            # after a counts-only scan, the folder's own files until the
+            # file statistics of its whole subtree are read (see hydrate),
+            # and blank until its own are
+            if dir_dict[dirkey].get('filestat') is None:
+                return ''
+            file_mtime_list.extend(
+                file_mtime for file_mtime
+                in dir_dict[dirkey]['filestat'].column('mtime')
+                if valid_value(file_mtime))
+        elif aggfilestat is not None and 'subtree_max_mtime' in aggfilestat:
+            # precomputed by compute_stat
+            if aggfilestat['subtree_max_mtime'] is not None:
+                file_mtime_list.append(aggfilestat['subtree_max_mtime'])
+        else:
+            # e.g., while streaming, before compute_stat has run
+            subtree_mtime(dirkey, dir_dict, file_mtime_list)
         if len(file_mtime_list) > 0:
             mtime = max(file_mtime_list)
         elif len(file_mtime_list) == 0:
@@ -359,180 +432,170 @@ class TreeOperations:
                 else:
                     if valid_value(dir_dict[dirkey]['ctime']):
                         mtime = dir_dict[dirkey]['ctime']
-        mtime = QStandardItem(QDateTime.fromSecsSinceEpoch(
-            mtime).toString(Qt.ISODate)[:-9])
-        return mtime
-
-    def recalculate_cumfiles(self):
-        replacement_cumfiles_list = []
-        root = self.og_model.invisibleRootItem()
-        excluded = self.unchecked_items_set
-        self.anon_dir_dict = _pickle.loads(_pickle.dumps(self.og_dir_dict))
-        for dirkey in sorted(self.anon_dir_dict.keys(), reverse=True):
-            childkeys = self.anon_dir_dict[dirkey]['childkeys']
-            self.anon_dir_dict[dirkey]['childkeys'] = childkeys.difference(excluded)
-            self.anon_dir_dict[dirkey]['cumfiles'] = self.anon_dir_dict[dirkey]['nfiles']
-            for childkey in self.anon_dir_dict[dirkey]['childkeys']:
-                self.anon_dir_dict[dirkey]['cumfiles'] += self.anon_dir_dict[childkey]['cumfiles']
-            replacement_cumfiles_list.append(str(self.anon_dir_dict[dirkey]['cumfiles']))
-        replacement_cumfiles_list = replacement_cumfiles_list[::-1]
-        counter = 0
-        for child_ix in range(root.rowCount()):
-            root.child(child_ix, 2).setText(replacement_cumfiles_list[counter])
-            counter += 1
-
-    def propagate_checkstate_child(
-            self, parent_item, child_ix, parent_checkstate):
-        """ If parent has a full checkmark, make sure all the children's
-        checkboxes are ticked as well. """
-        if parent_checkstate != Qt.PartiallyChecked and parent_item.child(child_ix).isEnabled():
-            parent_item.child(child_ix).setCheckState(parent_checkstate)
-            parent_item = parent_item.child(child_ix)
-            nchild = parent_item.rowCount()
-            if nchild > 0:
-                for child_ix in range(nchild):
-                    self.propagate_checkstate_child(
-                        parent_item, child_ix, parent_checkstate)
-
-    def propagate_checkstate_parent(self, item):
-        """ If some children are unchecked, make parent partially checked.
-        If all children are checked, give parent a full checkmark. """
-        item_checkstate = item.checkState()
-        parent_item = item.parent()
-        if parent_item is not None:
-            if self.all_siblings_checked(item):
-                parent_item.setCheckState(Qt.Checked)
-            if (item_checkstate in (Qt.Checked, Qt.PartiallyChecked)
-                    and parent_item.checkState() == Qt.Unchecked):
-                parent_item.setCheckState(Qt.PartiallyChecked)
-            if (item_checkstate in (Qt.Unchecked, Qt.PartiallyChecked)
-                    and parent_item.checkState() == Qt.Checked
-                    # only account for non-excluded items
-                    and parent_item.child(item.row(), 1).checkState() in (
-                            Qt.Unchecked, Qt.PartiallyChecked)):
-                parent_item.setCheckState(Qt.PartiallyChecked)
-
-    def all_siblings_checked(self, item):
-        """ Determine if siblings (items sharing the same parent and are on
-        the same tree level) are all checked. """
-        all_checked = True
-        if item.parent() is not None:
-            parent_item = item.parent()
-            nchild = parent_item.rowCount()
-            for child_ix in range(nchild):
-                # only account for non-excluded items
-                if parent_item.child(child_ix, 1).checkState() in (
-                        Qt.Unchecked, Qt.PartiallyChecked):
-                    if parent_item.child(child_ix).checkState() in (
-                            Qt.Unchecked, Qt.PartiallyChecked):
-                        all_checked = False
-                        break
-        return all_checked
-
-    def dir_exclusion(self, item, root):
-        """ if directory is excluded, user cannot check directory until
-        'exclusion' is unchecked """
-        item_row = item.row()
-        exclusion_checkstate = item.checkState()
-        if item.parent() is not None:
-            parent = item.parent()
-        else:
-            parent = root
-        item = parent.child(item_row, 0)
-        if exclusion_checkstate == Qt.Unchecked:
-            exclusion_flags = Qt.ItemIsEnabled | Qt.ItemIsUserTristate | Qt.ItemIsUserCheckable
-            dir_checkstate = Qt.Checked
-            dir_flags = exclusion_flags
-            item.setFlags(dir_flags)
-            item.setCheckState(dir_checkstate)
-            for child_ix in range(item.rowCount()):
-                item.child(child_ix, 1).setCheckState(exclusion_checkstate)
-                item.child(child_ix, 1).setFlags(exclusion_flags)
-        elif exclusion_checkstate == Qt.PartiallyChecked:
-            if item.rowCount() == 0:
-                parent.child(item_row, 1).setCheckState(Qt.Checked)
-            elif self.all_children_excluded(item):
-                for child_ix in range(item.rowCount()):
-                    item.child(child_ix, 1).setFlags(Qt.ItemIsUserTristate)
-            else:
-                item.setCheckState(Qt.Checked)
-                for child_ix in range(item.rowCount()):
-                    item.child(child_ix, 1).setCheckState(Qt.Checked)
-                    item.child(child_ix, 1).setFlags(Qt.ItemIsUserTristate)
-        elif exclusion_checkstate == Qt.Checked:
-            if self.all_children_excluded(parent):
-                # make parent partially checked if all children are checked
-                if parent != root:
-                    grandparent = parent.parent()
-                    if grandparent is None:
-                        grandparent = root
-                    if parent.isEnabled():
-                        grandparent.child(parent.row(), 1).setCheckState(Qt.PartiallyChecked)
-            item.setCheckState(Qt.Unchecked)
-            item.setFlags(Qt.ItemIsUserTristate)
-            for child_ix in range(item.rowCount()):
-                item.child(child_ix, 1).setCheckState(Qt.Checked)
-                item.child(child_ix, 1).setFlags(Qt.ItemIsUserTristate)
-
-    def all_children_excluded(self, parent):
-        all_excluded = True
-        for child_ix in range(parent.rowCount()):
-            if parent.child(child_ix, 1).checkState() != Qt.Checked and parent.child(child_ix, 1).isEnabled():
-                all_excluded = False
-                break
-        return all_excluded
+        return QDateTime.fromSecsSinceEpoch(int(mtime)).toString(Qt.ISODate)[:-9]
 
     def build_tree_structure_threaded(self, root_path):
-        worker = Worker(record_stat, root_path)
-        worker.signals.started.connect(self.build_tree_started)
-        worker.signals.result.connect(self.build_tree_finished)
-        self.threadpool.start(worker)
+        # folders are only counted, their files are stat'ed when shown
+        job = ScanJob(root_path, exclude=self.exclude, counts_only=True)
+        job.signals.started.connect(self.build_tree_started)
+        job.signals.batch.connect(self.build_tree_progress)
+        job.signals.progress.connect(self.scan_progress)
+        job.signals.result.connect(self.build_tree_finished)
+        job.signals.error.connect(self.build_tree_failed)
+        job.signals.cancelled.connect(self.build_tree_cancelled)
+        job.signals.finished.connect(self.build_tree_done)
+        self.scan_job = job
+        self.scan_report = None
+        self.hydrate_root = root_path
+        self.scan_dialog = QProgressDialog(
+            'Scanning {}'.format(path_str(root_path)), 'Cancel', 0, 0,
+            self.og_tree.window())
+        self.scan_dialog.setWindowTitle('Scanning folders')
+        self.scan_dialog.setMinimumDuration(500)
+        self.scan_dialog.canceled.connect(job.cancel)
+        self.threadpool.start(job)
 
     def build_tree_started(self):
         """ Status messages when building a tree should be placed here. """
-        self.expanded_items_list = []
-        self.unchecked_items_set = set()
-        self.spinner.start()
+        self.og_dir_dict = dict()
+        self.og_model.set_dir_dict(self.og_dir_dict, checkable=False)
+        self.select_btn.setDisabled(True)
+        self.load_btn.setDisabled(True)
+        self.save_btn.setDisabled(True)
+        self.less_btn.setDisabled(True)
+
+    def build_tree_progress(self, batch):
+        """ Append folders to the tree while the scan is still running.
+        Streamed rows cannot be checked until the scan is complete. Folders
+        whose parent was not expanded yet are added when it is. """
+        for dirkey, node in batch:
+            self.og_dir_dict[dirkey] = node
+            self.og_model.append_node(dirkey)
+            if not node['dirparent']:
+                root_index = self.og_model.key_index(dirkey)
+                self.og_model.fetchMore(root_index)
+                self.og_tree.expand(root_index)
+
+    def scan_progress(self, report):
+        self.scan_report = report
+        if self.scan_dialog is None or self.scan_dialog.wasCanceled():
+            return
+        self.scan_dialog.setLabelText(
+            '{} folders, {} files ({:.0f} folders/s, {:.0f} files/s)\n{}'.format(
+                report['folders'], report['files'],
+                report['folders_per_second'], report['files_per_second'],
+                report['path']))
 
     def build_tree_finished(self, result):
         """ Status messages when tree building is complete should be
         placed here. """
+        from drive_analyzer import compute_stat, count_unhydrated
         self.og_dir_dict = result
         self.og_dir_dict = compute_stat(self.og_dir_dict)
-        self.refresh_treeview(self.og_model, self.og_tree, self.og_dir_dict)
+        self.unhydrated_counts = count_unhydrated(self.og_dir_dict)
+        # result holds the streamed nodes, so the rows are kept and only
+        # their values and flags are updated
+        self.og_model.refresh(self.og_dir_dict, checkable=True)
+        self.og_tree.sortByColumn(0, Qt.AscendingOrder)
+        self.header_autoresizable(self.og_tree.header())
         self.save_btn.setEnabled(True)
         self.less_btn.setEnabled(True)
-        self.spinner.stop()
+        # the rows shown so far, which hydrate_expanded does not see
+        topkeys = self.og_model.topkeys()
+        self.hydrate(topkeys + [childkey for topkey in topkeys for childkey
+                                in self.og_dir_dict[topkey]['childkeys']])
+        if self.scan_report is not None and self.scan_report['timed_out']:
+            timed_out = self.scan_report['timed_out']
+            QMessageBox.warning(
+                self.og_tree.window(), 'Folders skipped',
+                '{} folder(s) did not respond within {} seconds and were '
+                'skipped:\n{}'.format(len(timed_out), DIR_TIMEOUT,
+                                       '\n'.join(timed_out[:10])))
+
+    def build_tree_failed(self, error):
+        self.clear_root()
+        QMessageBox.warning(self.og_tree.window(), 'Scan failed',
+                            'The folder could not be scanned:\n{}'.format(error))
+
+    def build_tree_cancelled(self):
+        self.clear_root()
+
+    def build_tree_done(self):
+        self.scan_dialog.reset()
+        self.scan_dialog = None
+        self.scan_job = None
+        self.select_btn.setEnabled(True)
+        self.load_btn.setEnabled(True)
+
+    def hydrate_expanded(self, index):
+        """ Read the file statistics of an expanded folder and of the
+        subfolders now shown. """
+        dirkey = index.internalId()
+        if dirkey in self.og_dir_dict:
+            self.hydrate([dirkey] + list(self.og_dir_dict[dirkey]['childkeys']))
+
+    def hydrate(self, dirkeys, finished=None, message=None):
+        """ Read the file statistics of the folders among dirkeys (default:
+        all) that a counts-only scan left out, in the threadpool, then update
+        their rows and those of their parents (Date Modified) and call
+        finished(). A busy dialog shows `message` while waiting. Results for
+        a tree that was replaced in the meantime are dropped. """
+        from drive_analyzer import unhydrated_keys, list_filestat
+        if self.hydrate_root is None:
+            dirkeys = []
+        else:
+            dirkeys = unhydrated_keys(self.og_dir_dict, dirkeys)
+        if len(dirkeys) == 0:
+            if finished is not None:
+                finished()
+            return
+        nodes = {dirkey: self.og_dir_dict[dirkey] for dirkey in dirkeys}
+        worker = Worker(list_filestat, self.og_dir_dict, self.hydrate_root,
+                        dirkeys)
+        worker.signals.result.connect(
+            lambda filestats: self.hydrate_finished(nodes, filestats))
+        if message is not None:
+            dialog = QProgressDialog(message, None, 0, 0, self.og_tree.window())
+            dialog.setMinimumDuration(500)
+            worker.signals.finished.connect(dialog.reset)
+            worker.signals.finished.connect(dialog.deleteLater)
+        if finished is not None:
+            worker.signals.finished.connect(finished)
+        self.threadpool.start(worker)
+
+    def hydrate_finished(self, nodes, filestats):
+        from drive_analyzer import store_filestat
+        current = {dirkey: filestat for dirkey, filestat in filestats.items()
+                   if self.og_dir_dict.get(dirkey) is nodes[dirkey]
+                   and nodes[dirkey].get('filestat') is None}
+        for dirkey in current:
+            while dirkey in self.unhydrated_counts:
+                self.unhydrated_counts[dirkey] -= 1
+                dirkey = self.og_dir_dict[dirkey]['dirparent']
+        self.og_model.refresh_rows(store_filestat(self.og_dir_dict, current))
 
     def clear_root(self):
+        self.hydrate_root = None
+        self.unhydrated_counts = dict()
         self.root_path = None
         self.og_dir_dict = dict()
-        self.unchecked_items_set = set()
-        self.og_model.removeRow(0)
+        self.og_model.clear()
 
-    def load_dir_dicts(self, og_dir_dict, anon_dir_dict=None, checkable=True, expand_all=False):
+    def load_dir_dicts(self, og_dir_dict, checkable=True, expand_all=False):
         self.og_dir_dict = _pickle.loads(_pickle.dumps(og_dir_dict))
-        if anon_dir_dict is not None:
-            self.anon_dir_dict = _pickle.loads(_pickle.dumps(anon_dir_dict))
-        else:
-            self.anon_dir_dict = _pickle.loads(_pickle.dumps(self.og_dir_dict))
         self.refresh_treeview(self.og_model, self.og_tree, self.og_dir_dict, checkable=checkable, expand_all=expand_all)
 
-    def save_checkstates(self, dir_dict, item):
-        parent = item.parent()
-        if parent is None:
-            parent = self.og_model.invisibleRootItem()
-        dirkey = item.data(Qt.UserRole)
-        row = item.row()
-        dir_dict[dirkey]['selection_state'] = parent.child(row, 0).checkState()
-        dir_dict[dirkey]['exclusion_state'] = parent.child(row, 1).checkState()
-        for child_ix in range(item.rowCount()):
-            self.save_checkstates(dir_dict, item.child(child_ix))
-
-    def save_checkstates_root(self, dir_dict):
-        root = self.og_model.invisibleRootItem()
-        for child_ix in range(root.rowCount()):
-            self.save_checkstates(dir_dict, root.child(child_ix))
+    def collect_checkstates(self):
+        """ {dirkey: (selection_state, exclusion_state)} of every folder
+        in the tree, whether its row was built or not. """
+        from drive_analyzer import iter_subtree
+        model = self.og_model
+        checkstates = dict()
+        for topkey in model.topkeys():
+            for dirkey in iter_subtree(topkey, model.dir_dict):
+                checkstates[dirkey] = (model.check_state(dirkey, 0),
+                                       model.check_state(dirkey, 1))
+        return checkstates
 
     @staticmethod
     def header_autoresizable(header):
@@ -548,14 +611,11 @@ class TreeOperations:
 
 
 class KeyTreeOperations(TreeOperations):
-    def __init__(self, og_tree, threadpool, spinner,
+    def __init__(self, og_tree, threadpool,
                  select_btn=None, save_btn=None, load_btn=None, less_btn=None):
-        # super().__init__(og_tree, threadpool, spinner, select_btn, save_btn, load_btn, less_btn)
+        # super().__init__(og_tree, threadpool, select_btn, save_btn, load_btn, less_btn)
         og_model_headers = ['Folder Name', 'Exclude', 'Key']
-        self.unchecked_items_set = set()
-        self.expanded_items_list = []
         self.threadpool = threadpool
-        self.spinner = spinner
         self.root_path = Path('~').expanduser()
         self.select_btn = select_btn
         self.save_btn = save_btn
@@ -564,50 +624,16 @@ class KeyTreeOperations(TreeOperations):
 
         # Initialize model and tree
         self.og_tree = og_tree
-        self.og_dir_dict, self.anon_dir_dict = dict(), dict()
-        self.og_model = QStandardItemModel()
+        self.og_dir_dict = dict()
+        self.og_model = DirTreeModel(
+            og_model_headers, [(self.description_text, None)])
         self.og_tree.setModel(self.og_model)
-        self.og_model.setHorizontalHeaderLabels(og_model_headers)
         self.refresh_treeview(self.og_model, self.og_tree, self.og_dir_dict)
         self.og_tree.setItemsExpandable(False)
 
-    def append_all_children(self, dirkey, dir_dict, parent_item,
-                            checkable=True, anon_tree=False):
-        if dirkey in dir_dict:
-            dirname = QStandardItem(dir_dict[dirkey]['dirname'])
-            exclusion = QStandardItem('')
-            description = QStandardItem(dir_dict[dirkey]['description'])
-            items = [dirname, exclusion, description]
-            dirname.setData(dirkey, Qt.UserRole)
-            if checkable is True:
-                dirname.setFlags(
-                    Qt.ItemIsEnabled | Qt.ItemIsUserTristate |
-                    Qt.ItemIsUserCheckable)
-                exclusion.setFlags(
-                    Qt.ItemIsEnabled | Qt.ItemIsUserTristate |
-                    Qt.ItemIsUserCheckable)
-            elif checkable is False:
-                dirname.setFlags(
-                    Qt.ItemIsEnabled | Qt.ItemIsUserTristate)
-                exclusion.setFlags(
-                    Qt.ItemIsEnabled | Qt.ItemIsUserTristate)
-            selection_state = dir_dict[dirkey]['selection_state']
-            exclusion_state = dir_dict[dirkey]['exclusion_state']
-            if selection_state is not None:
-                dirname.setCheckState(selection_state)
-            else:
-                dirname.setCheckState(Qt.Unchecked)
-            if exclusion_state is not None:
-                exclusion.setCheckState(exclusion_state)
-            else:
-                exclusion.setCheckState(Qt.Unchecked)
-            parent_item.appendRow(items)
-            child_ix = parent_item.rowCount() - 1
-            parent_item = parent_item.child(child_ix)
-            children_keys = dir_dict[dirkey]['childkeys']
-            for child_key in sorted(children_keys):
-                self.append_all_children(child_key, dir_dict, parent_item,
-                                         checkable, anon_tree)
+    @staticmethod
+    def description_text(dirkey, dir_dict):
+        return dir_dict[dirkey]['description']
 
 
 # the whole app
@@ -0,0 +1,270 @@
+import sys
+from array import array
+from collections.abc import Mapping
+from filestat import (STAT_ATTR, INT_STAT_ATTR, FLOAT_STAT_ATTR,
+                      FileStatColumns)
+
+NODE_FIELDS = ['dirname', 'dirparent', 'childkeys', 'depth', 'nfiles',
+               'cumfiles', 'filestat', 'selection_state', 'exclusion_state',
+               'aggfilestat'] + STAT_ATTR
+NO_STATE = -1  # selection_state/exclusion_state of None
+
+
+class NodeTable:
+    """ Index-based (struct-of-arrays) storage of a folder tree, holding the
+    same information as a dir_dict in a bounded number of typed arrays.
+
+    Node keys are dense: the node with key k is stored at index k - 1, the
+    root has key 1 and every node's key is greater than its parent's.
+
+    parent: key of each node's parent, 0 for the root
+    child_offsets, children: children of node k are
+        children[child_offsets[k - 1]:child_offsets[k]] (CSR layout)
+    depth, nfiles, cumfiles: same as the dir_dict fields
+    name_ids, names: dirname of node k is names[name_ids[k - 1]], each
+        distinct name is stored once
+    stats: one array per attribute in STAT_ATTR for the folders themselves
+    file_offsets, file_ints, file_floats: the filestat of node k is the
+        block of rows file_offsets[k - 1]:file_offsets[k], laid out as in
+        FileStatColumns
+    selection_states, exclusion_states: NO_STATE stands for None
+    aggfilestat: dict holding the aggfilestat of nodes that have one
+
+    view() returns a read-only dict-like adapter, so functions written for
+    dir_dict, e.g., drive_measurement, can be used on the table directly.
+    """
+
+    def __init__(self):
+        self.parent = array('I')
+        self.child_offsets = array('Q', [0])
+        self.children = array('I')
+        self.depth = array('I')
+        self.nfiles = array('Q')
+        self.cumfiles = array('Q')
+        self.name_ids = array('I')
+        self.names = []
+        self.stats = {attr: array('d' if attr in FLOAT_STAT_ATTR else 'q')
+                      for attr in STAT_ATTR}
+        self.file_offsets = array('Q', [0])
+        self.file_ints = array('q')
+        self.file_floats = array('d')
+        self.selection_states = array('b')
+        self.exclusion_states = array('b')
+        self.aggfilestat = dict()
+        self._name_ids = dict()
+
+    @classmethod
+    def from_dir_dict(cls, dir_dict, checkstates=None):
+        """ Build a table from a dir_dict. Keys are renumbered 1..n in the
+        order of the original keys. checkstates maps original keys to the
+        (selection_state, exclusion_state) to store instead of the nodes'
+        own. The file statistics left out by a counts_only scan must be read
+        first (see hydrate_filestat), else ValueError is raised. """
+        keymap = {oldkey: newkey for newkey, oldkey
+                  in enumerate(sorted(dir_dict.keys()), start=1)}
+        table = cls()
+        for oldkey in sorted(dir_dict.keys()):
+            node = dir_dict[oldkey]
+            states = checkstates.get(oldkey) if checkstates is not None else None
+            table._append_node(node, keymap.get(node['dirparent'], 0), states)
+            if node.get('aggfilestat') is not None:
+                table.aggfilestat[keymap[oldkey]] = node['aggfilestat']
+        table._finish()
+        return table
+
+    @classmethod
+    def from_records(cls, records):
+        """ Build a table from (dirkey, node) pairs in the order yielded by
+        iter_stat, without holding the whole dir_dict in memory. """
+        keymap = dict()
+        table = cls()
+        for oldkey, node in records:
+            keymap[oldkey] = len(table.parent) + 1
+            table._append_node(node, keymap.get(node['dirparent'], 0))
+        table._finish()
+        return table
+
+    def _append_node(self, node, parentkey, states=None):
+        self.parent.append(parentkey)
+        if parentkey:
+            self.depth.append(self.depth[parentkey - 1] + 1)
+        else:
+            self.depth.append(0)
+        self.nfiles.append(node['nfiles'])
+        self.cumfiles.append(node['cumfiles'])
+        name_id = self._name_ids.setdefault(node['dirname'], len(self.names))
+        if name_id == len(self.names):
+            self.names.append(sys.intern(node['dirname']))
+        self.name_ids.append(name_id)
+        for attr in STAT_ATTR:
+            self._append_value(self.stats, attr, node.get(attr))
+        filestat = node.get('filestat')
+        if filestat is None and 'filestat' in node:
+            # a table has no way to tell these from folders without files
+            raise ValueError('the file statistics of folder {!r} were not '
+                             'read, see hydrate_filestat'.format(node['dirname']))
+        if filestat is None:  # e.g., the demo dir_dict
+            filestat = FileStatColumns()
+        elif not isinstance(filestat, FileStatColumns):
+            filestat = FileStatColumns.from_rows(filestat)
+        self.file_offsets.append(self.file_offsets[-1] + len(filestat))
+        self._extend_values('file_ints', filestat.ints)
+        self._extend_values('file_floats', filestat.floats)
+        if states is None:
+            states = node.get('selection_state'), node.get('exclusion_state')
+        for column, state in zip((self.selection_states, self.exclusion_states),
+                                 states):
+            column.append(NO_STATE if state is None else state)
+
+    @staticmethod
+    def _append_value(columns, attr, value):
+        try:
+            columns[attr].append(value)
+        except (TypeError, OverflowError):
+            columns[attr] = list(columns[attr]) + [value]
+
+    def _extend_values(self, name, values):
+        try:
+            getattr(self, name).extend(values)
+        except (TypeError, OverflowError):
+            setattr(self, name, list(getattr(self, name)) + list(values))
+
+    def _finish(self):
+        """ Build the CSR child arrays from the parent array. """
+        n = len(self.parent)
+        counts = array('Q', bytes(8 * (n + 1)))
+        for parentkey in self.parent:
+            if parentkey:
+                counts[parentkey] += 1
+        offsets = array('Q', [0])
+        for key in range(1, n + 1):
+            offsets.append(offsets[-1] + counts[key])
+        fill = array('Q', offsets[:-1])
+        children = array('I', bytes(4 * offsets[-1]))
+        for key, parentkey in enumerate(self.parent, start=1):
+            if parentkey:
+                children[fill[parentkey - 1]] = key
+                fill[parentkey - 1] += 1
+        self.child_offsets = offsets
+        self.children = children
+        self._name_ids = dict()
+
+    def __len__(self):
+        return len(self.parent)
+
+    def childkeys(self, key):
+        return self.children[self.child_offsets[key - 1]:
+                             self.child_offsets[key]]
+
+    def filestat(self, key):
+        start, stop = self.file_offsets[key - 1], self.file_offsets[key]
+        if stop == start:
+            return FileStatColumns()
+        ints, floats = self.file_ints, self.file_floats
+        if isinstance(ints, array):
+            ints = memoryview(ints)
+        if isinstance(floats, array):
+            floats = memoryview(floats)
+        return FileStatColumns(
+            ints[len(INT_STAT_ATTR) * start:len(INT_STAT_ATTR) * stop],
+            floats[len(FLOAT_STAT_ATTR) * start:len(FLOAT_STAT_ATTR) * stop],
+            stop - start)
+
+    def compute_cumfiles(self):
+        """ Same as compute_cumfiles for a dir_dict, in a single bottom-up
+        pass over the arrays. """
+        cumfiles = array('Q', self.nfiles)
+        for ix in range(len(self.parent) - 1, -1, -1):
+            if self.parent[ix]:
+                cumfiles[self.parent[ix] - 1] += cumfiles[ix]
+        self.cumfiles = cumfiles
+
+    def nbytes(self):
+        """ Approximate memory used by the table, names included. """
+        total = sum(sys.getsizeof(name) for name in self.names)
+        columns = [self.parent, self.child_offsets, self.children, self.depth,
+                   self.nfiles, self.cumfiles, self.name_ids,
+                   self.file_offsets, self.file_ints, self.file_floats,
+                   self.selection_states, self.exclusion_states]
+        columns += list(self.stats.values())
+        for column in columns:
+            if isinstance(column, (array, memoryview)):
+                total += column.itemsize * len(column)
+            else:
+                total += sys.getsizeof(column) + 8 * len(column)
+        return total
+
+    def to_dir_dict(self):
+        """ Materialize the table as a regular (mutable) dir_dict. """
+        view = self.view()
+        return {key: {field: (set(value) if field == 'childkeys' else value)
+                      for field, value in view[key].items()}
+                for key in view}
+
+    def view(self):
+        return NodeTableView(self)
+
+
+class NodeTableView(Mapping):
+    """ Read-only adapter exposing a NodeTable as a dir_dict, i.e.,
+    view[dirkey]['field']. Nodes are built on access and hold no data of
+    their own. """
+
+    def __init__(self, table):
+        self.table = table
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return NodeView(self.table, key)
+
+    def __contains__(self, key):
+        return isinstance(key, int) and 1 <= key <= len(self.table)
+
+    def __iter__(self):
+        return iter(range(1, len(self.table) + 1))
+
+    def __len__(self):
+        return len(self.table)
+
+
+class NodeView(Mapping):
+    """ A single node of a NodeTableView. """
+    __slots__ = ('table', 'key')
+
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key
+
+    def __getitem__(self, field):
+        table, ix = self.table, self.key - 1
+        if field == 'dirname':
+            return table.names[table.name_ids[ix]]
+        elif field == 'dirparent':
+            return table.parent[ix] or False
+        elif field == 'childkeys':
+            return frozenset(table.childkeys(self.key))
+        elif field in ('depth', 'nfiles', 'cumfiles'):
+            return getattr(table, field)[ix]
+        elif field == 'filestat':
+            return table.filestat(self.key)
+        elif field in ('selection_state', 'exclusion_state'):
+            state = getattr(table, field + 's')[ix]
+            return None if state == NO_STATE else state
+        elif field == 'aggfilestat':
+            return table.aggfilestat.get(self.key)
+        elif field in table.stats:
+            return table.stats[field][ix]
+        raise KeyError(field)
+
+    def __setitem__(self, field, value):
+        raise TypeError('NodeTable views are read-only')
+
+    def __contains__(self, field):
+        return field in NODE_FIELDS
+
+    def __iter__(self):
+        return iter(NODE_FIELDS)
+
+    def __len__(self):
+        return len(NODE_FIELDS)
@@ -0,0 +1,282 @@
+"""
+Binary session files: a NodeTable saved column by column so that it can be
+memory-mapped back without parsing.
+
+Layout (all offsets in bytes from the start of the file):
+    SESSION_MAGIC
+    header length, unsigned 64-bit little-endian
+    header, UTF-8 JSON: format version, byte order, number of nodes, user
+        metadata (e.g., the software choice of a saved session) and, for
+        each column, its name, typecode, item size, offset and length
+    columns, each starting at a multiple of 8
+
+Columns mirror the arrays of NodeTable, except that
+    children is the list of child keys of every node, sorted and stored as
+        unsigned LEB128 varints of the difference to the previous key (the
+        first one relative to the node's own key), with child_byte_offsets
+        locating the block of each node
+    names is the UTF-8 encoded folder names, located by name_offsets
+    aggfilestat is one UTF-8 JSON object per node, located by
+        aggfilestat_offsets, and empty for nodes without one
+    columns holding values that do not fit their typed array (see
+        FileStatColumns) are stored as a JSON list with typecode 'json'
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import Mapping, Sequence
+from filestat import STAT_ATTR, FLOAT_STAT_ATTR
+from nodetable import NodeTable
+
+SESSION_MAGIC = b'CARDSESS'
+SESSION_VERSION = 1
+SESSION_SUFFIX = '.cas'
+_ALIGNMENT = 8
+_HEADER_LENGTH = struct.Struct('<Q')
+_NODE_COLUMNS = [('parent', 'I'), ('child_offsets', 'Q'), ('depth', 'I'),
+                 ('nfiles', 'Q'), ('cumfiles', 'Q'), ('name_ids', 'I'),
+                 ('file_offsets', 'Q'), ('file_ints', 'q'),
+                 ('file_floats', 'd'), ('selection_states', 'b'),
+                 ('exclusion_states', 'b')]
+
+
+def save_session(session_path, table, metadata=None):
+    """ Save a NodeTable, with a JSON serializable dict of metadata, as a
+    binary session file. The file is replaced atomically. """
+    columns = [(name, typecode, getattr(table, name))
+               for name, typecode in _NODE_COLUMNS]
+    for attr in STAT_ATTR:
+        columns.append(('stats.' + attr,
+                        'd' if attr in FLOAT_STAT_ATTR else 'q',
+                        table.stats[attr]))
+    children, child_byte_offsets = encode_children(table)
+    columns.append(('children', 'B', children))
+    columns.append(('child_byte_offsets', 'Q', child_byte_offsets))
+    names, name_offsets = encode_records(
+        name.encode('utf8') for name in table.names)
+    columns.append(('names', 'B', names))
+    columns.append(('name_offsets', 'Q', name_offsets))
+    aggfilestat, aggfilestat_offsets = encode_records(
+        b'' if table.aggfilestat.get(key) is None
+        else json.dumps(table.aggfilestat[key]).encode('utf8')
+        for key in range(1, len(table) + 1))
+    columns.append(('aggfilestat', 'B', aggfilestat))
+    columns.append(('aggfilestat_offsets', 'Q', aggfilestat_offsets))
+
+    buffers = []
+    column_headers = []
+    offset = 0
+    for name, typecode, values in columns:
+        buffer, typecode, itemsize = column_buffer(typecode, values)
+        column_headers.append({'name': name, 'typecode': typecode,
+                               'itemsize': itemsize, 'offset': offset,
+                               'nbytes': len(buffer)})
+        buffers.append(buffer)
+        offset += padded_length(len(buffer))
+    header = json.dumps({'version': SESSION_VERSION,
+                         'byteorder': sys.byteorder,
+                         'nnodes': len(table),
+                         'metadata': metadata or dict(),
+                         'columns': column_headers}).encode('utf8')
+    data_start = padded_length(
+        len(SESSION_MAGIC) + _HEADER_LENGTH.size + len(header))
+
+    tmp_path = os.fspath(session_path) + '.tmp'
+    with open(tmp_path, 'wb') as sf:
+        sf.write(SESSION_MAGIC)
+        sf.write(_HEADER_LENGTH.pack(len(header)))
+        sf.write(header)
+        sf.write(bytes(data_start - sf.tell()))
+        for buffer in buffers:
+            sf.write(buffer)
+            sf.write(bytes(padded_length(len(buffer)) - len(buffer)))
+    os.replace(tmp_path, session_path)
+
+
+def load_session(session_path):
+    """ Memory-map a binary session file. Returns (table, metadata), where
+    the arrays of the table are read-only views into the file, so nothing
+    is read until it is used, and the nodes of table.view() are only built
+    when accessed. """
+    with open(session_path, 'rb') as sf:
+        session_map = mmap.mmap(sf.fileno(), 0, access=mmap.ACCESS_READ)
+    prefix = len(SESSION_MAGIC) + _HEADER_LENGTH.size
+    if session_map[:len(SESSION_MAGIC)] != SESSION_MAGIC:
+        session_map.close()
+        raise ValueError('not a session file: {}'.format(session_path))
+    header_length, = _HEADER_LENGTH.unpack(
+        session_map[len(SESSION_MAGIC):prefix])
+    header = json.loads(session_map[prefix:prefix + header_length])
+    if header['version'] != SESSION_VERSION:
+        session_map.close()
+        raise ValueError('unsupported session version: {}'.format(
+            header['version']))
+    data_start = padded_length(prefix + header_length)
+    data = memoryview(session_map)
+    columns = dict()
+    for column in header['columns']:
+        start = data_start + column['offset']
+        buffer = data[start:start + column['nbytes']]
+        columns[column['name']] = mapped_column(
+            buffer, column['typecode'], column['itemsize'],
+            header['byteorder'])
+    table = MappedNodeTable(session_map, columns)
+    return table, header['metadata']
+
+
+def is_session_file(path):
+    """ Whether a file starts with SESSION_MAGIC. """
+    try:
+        with open(path, 'rb') as sf:
+            return sf.read(len(SESSION_MAGIC)) == SESSION_MAGIC
+    except OSError:
+        return False
+
+
+class MappedNodeTable(NodeTable):
+    """ NodeTable whose columns are views into a memory-mapped session
+    file. Child keys, names and aggfilestat are decoded per node when they
+    are accessed. """
+
+    def __init__(self, session_map, columns):
+        super().__init__()
+        self.session_map = session_map
+        for name, _ in _NODE_COLUMNS:
+            setattr(self, name, columns[name])
+        self.stats = {attr: columns['stats.' + attr] for attr in STAT_ATTR}
+        self.children = columns['children']
+        self.child_byte_offsets = columns['child_byte_offsets']
+        self.names = MappedRecords(
+            columns['names'], columns['name_offsets'],
+            lambda record: record.decode('utf8'))
+        self.aggfilestat = MappedAggfilestat(
+            columns['aggfilestat'], columns['aggfilestat_offsets'])
+
+    def childkeys(self, key):
+        start = self.child_byte_offsets[key - 1]
+        stop = self.child_byte_offsets[key]
+        return decode_varint_deltas(self.children[start:stop], key)
+
+
+class MappedRecords(Sequence):
+    """ Variable-length records stored back to back in a buffer, record i
+    spanning offsets[i]:offsets[i + 1]. Records are decoded on access. """
+
+    def __init__(self, buffer, offsets, decode):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.decode = decode
+
+    def __getitem__(self, ix):
+        if ix < 0:
+            ix += len(self)
+        if not 0 <= ix < len(self):
+            raise IndexError('record index out of range')
+        return self.decode(
+            bytes(self.buffer[self.offsets[ix]:self.offsets[ix + 1]]))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class MappedAggfilestat(Mapping):
+    """ aggfilestat of a MappedNodeTable, keyed by node key like
+    NodeTable.aggfilestat. Each node's dict is parsed when accessed. """
+
+    def __init__(self, buffer, offsets):
+        self.records = MappedRecords(buffer, offsets, json.loads)
+
+    def __getitem__(self, key):
+        if not (isinstance(key, int) and 1 <= key <= len(self.records)
+                and self.records.offsets[key] > self.records.offsets[key - 1]):
+            raise KeyError(key)
+        return self.records[key - 1]
+
+    def __iter__(self):
+        offsets = self.records.offsets
+        return (key for key in range(1, len(offsets))
+                if offsets[key] > offsets[key - 1])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def encode_children(table):
+    """ Varint-encoded child keys of every node of a table, with the byte
+    offsets of each node's block. """
+    encoded = bytearray()
+    byte_offsets = array('Q', [0])
+    for key in range(1, len(table) + 1):
+        previous = key
+        for childkey in sorted(table.childkeys(key)):
+            delta = childkey - previous
+            previous = childkey
+            while delta >= 0x80:
+                encoded.append((delta & 0x7f) | 0x80)
+                delta >>= 7
+            encoded.append(delta)
+        byte_offsets.append(len(encoded))
+    return encoded, byte_offsets
+
+
+def decode_varint_deltas(encoded, key):
+    childkeys = []
+    previous = key
+    delta, shift = 0, 0
+    for byte in encoded:
+        delta |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            previous += delta
+            childkeys.append(previous)
+            delta, shift = 0, 0
+    return childkeys
+
+
+def encode_records(records):
+    encoded = bytearray()
+    offsets = array('Q', [0])
+    for record in records:
+        encoded += record
+        offsets.append(len(encoded))
+    return encoded, offsets
+
+
+def column_buffer(typecode, values):
+    """ Bytes of a column, with the typecode and item size it is saved
+    under. """
+    if isinstance(values, (bytes, bytearray)):
+        return values, 'B', 1
+    if isinstance(values, memoryview):
+        return values.cast('B'), values.format, values.itemsize
+    if not isinstance(values, array):
+        try:
+            values = array(typecode, values)
+        except (TypeError, OverflowError):
+            return json.dumps(list(values)).encode('utf8'), 'json', 1
+    return values.tobytes(), values.typecode, values.itemsize
+
+
+def mapped_column(buffer, typecode, itemsize, byteorder):
+    if typecode == 'json':
+        return json.loads(bytes(buffer))
+    if typecode == 'B':
+        return buffer
+    if array(typecode).itemsize != itemsize:
+        raise ValueError('session column of {}-byte {!r} values is not '
+                         'supported on this platform'.format(itemsize, typecode))
+    if byteorder != sys.byteorder:
+        values = array(typecode)
+        values.frombytes(buffer)
+        values.byteswap()
+        return values
+    return buffer.cast(typecode)
+
+
+def padded_length(length):
+    return -(-length // _ALIGNMENT) * _ALIGNMENT
@@ -0,0 +1,133 @@
+import math
+import random
+from bisect import bisect_left
+from itertools import accumulate
+
+DEFAULT_K = 200
+# rank error of a quantile returned by a sketch with the default k, i.e.,
+# the value returned for q has a true rank between (q - 0.0165) * n and
+# (q + 0.0165) * n with 99% probability (the bound documented for KLL
+# sketches with k=200; it shrinks roughly as 1/k)
+DEFAULT_RANK_ERROR = 0.0165
+
+_rng = random.Random(0)  # seeded so that repeated runs give the same results
+
+
+class KLLSketch:
+    """ Mergeable quantile sketch (Karnin, Lang and Liberty, 2016) holding a
+    bounded sample of the values it was given.
+
+    The sketch is a stack of compactors. Level h holds values that each
+    stand for 2**h of the original values; when the sketch is full, a level
+    is sorted and every other value (from a random offset) is promoted to
+    the next level. Level capacities shrink geometrically going down the
+    stack, so a sketch holds at most about 3 * k values regardless of how
+    many it was given, and it is exact as long as it holds fewer than k.
+
+    Two sketches are merged by concatenating their levels and compacting,
+    so sketches of sibling folders can be combined into their parent's
+    without going back to the files. """
+    __slots__ = ('k', 'n', 'compactors', 'size', 'max_size')
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.compactors = []
+        self.size = 0
+        self.max_size = 0
+        self._grow()
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(level)
+                            for level in range(len(self.compactors)))
+
+    def update(self, value):
+        self.compactors[0].append(value)
+        self.size += 1
+        self.n += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def extend(self, values):
+        level0 = self.compactors[0]
+        nvalues = len(level0)
+        level0.extend(values)
+        nvalues = len(level0) - nvalues
+        self.size += nvalues
+        self.n += nvalues
+        if self.size >= self.max_size:
+            self._compress()
+
+    def merge(self, other):
+        """ Add the values summarized by another sketch to this one. """
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, values in enumerate(other.compactors):
+            self.compactors[level].extend(values)
+        self.size += other.size
+        self.n += other.n
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        while self.size >= self.max_size:
+            for level, values in enumerate(self.compactors):
+                if len(values) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self._grow()
+                    values.sort()
+                    kept = [values.pop()] if len(values) % 2 else []
+                    promoted = values[_rng.getrandbits(1)::2]
+                    self.compactors[level + 1].extend(promoted)
+                    self.compactors[level] = kept
+                    self.size += len(promoted) - len(values)
+                    break
+
+    def quantile(self, q):
+        """ Value whose rank is approximately q * n, for 0 <= q <= 1. None if
+        the sketch is empty. """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        if self.n == 0:
+            return [None] * len(qs)
+        if self.size == len(self.compactors[0]):
+            # nothing was compacted yet, the values are exact
+            values = sorted(self.compactors[0])
+            return [values[max(math.ceil(q * len(values)) - 1, 0)]
+                    for q in qs]
+        weighted = sorted((value, 2 ** level)
+                          for level, values in enumerate(self.compactors)
+                          for value in values)
+        cumweights = list(accumulate(weight for _, weight in weighted))
+        return [weighted[min(bisect_left(cumweights, q * cumweights[-1]),
+                             len(weighted) - 1)][0]
+                for q in qs]
+
+    def __len__(self):
+        return self.n
+
+    def to_dict(self):
+        """ JSON serializable form of the sketch, see from_dict. """
+        return {'k': self.k, 'n': self.n,
+                'compactors': [list(values) for values in self.compactors]}
+
+    @classmethod
+    def from_dict(cls, sketch_dict):
+        sketch = cls(sketch_dict['k'])
+        sketch.n = sketch_dict['n']
+        sketch.compactors = []
+        for values in sketch_dict['compactors']:
+            sketch._grow()
+            sketch.compactors[-1] = list(values)
+        sketch.size = sum(len(values) for values in sketch.compactors)
+        return sketch
+
+    def __repr__(self):
+        return 'KLLSketch(k={}, n={}, {} values held)'.format(
+            self.k, self.n, self.size)
@@ -0,0 +1,323 @@
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, pyqtSignal
+from checkstate import CheckStates
+
+CHECKABLE_FLAGS = Qt.ItemIsEnabled | Qt.ItemIsUserTristate | Qt.ItemIsUserCheckable
+STREAMED_FLAGS = Qt.ItemIsEnabled | Qt.ItemIsUserTristate
+VALUE_FLAGS = Qt.ItemIsEnabled
+CHECK_COLUMNS = (0, 1)  # folder selection and exclusion
+
+
+class DirTreeModel(QAbstractItemModel):
+    """ Item model reading folders straight from a dir_dict (or NodeTable
+    view) instead of holding one QStandardItem per cell.
+
+    Column 0 shows dirname and column 1 is the exclusion checkbox; the
+    other columns are given as `value_columns`, a list of
+    (text(dirkey, dir_dict), sort_key(text)) pairs, sort_key being None
+    for plain text order.
+
+    Children are only added when a folder is expanded (canFetchMore and
+    fetchMore), so setting a tree takes constant time whatever its size.
+    The check states of columns 0 and 1 are kept by `checkstates` (see
+    CheckStates) for the whole tree, fetched or not, and can be read and
+    changed by dirkey. A change and everything it propagates to is reported
+    at once: one dataChanged per parent whose fetched rows changed, then
+    checkStatesChanged with the set of (dirkey, column) that changed. The
+    columns listed in `cumfiles_columns`, which show CheckStates.cumfiles,
+    are read again for the folders whose cumfiles changed. Rows
+    share the order of their fetched siblings, or the order they would be
+    fetched in (see childkeys), so code walking the tree by dirkey sees the
+    same order as the view. """
+    checkStatesChanged = pyqtSignal(object)
+
+    def __init__(self, headers, value_columns, cumfiles_columns=(), parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.value_columns = value_columns
+        self.cumfiles_columns = cumfiles_columns
+        self.dir_dict = dict()
+        self.checkable = True
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+        self._reset_state()
+
+    def _reset_state(self):
+        self._children = {0: []}  # fetched children, by parent key
+        self._parents = dict()  # parent of every fetched key, 0 at the top
+        self._rows = dict()  # row of every fetched key
+        self._texts = dict()
+        self.checkstates = CheckStates(
+            self.dir_dict, self.unordered_childkeys, self.parentkey)
+
+    def set_dir_dict(self, dir_dict, checkable=True):
+        """ Show a new tree, with only its root row in place. """
+        self.beginResetModel()
+        self.dir_dict = dir_dict
+        self.checkable = checkable
+        self._reset_state()
+        if len(dir_dict) > 0:
+            # convention: dir_dict key starts at 1 since 0==False
+            self._set_children(0, [min(dir_dict.keys())])
+        self.endResetModel()
+
+    def clear(self):
+        self.set_dir_dict(dict())
+
+    def refresh(self, dir_dict=None, checkable=None):
+        """ Re-read every value after dir_dict was changed in place, e.g.,
+        by compute_stat, or replaced by a dict of the same nodes, keeping
+        the fetched rows. """
+        self.layoutAboutToBeChanged.emit()
+        if dir_dict is not None:
+            self.dir_dict = dir_dict
+            self.checkstates.dir_dict = dir_dict
+        self.checkstates.invalidate_counts()
+        if checkable is not None:
+            self.checkable = checkable
+        self._texts = dict()
+        self.layoutChanged.emit()
+
+    def append_node(self, dirkey):
+        """ Add a folder that was added to dir_dict, e.g., while streaming,
+        as the last row of its parent if the parent's rows are fetched. """
+        parentkey = self.dir_dict[dirkey]['dirparent']
+        if not parentkey:
+            if len(self._children[0]) > 0:
+                return
+            parentkey = 0
+        elif parentkey not in self._children or dirkey in self._rows:
+            return
+        parent = self.key_index(parentkey)
+        row = len(self._children[parentkey])
+        self.beginInsertRows(parent, row, row)
+        self._children[parentkey].append(dirkey)
+        self._parents[dirkey] = parentkey
+        self._rows[dirkey] = row
+        self.endInsertRows()
+
+    # tree structure by dirkey
+
+    def topkeys(self):
+        return self._children[0]
+
+    def parentkey(self, dirkey):
+        """ Parent of a row, 0 for a top-level row. """
+        if dirkey in self._parents:
+            return self._parents[dirkey]
+        return self.dir_dict[dirkey]['dirparent'] or 0
+
+    def childkeys(self, dirkey, ordered=True):
+        """ Children of a folder in row order, whether fetched or not. With
+        ordered=False, unfetched children come in no particular order,
+        which spares sorting them. """
+        if dirkey in self._children:
+            return self._children[dirkey]
+        childkeys = [childkey for childkey in self.dir_dict[dirkey]['childkeys']
+                     if childkey in self.dir_dict]
+        return self._sorted_keys(childkeys) if ordered else childkeys
+
+    def unordered_childkeys(self, dirkey):
+        return self.childkeys(dirkey, ordered=False)
+
+    def row(self, dirkey):
+        if dirkey in self._rows:
+            return self._rows[dirkey]
+        return self.childkeys(self.parentkey(dirkey)).index(dirkey)
+
+    def key_index(self, dirkey, column=0):
+        """ Index of a row, fetching the rows of its ancestors if needed. """
+        if not dirkey:
+            return QModelIndex()
+        if dirkey not in self._rows:
+            path = []
+            ancestor = dirkey
+            while ancestor not in self._rows:
+                ancestor = self.parentkey(ancestor)
+                path.append(ancestor)
+            for ancestor in reversed(path):
+                self.fetchMore(self.key_index(ancestor))
+        return self.createIndex(self._rows[dirkey], column, dirkey)
+
+    # check states and flags by dirkey
+
+    def check_state(self, dirkey, column):
+        return Qt.CheckState(self.checkstates.state(dirkey, column))
+
+    def set_check_state(self, dirkey, column, state):
+        self._notify(self.checkstates.set_state(dirkey, column, state))
+
+    def item_flags(self, dirkey, column):
+        if column not in CHECK_COLUMNS:
+            return VALUE_FLAGS
+        if not self.checkstates.enabled(dirkey, column):
+            return Qt.ItemIsUserTristate
+        return CHECKABLE_FLAGS if self.checkable else STREAMED_FLAGS
+
+    def set_enabled(self, dirkey, column, enabled):
+        self._notify(self.checkstates.set_enabled(dirkey, column, enabled))
+
+    def is_enabled(self, dirkey, column=0):
+        return self.checkstates.enabled(dirkey, column)
+
+    def text(self, dirkey, column):
+        if (dirkey, column) not in self._texts:
+            if column == 0:
+                text = self.dir_dict[dirkey]['dirname']
+            elif column == 1:
+                text = ''
+            else:
+                text, _ = self.value_columns[column - 2]
+                text = text(dirkey, self.dir_dict)
+            self._texts[(dirkey, column)] = text
+        return self._texts[(dirkey, column)]
+
+    def _notify(self, changed):
+        if len(changed) == 0:
+            return
+        cumfiles_changed = self.checkstates.cumfiles_changed
+        for dirkey in cumfiles_changed:
+            for column in self.cumfiles_columns:
+                self._texts.pop((dirkey, column), None)
+        self._emit_data_changed(cumfiles_changed.union(
+            dirkey for dirkey, _ in changed))
+        self.checkStatesChanged.emit(changed)
+
+    def refresh_rows(self, dirkeys):
+        """ Re-read the values of some folders after their nodes were
+        changed in place, e.g., when their file statistics were read. """
+        for dirkey in dirkeys:
+            for column in range(2, len(self.headers)):
+                self._texts.pop((dirkey, column), None)
+        self._emit_data_changed(dirkeys)
+
+    def _emit_data_changed(self, dirkeys):
+        """ dataChanged for the fetched rows among dirkeys. """
+        # dataChanged ranges must share a parent
+        ranges = dict()
+        for dirkey in dirkeys:
+            if dirkey in self._rows:
+                parentkey = self._parents[dirkey]
+                row = self._rows[dirkey]
+                first, last = ranges.get(parentkey, (row, row))
+                ranges[parentkey] = (min(first, row), max(last, row))
+        for parentkey, (first, last) in ranges.items():
+            childkeys = self._children[parentkey]
+            self.dataChanged.emit(
+                self.createIndex(first, 0, childkeys[first]),
+                self.createIndex(last, len(self.headers) - 1, childkeys[last]))
+
+    # QAbstractItemModel interface
+
+    def index(self, row, column, parent=QModelIndex()):
+        parentkey = parent.internalId() if parent.isValid() else 0
+        children = self._children.get(parentkey, ())
+        if not (0 <= row < len(children) and 0 <= column < len(self.headers)):
+            return QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parentkey = self._parents.get(index.internalId(), 0)
+        if not parentkey:
+            return QModelIndex()
+        return self.createIndex(self._rows[parentkey], 0, parentkey)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        parentkey = parent.internalId() if parent.isValid() else 0
+        return len(self._children.get(parentkey, ()))
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.headers)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return False
+        if not parent.isValid():
+            return len(self._children[0]) > 0
+        dirkey = parent.internalId()
+        if dirkey in self._children:
+            return len(self._children[dirkey]) > 0
+        return any(childkey in self.dir_dict
+                   for childkey in self.dir_dict[dirkey]['childkeys'])
+
+    def canFetchMore(self, parent):
+        return (parent.isValid() and parent.internalId() not in self._children
+                and self.hasChildren(parent))
+
+    def fetchMore(self, parent):
+        dirkey = parent.internalId()
+        if not parent.isValid() or dirkey in self._children:
+            return
+        childkeys = self.childkeys(dirkey)
+        if len(childkeys) == 0:
+            self._children[dirkey] = []
+            return
+        self.beginInsertRows(parent, 0, len(childkeys) - 1)
+        self._set_children(dirkey, childkeys)
+        self.endInsertRows()
+
+    def _set_children(self, parentkey, childkeys):
+        self._children[parentkey] = childkeys
+        for row, childkey in enumerate(childkeys):
+            self._parents[childkey] = parentkey
+            self._rows[childkey] = row
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        dirkey, column = index.internalId(), index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.text(dirkey, column)
+        elif role == Qt.CheckStateRole and column in CHECK_COLUMNS:
+            return self.check_state(dirkey, column)
+        elif role == Qt.UserRole and column == 0:
+            return dirkey
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if (not index.isValid() or role != Qt.CheckStateRole
+                or index.column() not in CHECK_COLUMNS):
+            return False
+        self.set_check_state(index.internalId(), index.column(), value)
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return self.item_flags(index.internalId(), index.column())
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """ Sort the fetched rows of every folder; rows fetched later are
+        sorted the same way. """
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        for parentkey, childkeys in self._children.items():
+            self._set_children(parentkey, self._sorted_keys(childkeys))
+        self.changePersistentIndexList(old_indexes, [
+            self.createIndex(self._rows[index.internalId()], index.column(),
+                             index.internalId())
+            for index in old_indexes])
+        self.layoutChanged.emit()
+
+    def _sorted_keys(self, dirkeys):
+        dirkeys = sorted(dirkeys)
+        if self.sort_column is None or self.sort_column == 1:
+            return dirkeys
+        if self.sort_column == 0:
+            sort_key = None
+        else:
+            _, sort_key = self.value_columns[self.sort_column - 2]
+        sort_key = sort_key or (lambda text: text)
+        column = self.sort_column
+        return sorted(dirkeys, key=lambda dirkey: sort_key(self.text(dirkey, column)),
+                      reverse=self.sort_order == Qt.DescendingOrder)
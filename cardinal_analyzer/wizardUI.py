@@ -2,6 +2,9 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 
 
 class WizardUI(object):
+    """ The five wizard pages. setup_ui builds the first page and adds
+    every page to the wizard with its title, the contents of the other pages
+    are built by setup_page when the page is first shown. """
     def setup_ui(self, wizard):
         wizard.setObjectName("wizard")
         wizard.resize(732, 425)
@@ -65,9 +68,36 @@ class WizardUI(object):
         self.scrollarea.setWidget(self.scrollarea_widget)
         self.gridlayout_wp1_0.addWidget(self.scrollarea, 0, 0, 1, 1)
 
-        # page 2 contents
+        # other pages, built by setup_page
         self.wizardpage2 = QtWidgets.QWizardPage()
         self.wizardpage2.setObjectName("wizardpage2")
+        self.wizardpage3 = QtWidgets.QWizardPage()
+        self.wizardpage3.setObjectName("wizardpage3")
+        self.wizardpage4 = QtWidgets.QWizardPage()
+        self.wizardpage4.setObjectName("wizardpage4")
+        self.wizardpage5 = QtWidgets.QWizardPage()
+        self.wizardpage5.setObjectName("wizardpage5")
+        self.built_pages = {0}
+
+        # all pages
+        self.retranslate_ui(wizard)
+        wizard.addPage(self.wizardpage1)
+        wizard.addPage(self.wizardpage2)
+        wizard.addPage(self.wizardpage3)
+        wizard.addPage(self.wizardpage4)
+        wizard.addPage(self.wizardpage5)
+
+    def setup_page(self, page_id):
+        """ Build the contents of a page (by wizard page id), unless they
+        were built already. Returns whether they were built now. """
+        if page_id in self.built_pages:
+            return False
+        self.built_pages.add(page_id)
+        [None, self.setup_page2, self.setup_page3, self.setup_page4,
+         self.setup_page5][page_id]()
+        return True
+
+    def setup_page2(self):
         self.verticallayout_wp2_0 = QtWidgets.QVBoxLayout(self.wizardpage2)
         self.verticallayout_wp2_0.setObjectName("verticallayout_wp2_0")
         self.horizontallayout_wp2_0 = QtWidgets.QHBoxLayout()
@@ -83,10 +113,9 @@ class WizardUI(object):
         self.verticallayout_wp2_0.addWidget(self.og_tree_key)
         self.verticallayout_wp2_0.addWidget(self.og_tree_0)
         self.verticallayout_wp2_0.addLayout(self.horizontallayout_wp2_0)
+        self.retranslate_page2()
 
-        # page 3 contents
-        self.wizardpage3 = QtWidgets.QWizardPage()
-        self.wizardpage3.setObjectName("wizardpage3")
+    def setup_page3(self):
         self.verticallayout_wp3_0 = QtWidgets.QVBoxLayout(self.wizardpage3)
         self.verticallayout_wp3_0.setObjectName("verticallayout_wp3_0")
         self.horizontallayout_wp3_0 = QtWidgets.QHBoxLayout()
@@ -96,14 +125,19 @@ class WizardUI(object):
         self.verticallayout_wp3_0.addWidget(self.textarea_wp3_0)
         self.verticallayout_wp3_0.addLayout(self.horizontallayout_wp3_0)
 
-        # page 4 contents
-        self.wizardpage4 = QtWidgets.QWizardPage()
-        self.wizardpage4.setObjectName("wizardpage4")
+    def setup_page4(self):
         self.verticallayout_wp4_0 = QtWidgets.QVBoxLayout(self.wizardpage4)
         self.verticallayout_wp4_0.setObjectName("verticallayout_wp4_0")
         self.horizontallayout_wp4_0 = QtWidgets.QHBoxLayout()
         self.horizontallayout_wp4_0.setObjectName("horizontallayout_wp4_0")
+        self.horizontallayout_wp4_1 = QtWidgets.QHBoxLayout()
+        self.horizontallayout_wp4_1.setObjectName("horizontallayout_wp4_1")
 
+        self.exclude_label_1 = QtWidgets.QLabel()
+        self.exclude_edit_1 = QtWidgets.QLineEdit()
+        self.exclude_label_1.setBuddy(self.exclude_edit_1)
+        self.horizontallayout_wp4_1.addWidget(self.exclude_label_1)
+        self.horizontallayout_wp4_1.addWidget(self.exclude_edit_1)
         self.og_tree_1 = QtWidgets.QTreeView()
         self.select_btn_1 = QtWidgets.QPushButton()
         self.select_btn_1.resize(self.select_btn_1.sizeHint())
@@ -121,23 +155,15 @@ class WizardUI(object):
         self.horizontallayout_wp4_0.addWidget(self.load_btn_1)
         self.horizontallayout_wp4_0.addWidget(self.less_btn_1)
         self.horizontallayout_wp4_0.addStretch(1)
+        self.verticallayout_wp4_0.addLayout(self.horizontallayout_wp4_1)
         self.verticallayout_wp4_0.addWidget(self.og_tree_1)
         self.verticallayout_wp4_0.addLayout(self.horizontallayout_wp4_0)
+        self.retranslate_page4()
 
-        # page 5 contents
-        self.wizardpage5 = QtWidgets.QWizardPage()
-        self.wizardpage5.setObjectName("wizardpage5")
-        self.gridlayout_wp5_0 = QtWidgets.QGridLayout(self.wizardpage4)
+    def setup_page5(self):
+        self.gridlayout_wp5_0 = QtWidgets.QGridLayout(self.wizardpage5)
         self.gridlayout_wp5_0.setObjectName("gridlayout_wp5")
 
-        # all pages
-        self.retranslate_ui(wizard)
-        wizard.addPage(self.wizardpage1)
-        wizard.addPage(self.wizardpage2)
-        wizard.addPage(self.wizardpage3)
-        wizard.addPage(self.wizardpage4)
-        wizard.addPage(self.wizardpage5)
-
     def retranslate_ui(self, wizard):
         _translate = QtCore.QCoreApplication.translate
         # page 1 labels
@@ -186,9 +212,6 @@ class WizardUI(object):
             "i'll provide text later) above a tree widget like in (3.) but "
             "populated with just a few fake folders (e.g., named Folder 1-4) "
             "so users can try out and learn the functionality"))
-        self.reset_demo_btn.setText(_translate("Wizard", "Reset"))
-        self.reset_demo_btn.setToolTip(_translate(
-            "Wizard", "Return example folder structure to initial state."))
 
         # page 3 labels
         self.wizardpage3.setTitle(_translate("Wizard", "Software"))
@@ -202,6 +225,31 @@ class WizardUI(object):
             "Wizard",
             "(A) a small text label with some brief instructions I will "
             "provide later"))
+
+        # page 5 labels
+        self.wizardpage5.setTitle(_translate("Wizard", "Finished!"))
+        self.wizardpage5.setSubTitle(_translate(
+            "Wizard",
+            "Thank you for participating. Click \'Finish\' to exit."))
+
+    def retranslate_page2(self):
+        _translate = QtCore.QCoreApplication.translate
+        self.reset_demo_btn.setText(_translate("Wizard", "Reset"))
+        self.reset_demo_btn.setToolTip(_translate(
+            "Wizard", "Return example folder structure to initial state."))
+
+    def retranslate_page4(self):
+        _translate = QtCore.QCoreApplication.translate
+        self.exclude_label_1.setText(_translate("Wizard", "Skip folders:"))
+        self.exclude_edit_1.setPlaceholderText(_translate(
+            "Wizard", "e.g. node_modules; *.vdi; Library/Caches"))
+        self.exclude_edit_1.setToolTip(_translate(
+            "Wizard",
+            "Folders matching these patterns, separated by ';', are not "
+            "scanned at all. A name such as <b>node_modules</b> or "
+            "<b>*.vdi</b> matches at any depth, a path such as "
+            "<b>Library/Caches</b> is relative to the selected folder, and "
+            "<b>re:</b> starts a regular expression."))
         self.select_btn_1.setText(_translate("Wizard", "Find folders"))
         self.select_btn_1.setToolTip(_translate(
             "Wizard", "Select <b>personal folder</b> for data collection."))
@@ -219,8 +267,3 @@ class WizardUI(object):
         self.less_btn_1.setToolTip(_translate(
             "Wizard",
             "Collapses all folders except the root."))
-        # page 5 labels
-        self.wizardpage5.setTitle(_translate("Wizard", "Finished!"))
-        self.wizardpage5.setSubTitle(_translate(
-            "Wizard",
-            "Thank you for participating. Click \'Finish\' to exit."))
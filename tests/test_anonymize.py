@@ -0,0 +1,61 @@
+import copy
+
+import pytest
+
+from drive_analyzer import (
+    record_stat, compute_stat, anonymize_stat, AnonymizedView)
+
+
+def make_tree(root):
+    for path, nfiles in (('a', 2), ('a/b', 3), ('a/b/c', 1), ('a/d', 2),
+                         ('e', 1), ('e/f', 4), ('g', 0)):
+        (root / path).mkdir(parents=True)
+        for ix in range(nfiles):
+            (root / path / 'file{}'.format(ix)).write_text('x' * ix)
+    (root / 'top').write_text('x')
+    return root
+
+
+def dirkey_of(dir_dict, name):
+    return next(dirkey for dirkey, node in dir_dict.items()
+                if node['dirname'] == name)
+
+
+def without_sketches(aggfilestat):
+    return {field: value for field, value in (aggfilestat or dict()).items()
+            if field != 'sketches' and not field.endswith('_percentiles')}
+
+
+@pytest.mark.parametrize('sketch', [False, True])
+def test_view_matches_anonymize_stat(tmp_path, sketch):
+    dir_dict = compute_stat(record_stat(make_tree(tmp_path / 'root')),
+                            sketch=sketch)
+    source = copy.deepcopy(dir_dict)
+    # c is inside b, which is removed with it
+    removed = [dirkey_of(dir_dict, name) for name in ('b', 'c', 'f')]
+    renamed = {dirkey_of(dir_dict, 'a'): 'folder 1',
+               dirkey_of(dir_dict, 'g'): 'folder 2'}
+    view = AnonymizedView(dir_dict, removed, renamed)
+    expected = anonymize_stat(copy.deepcopy(dir_dict), removed, renamed)
+
+    assert sorted(node['dirname'] for node in expected.values()) == [
+        'd', 'e', 'folder 1', 'folder 2', 'root']
+    assert expected[1]['cumfiles'] == 1 + 2 + 2 + 1
+    assert list(view.keys()) == list(expected.keys())
+    for dirkey, node in expected.items():
+        view_node = view[dirkey]
+        assert set(view_node.keys()) == set(node.keys())
+        for field, value in node.items():
+            if field == 'aggfilestat':
+                assert (without_sketches(view_node[field])
+                        == without_sketches(value))
+            else:
+                assert view_node[field] == value, (dirkey, field)
+    # the source is left untouched
+    assert dir_dict == source
+
+
+def test_view_without_changes_is_the_source(tmp_path):
+    dir_dict = compute_stat(record_stat(make_tree(tmp_path / 'root')))
+    view = AnonymizedView(dir_dict)
+    assert view.to_dir_dict() == dir_dict
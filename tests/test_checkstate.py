@@ -0,0 +1,41 @@
+from checkstate import (
+    CheckStates, UNCHECKED, PARTIALLY_CHECKED, CHECKED, SELECTION, EXCLUSION)
+
+
+def make_tree(parents):
+    """ dir_dict of folders 1.. with the given parent keys, 1 being the
+    root, and one file in each folder. """
+    dir_dict = {dirkey: {'dirparent': parent, 'childkeys': set(),
+                         'nfiles': 1, 'selection_state': None,
+                         'exclusion_state': None}
+                for dirkey, parent in parents.items()}
+    for dirkey, parent in parents.items():
+        if parent:
+            dir_dict[parent]['childkeys'].add(dirkey)
+    for dirkey in sorted(dir_dict, reverse=True):
+        node = dir_dict[dirkey]
+        node['cumfiles'] = node['nfiles'] + sum(
+            dir_dict[childkey]['cumfiles'] for childkey in node['childkeys'])
+    return dir_dict
+
+
+def check_states(dir_dict):
+    return CheckStates(
+        dir_dict,
+        lambda dirkey: dir_dict[dirkey]['childkeys'] if dirkey else [1],
+        lambda dirkey: dir_dict[dirkey]['dirparent'] if dirkey else 0)
+
+
+def test_unexcluding_rechecks_ancestors_of_checked_children():
+    dir_dict = make_tree({1: False, 2: 1, 3: 2, 4: 2, 5: 4})
+    checkstates = check_states(dir_dict)
+    checkstates.set_state(1, SELECTION, CHECKED)
+    # a partially checked folder whose children are all checked
+    checkstates.set_state(2, SELECTION, PARTIALLY_CHECKED)
+    assert checkstates.state(2, SELECTION) == PARTIALLY_CHECKED
+    checkstates.set_state(5, EXCLUSION, CHECKED)
+    checkstates.set_state(5, EXCLUSION, UNCHECKED)
+    assert all(checkstates.state(dirkey, SELECTION) == CHECKED
+               for dirkey in dir_dict)
+    assert checkstates.unchecked == set()
+    assert checkstates.cumfiles(1) == 5
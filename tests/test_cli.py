@@ -0,0 +1,26 @@
+import pytest
+
+import cli
+
+
+def make_tree(root):
+    (root / 'a').mkdir(parents=True)
+    (root / 'a' / 'file').write_text('x')
+    return root
+
+
+@pytest.mark.parametrize('quiet_first', [True, False])
+def test_quiet_before_or_after_the_command(tmp_path, capsys, quiet_first):
+    root = make_tree(tmp_path / 'root')
+    args = ['scan', str(root), '-o', str(tmp_path / 'out'), '--format', 'none']
+    args = ['-q'] + args if quiet_first else args + ['-q']
+    assert cli.main(args) == 0
+    assert capsys.readouterr() == ('', '')
+    assert (tmp_path / 'out' / cli.MEASUREMENT_FILENAME).exists()
+
+
+def test_dedup_hardlinks_needs_file_statistics(tmp_path, capsys):
+    with pytest.raises(SystemExit) as error:
+        cli.main(['scan', str(tmp_path), '--counts-only', '--dedup-hardlinks'])
+    assert error.value.code == 2
+    assert '--counts-only' in capsys.readouterr().err
@@ -0,0 +1,54 @@
+import csv
+import json
+
+from cohort import run_cohort, find_submissions, measure_submission
+from drive_analyzer import record_stat, compute_stat, write_json
+
+
+def make_submission(path, folder):
+    dir_dict = compute_stat(record_stat(folder))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf8') as file:
+        write_json(file, dir_dict, {'software_choice': ''})
+
+
+def make_folder(root, nfiles):
+    (root / 'sub').mkdir(parents=True)
+    for ix in range(nfiles):
+        (root / 'sub' / 'file{}'.format(ix)).write_text('x')
+    return root
+
+
+def test_default_named_submissions_get_distinct_participants(tmp_path):
+    submissions = tmp_path / 'submissions'
+    make_submission(submissions / 'p01' / 'my_folder_data.json',
+                    make_folder(tmp_path / 'home1', 2))
+    make_submission(submissions / 'p02' / 'my_folder_data.json',
+                    make_folder(tmp_path / 'home2', 3))
+    table = tmp_path / 'cohort.csv'
+    assert run_cohort([submissions], str(table), processes=1) == (2, 0)
+    with open(table, newline='', encoding='utf8') as file:
+        rows = list(csv.DictReader(file))
+    assert sorted(row['participant'] for row in rows) == [
+        'p01/my_folder_data', 'p02/my_folder_data']
+    assert all(row['error'] == '' for row in rows)
+    assert sorted(row['n_files'] for row in rows) == ['2', '3']
+    # unchanged submissions are skipped when run again
+    assert run_cohort([submissions], str(table), processes=1) == (0, 2)
+
+
+def test_other_json_files_are_not_submissions(tmp_path):
+    make_submission(tmp_path / 'out' / 'home.json',
+                    make_folder(tmp_path / 'home', 1))
+    # written next to the trees by cli.py scan
+    (tmp_path / 'out' / 'measurement.json').write_text(
+        json.dumps({'roots': [], 'properties': {}}))
+    (tmp_path / 'out' / 'profile.json').write_text('{}')
+    assert [path for path, _ in find_submissions([tmp_path / 'out'])] == [
+        str(tmp_path / 'out' / 'home.json')]
+
+
+def test_missing_submission_gives_an_error_row(tmp_path):
+    row = measure_submission(str(tmp_path / 'gone.json'), 'gone')
+    assert row['error'].startswith('FileNotFoundError')
+    assert row['size'] is None
@@ -0,0 +1,40 @@
+from drive_analyzer import (
+    record_stat, compute_stat, hydrate_filestat, unhydrated_keys,
+    count_unhydrated)
+
+
+def make_tree(root):
+    for path, nfiles in (('a', 2), ('a/b', 3), ('a/b/c', 0), ('d', 1)):
+        (root / path).mkdir(parents=True)
+        for ix in range(nfiles):
+            (root / path / 'file{}'.format(ix)).write_text('x' * ix)
+    (root / 'top').write_text('x')
+    return root
+
+
+def test_hydrate_after_counts_only_scan(tmp_path):
+    root = make_tree(tmp_path / 'root')
+    full = compute_stat(record_stat(root))
+    dir_dict = compute_stat(record_stat(root, counts_only=True))
+    assert all(node['filestat'] is None for node in dir_dict.values())
+    assert [node['cumfiles'] for node in dir_dict.values()] == [
+        node['cumfiles'] for node in full.values()]
+    assert count_unhydrated(dir_dict)[1] == len(dir_dict)
+
+    # a folder and its parents first, as when it is expanded
+    bkey = next(dirkey for dirkey, node in dir_dict.items()
+                if node['dirname'] == 'b')
+    changed = hydrate_filestat(dir_dict, root, [bkey])
+    assert bkey in changed and 1 in changed
+    assert len(dir_dict[bkey]['filestat']) == 3
+    assert dir_dict[1]['aggfilestat']['subtree_nstatfiles'] == 3
+    assert count_unhydrated(dir_dict)[bkey] == 1
+
+    hydrate_filestat(dir_dict, root)
+    assert unhydrated_keys(dir_dict) == []
+    assert count_unhydrated(dir_dict)[1] == 0
+    for dirkey, node in full.items():
+        assert dir_dict[dirkey]['filestat'] == node['filestat']
+        assert dir_dict[dirkey]['aggfilestat'] == node['aggfilestat']
+    # folders that have their statistics are not read again
+    assert hydrate_filestat(dir_dict, root) == set()
@@ -0,0 +1,109 @@
+import os
+import sys
+from contextlib import contextmanager
+
+from checkstate import (
+    CheckStates, UNCHECKED, PARTIALLY_CHECKED, CHECKED, SELECTION, EXCLUSION)
+from drive_analyzer import (
+    iter_subtree, assign_folder_depth, record_stat, compute_stat)
+
+CHAIN_DEPTH = 10000
+
+
+@contextmanager
+def recursion_limit(limit):
+    """ Fails any code whose recursion grows with the size of the tree. """
+    previous = sys.getrecursionlimit()
+    sys.setrecursionlimit(limit)
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(previous)
+
+
+def chain(depth):
+    """ dir_dict of a single chain of folders with a file each, with every
+    depth unset. """
+    return {dirkey: {'dirname': 'd{}'.format(dirkey),
+                     'dirparent': dirkey - 1 if dirkey > 1 else False,
+                     'childkeys': {dirkey + 1} if dirkey < depth else set(),
+                     'depth': 0 if dirkey == 1 else None,
+                     'nfiles': 1, 'cumfiles': depth - dirkey + 1,
+                     'selection_state': None, 'exclusion_state': None}
+            for dirkey in range(1, depth + 1)}
+
+
+def test_helpers_on_a_10k_deep_chain():
+    dir_dict = chain(CHAIN_DEPTH)
+    with recursion_limit(200):
+        assert list(iter_subtree(1, dir_dict)) == list(range(1, CHAIN_DEPTH + 1))
+        assign_folder_depth(1, dir_dict)
+    assert dir_dict[CHAIN_DEPTH]['depth'] == CHAIN_DEPTH - 1
+    assert all(node['depth'] == dirkey - 1 for dirkey, node in dir_dict.items())
+
+
+def test_check_states_on_a_10k_deep_chain():
+    dir_dict = chain(CHAIN_DEPTH)
+    middle = CHAIN_DEPTH // 2
+    checkstates = CheckStates(
+        dir_dict,
+        lambda dirkey: dir_dict[dirkey]['childkeys'] if dirkey else [1],
+        lambda dirkey: dir_dict[dirkey]['dirparent'] if dirkey else 0)
+    with recursion_limit(200):
+        checkstates.set_state(1, SELECTION, CHECKED)
+        assert all(checkstates.state(dirkey, SELECTION) == CHECKED
+                   for dirkey in dir_dict)
+        assert checkstates.cumfiles(1) == CHAIN_DEPTH
+
+        # unchecking the deepest folder reaches every ancestor
+        checkstates.set_state(CHAIN_DEPTH, SELECTION, UNCHECKED)
+        assert all(checkstates.state(dirkey, SELECTION) == PARTIALLY_CHECKED
+                   for dirkey in range(1, CHAIN_DEPTH))
+        assert checkstates.unchecked == {CHAIN_DEPTH}
+        assert checkstates.cumfiles(1) == CHAIN_DEPTH - 1
+        assert checkstates.cumfiles(middle) == CHAIN_DEPTH - middle
+
+        # excluding the middle folder excludes and unchecks the rest
+        checkstates.set_state(middle, EXCLUSION, CHECKED)
+        assert all(checkstates.state(dirkey, EXCLUSION) == CHECKED
+                   and checkstates.state(dirkey, SELECTION) == UNCHECKED
+                   and not checkstates.enabled(dirkey, SELECTION)
+                   for dirkey in range(middle, CHAIN_DEPTH + 1))
+        assert checkstates.state(middle - 1, EXCLUSION) == PARTIALLY_CHECKED
+        assert all(checkstates.state(dirkey, SELECTION) == CHECKED
+                   for dirkey in range(1, middle))
+        assert len(checkstates.unchecked) == CHAIN_DEPTH - middle + 1
+        assert checkstates.cumfiles(1) == middle - 1
+        assert checkstates.cumfiles(middle - 1) == 1
+
+        # un-excluding it selects them all again
+        checkstates.set_state(middle, EXCLUSION, UNCHECKED)
+        assert all(checkstates.state(dirkey, SELECTION) == CHECKED
+                   for dirkey in dir_dict)
+        assert all(checkstates.state(dirkey, EXCLUSION) == UNCHECKED
+                   for dirkey in range(middle, CHAIN_DEPTH + 1))
+        assert checkstates.unchecked == set()
+    assert all(checkstates.cumfiles(dirkey) == node['cumfiles']
+               for dirkey, node in dir_dict.items())
+
+
+def test_record_stat_with_many_hidden_folders(tmp_path):
+    # a visible chain with hidden folders at every level, the first of
+    # which holds a file
+    depth, hidden_per_level = 100, 1000  # 100k hidden folders
+    folder = tmp_path
+    for level in range(depth):
+        for ix in range(hidden_per_level):
+            (folder / '.hidden{}'.format(ix)).mkdir()
+        (folder / '.hidden0' / 'file').write_text('x')
+        (folder / 'file').write_text('x')
+        folder = folder / 'd'
+        folder.mkdir()
+    with recursion_limit(200):
+        dir_dict = compute_stat(record_stat(tmp_path, workers=4))
+    assert len(dir_dict) == depth + 1
+    assert not any(node['dirname'].startswith('.')
+                   for node in dir_dict.values())
+    assert dir_dict[1]['cumfiles'] == depth
+    assert max(node['depth'] for node in dir_dict.values()) == depth
+    assert sum(1 for _ in os.scandir(tmp_path)) == hidden_per_level + 2
@@ -0,0 +1,54 @@
+import pytest
+
+from exclusion import ExclusionRules
+
+
+@pytest.mark.parametrize('patterns', [
+    ['re:(?i)D2'],
+    ['re:(?P<name>d)2', 're:(?P<name>x)'],
+    ['node_modules', 'Library/Caches', 're:(?i)D2'],
+])
+def test_regexes_that_cannot_be_joined(patterns):
+    rules = ExclusionRules(patterns)
+    assert rules.matches('a/d2')
+    assert not rules.matches('a/b')
+
+
+def test_invalid_regex_raises_value_error():
+    with pytest.raises(ValueError, match='invalid exclusion pattern'):
+        ExclusionRules(['re:('])
+
+
+def test_kinds_of_patterns():
+    rules = ExclusionRules(['node_modules', '*.vdi', 'Library/Caches',
+                            're:(^|/)build-[0-9]+$'])
+    assert rules.matches('node_modules')
+    assert rules.matches('src/app/node_modules')
+    assert rules.matches('vm/disk.vdi')
+    assert rules.matches('Library/Caches')
+    assert not rules.matches('home/Library/Caches')
+    assert rules.matches('build-12')
+    assert rules.matches('src/build-3')
+    assert not rules.matches('src/build-3/lib')
+    assert not rules.matches('Node_Modules')  # case-sensitive
+    assert not rules.matches('src/node_modules_old')
+
+
+def test_text_round_trip():
+    rules = ExclusionRules.from_text(' node_modules; *.vdi \n\nre:a;b ')
+    assert rules.patterns == ['node_modules', '*.vdi', 're:a', 'b']
+    assert ExclusionRules.from_text(rules.to_text()) == rules
+    assert rules
+    assert not ExclusionRules.from_text(' ; ')
+
+
+def test_excluded_folders_are_not_scanned(tmp_path):
+    from drive_analyzer import record_stat
+    for path in ('src/node_modules/pkg', 'src/lib', 'vm/disk.vdi'):
+        (tmp_path / path).mkdir(parents=True)
+        (tmp_path / path / 'file').write_text('x')
+    dir_dict = record_stat(
+        tmp_path, exclude=ExclusionRules(['node_modules', '*.vdi']))
+    assert {node['dirname'] for node in dir_dict.values()} == {
+        tmp_path.name, 'lib', 'src', 'vm'}
+    assert sum(node['nfiles'] for node in dir_dict.values()) == 1
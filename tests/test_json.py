@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+
+from drive_analyzer import (
+    record_stat, compute_stat, write_json, read_json, json_node,
+    JSONStreamReader)
+
+
+def make_tree(root):
+    for path, nfiles in (('a', 2), ('a/b', 3), ('c', 0)):
+        (root / path).mkdir(parents=True)
+        for ix in range(nfiles):
+            (root / path / 'file{}'.format(ix)).write_text('x' * ix)
+    return root
+
+
+def saved_text(dir_dict, fields):
+    file = io.StringIO()
+    write_json(file, dir_dict, fields)
+    return file.getvalue()
+
+
+def test_write_json_gives_the_text_of_json_dump(tmp_path):
+    dir_dict = compute_stat(record_stat(make_tree(tmp_path / 'root')))
+    fields = {'software_choice': 'a\nb', 'exclude': ['node_modules']}
+    expected = json.dumps(
+        {'dir_dict': {str(dirkey): json_node(node)
+                      for dirkey, node in dir_dict.items()}, **fields},
+        indent=4)
+    assert saved_text(dir_dict, fields) == expected
+    assert saved_text(dict(), dict()) == json.dumps({'dir_dict': {}}, indent=4)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+def test_read_json_round_trip(tmp_path, chunk_size):
+    dir_dict = compute_stat(record_stat(make_tree(tmp_path / 'root')))
+    text = saved_text(dir_dict, {'software_choice': 'x', 'version': 12345})
+    super_dict = read_json(io.StringIO(text), chunk_size)
+    assert super_dict['software_choice'] == 'x'
+    # a number at the end of a chunk is read whole
+    assert super_dict['version'] == 12345
+    assert super_dict['dir_dict'].keys() == dir_dict.keys()
+    for dirkey, node in dir_dict.items():
+        assert super_dict['dir_dict'][dirkey] == node
+
+
+def test_read_json_of_compact_json_dump():
+    text = json.dumps({'software_choice': '', 'dir_dict': {
+        '1': {'dirname': 'r', 'childkeys': [2], 'filestat': []},
+        '2': {'dirname': 's', 'childkeys': [], 'filestat': None}}})
+    super_dict = read_json(io.StringIO(text), chunk_size=5)
+    assert super_dict['dir_dict'][1]['childkeys'] == {2}
+    assert super_dict['dir_dict'][2]['filestat'] is None
+
+
+def test_truncated_file_raises():
+    with pytest.raises(json.JSONDecodeError):
+        read_json(io.StringIO('{"dir_dict": {"1": {"dirname": "r"'), 4)
+
+
+def test_stream_reader_tokens():
+    reader = JSONStreamReader(io.StringIO(' [1, "two" ,{"3": 4}] '), 2)
+    reader.expect('[')
+    values = [reader.decode_value()]
+    while reader.next_is(','):
+        values.append(reader.decode_value())
+    reader.expect(']')
+    assert values == [1, 'two', {'3': 4}]
+    with pytest.raises(json.JSONDecodeError):
+        reader.expect('}')
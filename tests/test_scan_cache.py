@@ -0,0 +1,79 @@
+import os
+import time
+
+from drive_analyzer import record_stat, CACHE_RACY_SECONDS
+from instrument import ScanInstrument
+
+
+def make_tree(root):
+    for path, nfiles in (('a', 2), ('a/b', 3), ('c', 1)):
+        (root / path).mkdir(parents=True)
+        for ix in range(nfiles):
+            (root / path / 'file{}'.format(ix)).write_text('x' * ix)
+    age(root)
+    return root
+
+
+def age(root):
+    """ Date the folders back, since the scan does not cache folders
+    modified just before it. """
+    past = time.time() - 10 * CACHE_RACY_SECONDS
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (past, past))
+
+
+def scan(root, cache_path):
+    """ dir_dict of a scan by folder path, and the number of folders that
+    were listed rather than taken from the cache. The atime of folders is
+    left out, since listing them may update it. """
+    instrument = ScanInstrument()
+    dir_dict = record_stat(root, cache_path=str(cache_path),
+                           instrument=instrument)
+    return by_path(dir_dict), instrument.calls['scandir']
+
+
+def by_path(dir_dict):
+    paths = dict()
+    for dirkey in sorted(dir_dict):
+        node = dir_dict[dirkey]
+        parent = node['dirparent']
+        paths[dirkey] = (os.path.join(paths[parent], node['dirname'])
+                         if parent else node['dirname'])
+    return {paths[dirkey]: {field: value for field, value in node.items()
+                            if field not in ('dirparent', 'childkeys', 'atime')}
+            for dirkey, node in dir_dict.items()}
+
+
+def test_unchanged_tree_is_read_from_the_cache(tmp_path):
+    root = make_tree(tmp_path / 'root')
+    cache_path = tmp_path / 'scan.cache'
+    first, listed = scan(root, cache_path)
+    assert listed == 4
+    assert cache_path.exists()
+    second, listed = scan(root, cache_path)
+    assert listed == 0
+    assert second == first
+
+
+def test_changed_folders_are_listed_again(tmp_path):
+    root = make_tree(tmp_path / 'root')
+    cache_path = tmp_path / 'scan.cache'
+    scan(root, cache_path)
+    (root / 'a' / 'b' / 'new').write_text('new')
+    (root / 'c' / 'file0').unlink()
+    (root / 'c' / 'd').mkdir()
+    rescanned, listed = scan(root, cache_path)
+    # b and c changed, d is new
+    assert listed == 3
+    assert rescanned == scan(root, tmp_path / 'other.cache')[0]
+    assert rescanned[os.path.join('root', 'a', 'b')]['nfiles'] == 4
+    assert rescanned[os.path.join('root', 'c')]['nfiles'] == 0
+
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    root = make_tree(tmp_path / 'root')
+    cache_path = tmp_path / 'scan.cache'
+    cache_path.write_bytes(b'not a cache')
+    dir_dict, listed = scan(root, cache_path)
+    assert listed == 4
+    assert dir_dict == scan(root, tmp_path / 'other.cache')[0]
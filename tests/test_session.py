@@ -0,0 +1,53 @@
+import pytest
+
+from drive_analyzer import record_stat, compute_stat, hydrate_filestat
+from nodetable import NodeTable
+from session import save_session, load_session, is_session_file
+
+
+def make_tree(root):
+    for path, nfiles in (('a', 2), ('a/b', 3), ('c', 0), ('é ü', 1)):
+        (root / path).mkdir(parents=True)
+        for ix in range(nfiles):
+            (root / path / 'file{}'.format(ix)).write_text('x' * ix)
+    return root
+
+
+def test_unhydrated_tree_is_not_saved(tmp_path):
+    root = make_tree(tmp_path / 'root')
+    dir_dict = compute_stat(record_stat(root, counts_only=True))
+    with pytest.raises(ValueError, match='hydrate_filestat'):
+        NodeTable.from_dir_dict(dir_dict)
+    hydrate_filestat(dir_dict, root)
+    session_path = str(tmp_path / 'tree.cas')
+    save_session(session_path, NodeTable.from_dir_dict(dir_dict), {})
+    table, _ = load_session(session_path)
+    assert [len(table.filestat(key)) for key in range(1, len(table) + 1)] == [
+        len(node['filestat']) for node in dir_dict.values()]
+
+
+def test_session_round_trip(tmp_path):
+    dir_dict = compute_stat(record_stat(make_tree(tmp_path / 'root')))
+    # too large for the typed array, stored as JSON
+    dir_dict[2]['ino'] = 2 ** 70
+    session_path = str(tmp_path / 'tree.cas')
+    save_session(session_path, NodeTable.from_dir_dict(dir_dict, {1: (2, 0)}),
+                 {'software_choice': 'x'})
+    assert is_session_file(session_path)
+    table, metadata = load_session(session_path)
+    assert metadata == {'software_choice': 'x'}
+    view = table.view()
+    assert list(view.keys()) == list(dir_dict.keys())
+    for dirkey, node in dir_dict.items():
+        expected = dict(node)
+        if dirkey == 1:
+            expected['selection_state'], expected['exclusion_state'] = 2, 0
+        assert dict(view[dirkey]) == expected
+
+
+def test_other_files_are_not_sessions(tmp_path):
+    path = tmp_path / 'tree.cas'
+    path.write_bytes(b'{"dir_dict": {}}')
+    assert not is_session_file(str(path))
+    with pytest.raises(ValueError, match='not a session file'):
+        load_session(str(path))
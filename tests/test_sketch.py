@@ -0,0 +1,52 @@
+import random
+
+from sketch import KLLSketch, DEFAULT_K, DEFAULT_RANK_ERROR
+
+QS = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def rank_errors(sketch, n):
+    """ |rank / n - q| of the quantiles of a sketch of 0..n-1. """
+    return [abs(value / n - q) for q, value in zip(QS, sketch.quantiles(QS))]
+
+
+def test_rank_error_of_a_large_sketch():
+    n = 100000
+    values = list(range(n))
+    random.Random(1).shuffle(values)
+    sketch = KLLSketch()
+    for start in range(0, n, 1000):
+        sketch.extend(values[start:start + 1000])
+    assert len(sketch) == n
+    assert sketch.size <= 3 * DEFAULT_K
+    assert max(rank_errors(sketch, n)) <= DEFAULT_RANK_ERROR
+
+
+def test_rank_error_of_merged_sketches():
+    n = 100000
+    values = list(range(n))
+    random.Random(2).shuffle(values)
+    sketch = KLLSketch()
+    for start in range(0, n, 997):
+        part = KLLSketch()
+        for value in values[start:start + 997]:
+            part.update(value)
+        sketch.merge(part)
+    assert len(sketch) == n
+    assert max(rank_errors(sketch, n)) <= DEFAULT_RANK_ERROR
+
+
+def test_small_sketch_is_exact():
+    values = [5, 1, 4, 2, 3]
+    sketch = KLLSketch()
+    sketch.extend(values)
+    assert sketch.quantiles([0, 0.2, 0.5, 1]) == [1, 1, 3, 5]
+    assert KLLSketch().quantile(0.5) is None
+
+
+def test_dict_round_trip():
+    sketch = KLLSketch(50)
+    sketch.extend(range(1000))
+    copy = KLLSketch.from_dict(sketch.to_dict())
+    assert (copy.k, copy.n, copy.size) == (sketch.k, sketch.n, sketch.size)
+    assert copy.quantiles(QS) == sketch.quantiles(QS)